@@ -1,19 +1,378 @@
-from flask import Flask, request, jsonify, render_template
-from deepface import DeepFace
+from flask import Flask, Response, request, jsonify, render_template, g, stream_with_context
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 import numpy as np
 import cv2
 import base64
-import tempfile
+import json
 import os
+import time
+import threading
+import uuid
 import logging 
+import face_engine
+from face_engine import DeepFace # Proxy: TensorFlow baru dimuat saat inferensi/warm-up pertama
+import metrics
+from gallery import EmbeddingGallery
+from reference_store import ReferenceStore
+from batching import BatchScheduler
+from inference_executor import ExecutorFull, InferenceExecutor
+from preprocessing import FaceTracker
+from cascade import CASCADE_DETECTOR, DetectorCascade
+from match_cache import MatchCache, content_hash, faces_nbytes, result_nbytes
 
 logging.basicConfig(level=logging.INFO)
 
 app = Flask(__name__)
+sock = Sock(app)
 
-SUPPORTED_DETECTORS = ['opencv', 'ssd', 'dlib', 'mtcnn', 'retinaface', 'mediapipe', 'yolov8', 'yunet']
+SUPPORTED_DETECTORS = ['opencv', 'ssd', 'dlib', 'mtcnn', 'retinaface', 'mediapipe', 'yolov8', 'yunet', CASCADE_DETECTOR]
 SUPPORTED_MODELS = ['VGG-Face', 'Facenet', 'Facenet512', 'OpenFace', 'DeepFace', 'DeepID', 'ArcFace', 'Dlib', 'SFace']
-REFERENCE_IMAGE_PATH = "reference_temp.jpg" # Path gambar referensi
+SESSION_COOKIE = "face_session" # Cookie penanda sesi untuk gambar referensi
+
+# Kombinasi yang dimuat saat startup, format "detector:model,detector:model" atau "all"
+WARMUP_PAIRS = os.environ.get('FACE_WARMUP_PAIRS', 'opencv:VGG-Face')
+
+# Detector 'cascade': FACE_CASCADE_TIERS dicoba berurutan (tercepat dulu), naik ke tingkat berikutnya
+# jika tidak ada wajah atau confidence di bawah FACE_CASCADE_MIN_CONFIDENCE
+detector_cascade = DetectorCascade(
+    [tier.strip() for tier in os.environ.get('FACE_CASCADE_TIERS', 'opencv,retinaface').split(',') if tier.strip()],
+    min_confidence=float(os.environ.get('FACE_CASCADE_MIN_CONFIDENCE', 0.9))
+)
+
+def detector_backends(detector):
+    """DeepFace backends behind a detector name (all tiers for the cascade)."""
+    return detector_cascade.tiers if detector == CASCADE_DETECTOR else [detector]
+
+def parse_warmup_pairs(spec):
+    """Parse FACE_WARMUP_PAIRS into a list of supported (detector, model) tuples."""
+    if spec.strip().lower() == 'all':
+        return [(d, m) for d in SUPPORTED_DETECTORS for m in SUPPORTED_MODELS]
+    pairs = []
+    for item in spec.split(','):
+        detector, _, model = item.strip().partition(':')
+        if detector in SUPPORTED_DETECTORS and model in SUPPORTED_MODELS:
+            pairs.append((detector, model))
+        elif item.strip():
+            logging.warning(f"Ignoring unsupported warm-up pair '{item.strip()}'")
+    return pairs
+
+class ModelRegistry:
+    """
+    Preloads detector/model pairs at startup and remembers which ones are unusable.
+
+    Recognition models are built once and a dummy inference is run for every
+    pair so TensorFlow traces its graphs before the first real request. A model
+    or detector that fails to load (e.g. the DeepFace model on TF >= 2.13, or
+    yolov8 without ultralytics) is marked unavailable so requests fail fast.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pair_status = {}
+        self.unavailable_models = {}
+        self.unavailable_detectors = {}
+        self.unavailable_pairs = {}
+        self.ready_event = threading.Event()
+        self.warmup_started_at = None
+        self.warmup_seconds = None
+        self.warmup_thread = None
+
+    def start_warmup(self, pairs):
+        """Warm up the given pairs in a background thread (once per process)."""
+        with self.lock:
+            if self.warmup_thread is not None:
+                return self.warmup_thread
+            self.warmup_started_at = time.time()
+            for pair in pairs:
+                self.pair_status[pair] = 'pending'
+            thread = self.warmup_thread = threading.Thread(target=self._warmup, args=(pairs,), name="model-warmup",
+                                                           daemon=True)
+        thread.start()
+        return thread
+
+    def _warmup(self, pairs):
+        dummy_img = np.zeros((224, 224, 3), dtype=np.uint8)
+        for detector, model in pairs:
+            self._set_status((detector, model), 'loading')
+            model_error = self._load_model(model)
+            detector_error = self._load_detector(detector, dummy_img)
+            error = model_error or detector_error
+            if error is None:
+                try:
+                    # Inference dummy untuk memicu graph tracing TensorFlow
+                    DeepFace.represent(img_path=dummy_img, model_name=model,
+                                       detector_backend=detector_backends(detector)[0], enforce_detection=False)
+                except Exception as e:
+                    error = str(e)
+                    with self.lock:
+                        self.unavailable_pairs[(detector, model)] = error
+            self._set_status((detector, model), 'ready' if error is None else 'unavailable')
+            if error is not None:
+                app.logger.warning(f"Warm-up failed for {detector} + {model}: {error}")
+
+        self.warmup_seconds = round(time.time() - self.warmup_started_at, 2)
+        self.ready_event.set()
+        app.logger.info(f"Model warm-up finished in {self.warmup_seconds}s")
+
+    def _load_model(self, model):
+        if model in self.unavailable_models:
+            return self.unavailable_models[model]
+        try:
+            DeepFace.build_model(model)
+            return None
+        except Exception as e:
+            with self.lock:
+                self.unavailable_models[model] = str(e)
+            return str(e)
+
+    def _load_detector(self, detector, dummy_img):
+        if detector == CASCADE_DETECTOR:
+            # Cascade hanya bisa dipakai jika semua tingkatnya berhasil dimuat
+            errors = [self._load_detector(tier, dummy_img) for tier in detector_cascade.tiers]
+            return next((error for error in errors if error), None)
+        if detector in self.unavailable_detectors:
+            return self.unavailable_detectors[detector]
+        try:
+            DeepFace.extract_faces(img_path=dummy_img, detector_backend=detector, enforce_detection=False)
+            return None
+        except Exception as e:
+            with self.lock:
+                self.unavailable_detectors[detector] = str(e)
+            return str(e)
+
+    def _set_status(self, pair, status):
+        with self.lock:
+            self.pair_status[pair] = status
+
+    def unavailable_reason(self, detector, model):
+        """Return why a detector/model pair can't be used, or None if it can."""
+        with self.lock:
+            if model in self.unavailable_models:
+                return f"Recognition model '{model}' failed to load: {self.unavailable_models[model]}"
+            for backend in detector_backends(detector):
+                if backend in self.unavailable_detectors:
+                    return f"Detector model '{backend}' failed to load: {self.unavailable_detectors[backend]}"
+            if (detector, model) in self.unavailable_pairs:
+                return f"{detector} + {model} failed to load: {self.unavailable_pairs[(detector, model)]}"
+        return None
+
+    def status(self):
+        with self.lock:
+            return {
+                'ready': self.ready_event.is_set(),
+                'warmup_seconds': self.warmup_seconds,
+                'pairs': [{'detector_backend': d, 'model_name': m, 'status': s}
+                          for (d, m), s in self.pair_status.items()],
+                'unavailable_models': dict(self.unavailable_models),
+                'unavailable_detectors': dict(self.unavailable_detectors)
+            }
+
+model_registry = ModelRegistry()
+
+# Galeri embedding untuk identifikasi 1:N
+# FACE_GALLERY_INDEX: 'exact' (default) atau 'ivf' untuk galeri besar
+# FACE_GALLERY_DIR: folder penyimpanan galeri, dibuka ulang (memory-mapped) saat startup
+GALLERY_DIR = os.environ.get('FACE_GALLERY_DIR')
+GALLERY_INDEX = os.environ.get('FACE_GALLERY_INDEX', 'exact')
+GALLERY_INDEX_PARAMS = {
+    key: int(os.environ[env]) for key, env in (('n_lists', 'FACE_IVF_NLISTS'), ('n_probe', 'FACE_IVF_NPROBE'))
+    if os.environ.get(env)
+} if GALLERY_INDEX == 'ivf' else {}
+
+# FACE_GALLERY_DTYPE: tipe penyimpanan embedding galeri baru, 'float32' (default), 'float16' atau 'int8'
+GALLERY_DTYPE = os.environ.get('FACE_GALLERY_DTYPE', 'float32')
+
+embedding_gallery = EmbeddingGallery(GALLERY_INDEX, GALLERY_INDEX_PARAMS, GALLERY_DTYPE)
+if GALLERY_DIR:
+    embedding_gallery.load(GALLERY_DIR)
+
+# Gambar referensi per sesi browser, beserta embedding per (detector_backend, model_name)
+# FACE_REFERENCE_TTL: detik tanpa aktivitas sebelum sesi dihapus
+# FACE_REFERENCE_MAX_SESSIONS / FACE_REFERENCE_MAX_MB: batas jumlah sesi dan memori (LRU)
+# FACE_REFERENCE_DIR: folder bersama antar proses worker (diisi otomatis oleh serve.py)
+reference_store = ReferenceStore(
+    ttl=float(os.environ.get('FACE_REFERENCE_TTL', 1800)),
+    max_sessions=int(os.environ.get('FACE_REFERENCE_MAX_SESSIONS', 1000)),
+    max_bytes=int(float(os.environ.get('FACE_REFERENCE_MAX_MB', 256)) * 1024 ** 2),
+    shared_dir=os.environ.get('FACE_REFERENCE_DIR')
+)
+
+# Cache /match berdasarkan hash isi gambar: embedding per gambar dan hasil per pasangan
+# FACE_MATCH_CACHE_MB: batas memori cache (LRU), 0 = nonaktif
+match_cache = MatchCache(max_bytes=int(float(os.environ.get('FACE_MATCH_CACHE_MB', 64)) * 1024 ** 2))
+
+# Batas /match_batch per request; pasangan diproses dan dikirim per FACE_MATCH_BATCH_CHUNK pasangan
+MATCH_BATCH_MAX_IMAGES = int(os.environ.get('FACE_MATCH_BATCH_MAX_IMAGES', 1000))
+MATCH_BATCH_MAX_PAIRS = int(os.environ.get('FACE_MATCH_BATCH_MAX_PAIRS', 100000))
+MATCH_BATCH_CHUNK = int(os.environ.get('FACE_MATCH_BATCH_CHUNK', 64))
+
+# Batching embedding dari request yang berjalan bersamaan
+# FACE_BATCH_MAX_SIZE: jumlah wajah maksimum per forward pass (1 = tanpa batching)
+# FACE_BATCH_MAX_WAIT_MS: waktu tunggu maksimum untuk mengumpulkan batch
+batch_scheduler = BatchScheduler(
+    lambda model, faces: face_engine.embed_faces(faces, model),
+    max_batch_size=int(os.environ.get('FACE_BATCH_MAX_SIZE', 16)),
+    max_wait_ms=float(os.environ.get('FACE_BATCH_MAX_WAIT_MS', 5))
+)
+
+# Inferensi dijalankan di thread pool terbatas, request ditolak (503) jika antrean penuh
+# Thread request tetap menunggu hasil inferensi; pool hanya membatasi jumlah pekerjaan yang diterima
+# FACE_INFERENCE_WORKERS: jumlah inferensi paralel, FACE_INFERENCE_QUEUE_DEPTH: panjang antrean
+inference_executor = InferenceExecutor(
+    max_workers=int(os.environ.get('FACE_INFERENCE_WORKERS', 4)),
+    queue_depth=int(os.environ.get('FACE_INFERENCE_QUEUE_DEPTH', 16))
+)
+
+def run_inference(fn, *args):
+    """``inference_executor.run`` (blocks until done) that also records the queue wait as a pipeline stage."""
+    result, timing = inference_executor.run(fn, *args)
+    metrics.record_stage('queue_wait', timing['queue_wait_ms'] / 1000)
+    return result, timing
+
+# Metrik Prometheus di GET /metrics
+# Header "X-Face-Trace: 1" pada request mengembalikan rincian waktu per tahap di header Server-Timing
+TRACE_HEADER = 'X-Face-Trace'
+HTTP_REQUESTS = metrics.registry.counter(
+    'face_http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status')
+)
+HTTP_IN_FLIGHT = metrics.registry.gauge(
+    'face_http_requests_in_flight', 'HTTP requests (and WebSocket streams) being handled', ('endpoint',)
+)
+HTTP_SECONDS = metrics.registry.histogram(
+    'face_http_request_duration_seconds', 'HTTP request latency', ('endpoint', 'method')
+)
+
+@app.before_request
+def ensure_warmup():
+    # Host WSGI lain (flask run, waitress, ...) tidak memanggil start_warmup; mulai saat request pertama
+    if model_registry.warmup_thread is None:
+        model_registry.start_warmup(parse_warmup_pairs(WARMUP_PAIRS))
+
+@app.before_request
+def start_request_metrics():
+    # Nama rute (bukan URL) sebagai label agar jumlah label tetap kecil
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.request_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+    metrics.begin_request(traced=request.headers.get(TRACE_HEADER) == '1')
+
+@app.after_request
+def finish_request_metrics(response):
+    if 'metrics_endpoint' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    HTTP_REQUESTS.inc(endpoint=g.metrics_endpoint, method=request.method, status=str(response.status_code))
+    if response.is_streamed:
+        # Respons streaming (NDJSON /match_batch) baru selesai saat body terakhir terkirim dan respons ditutup
+        endpoint, method, started = g.metrics_endpoint, request.method, g.request_started
+        response.call_on_close(
+            lambda: HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=method)
+        )
+    else:
+        HTTP_SECONDS.observe(elapsed, endpoint=g.metrics_endpoint, method=request.method)
+    trace = metrics.current_trace()
+    if trace is not None:
+        trace.add('total', elapsed)
+        response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+@app.teardown_request
+def end_request_metrics(exc):
+    if 'metrics_endpoint' in g:
+        HTTP_IN_FLIGHT.dec(endpoint=g.pop('metrics_endpoint'))
+
+def collect_component_metrics():
+    """Stats kept by the executor, caches, batching and cascade, exported at scrape time."""
+    queue = inference_executor.info()
+    cache = match_cache.info()
+    references = reference_store.info()
+    batching = batch_scheduler.stats()
+    cascade = detector_cascade.info()
+    return [
+        ('face_inference_running', 'gauge', 'Inference calls running', {(): queue['running']}),
+        ('face_inference_queued', 'gauge', 'Inference calls waiting for a thread', {(): queue['queued']}),
+        ('face_inference_rejected_total', 'counter', 'Requests rejected with 503 because the queue was full',
+         {(): queue['rejected']}),
+        ('face_match_cache_hits_total', 'counter', 'Match cache hits',
+         {(('kind', kind),): stats['hits'] for kind, stats in cache['stats'].items()}),
+        ('face_match_cache_misses_total', 'counter', 'Match cache misses',
+         {(('kind', kind),): stats['misses'] for kind, stats in cache['stats'].items()}),
+        ('face_match_cache_bytes', 'gauge', 'Memory used by the match cache', {(): cache['memory_bytes']}),
+        ('face_reference_sessions', 'gauge', 'Sessions with a reference image', {(): references['sessions']}),
+        ('face_reference_cache_bytes', 'gauge', 'Memory used by session references',
+         {(): references['memory_bytes']}),
+        ('face_embedding_batches_total', 'counter', 'Embedding forward passes', {(): batching['batches']}),
+        ('face_embedding_batch_items_total', 'counter', 'Faces embedded in batches', {(): batching['items']}),
+        ('face_cascade_tier_hits_total', 'counter', 'Cascade detections accepted per tier',
+         {(('tier', tier),): hits for tier, hits in cascade['tier_hits'].items()}),
+    ]
+
+metrics.registry.add_collector(collect_component_metrics)
+
+def overloaded_response(error):
+    """503 with Retry-After for a request rejected because the inference queue is full."""
+    response = jsonify({"error": "Server is busy, please retry later", "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+# Gambar diperkecil sebelum deteksi: sisi terpanjang maksimum FACE_MAX_INPUT_SIDE piksel (0 = nonaktif)
+MAX_INPUT_SIDE = int(os.environ.get('FACE_MAX_INPUT_SIDE', 1280))
+# Pelacakan ROI pada streaming: kotak wajah sebelumnya diperluas FACE_ROI_MARGIN di tiap sisi
+ROI_MARGIN = float(os.environ.get('FACE_ROI_MARGIN', 0.5))
+
+def detect_backend(img, detector):
+    """Detect faces in a (downscaled) image, escalating through the tiers for the cascade."""
+    if detector == CASCADE_DETECTOR:
+        faces, _ = detector_cascade.detect(img, lambda img, tier: face_engine.detect_faces(img, tier, MAX_INPUT_SIDE))
+        return faces
+    return face_engine.detect_faces(img, detector, MAX_INPUT_SIDE)
+
+def detect_image(img, detector, tracker=None):
+    """Detect faces in an image, only inside the tracked ROI if a tracker is given."""
+    if tracker is not None:
+        return tracker.detect(img, lambda roi: detect_backend(roi, detector))
+    return detect_backend(img, detector)
+
+def represent_images(images, detector, model, tracker=None):
+    """
+    Detect faces on the request thread, then embed them through the batching scheduler.
+
+    Crops of all images go to the scheduler together. Returns one list per
+    image with the same output as ``face_engine.represent``.
+    """
+    crops_per_image = []
+    for img in images:
+        with metrics.stage('detection'):
+            crops_per_image.append(detect_image(img, detector, tracker))
+    with metrics.stage('embedding'):
+        embeddings = iter(batch_scheduler.embed(model, [crop['face'] for crops in crops_per_image for crop in crops]))
+    return [[{
+        'embedding': next(embeddings),
+        'facial_area': crop['facial_area'],
+        'face_confidence': crop['confidence']
+    } for crop in crops] for crops in crops_per_image]
+
+def represent_faces(img, detector, model, tracker=None):
+    """Embedded faces of a single image (see ``represent_images``)."""
+    return represent_images([img], detector, model, tracker)[0]
+
+def get_session_id():
+    """Session id from the session cookie (None for a new browser session or an invalid cookie)."""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    try:
+        # Hanya id buatan server (uuid hex) yang diterima, id juga dipakai sebagai nama file
+        return session_id if session_id and uuid.UUID(hex=session_id).hex == session_id else None
+    except ValueError:
+        return None
+
+def get_reference_faces(session_id, detector, model):
+    """Embedded reference faces of a session for a detector/model pair, computed once (None if no reference)."""
+    if not session_id:
+        return None
+    return reference_store.get_faces(
+        session_id, detector, model, lambda image: represent_faces(image, detector, model)
+    )
 
 @app.route("/")
 def index():
@@ -27,75 +386,281 @@ def faceMatching():
 def realtime():
     return render_template("realTimeRecognition.html")
 
+def get_request_params():
+    """
+    Form fields for multipart uploads, query args for raw bodies, otherwise the JSON object.
+
+    The form and the args may be empty (only file parts, or no query string);
+    None means there is no usable payload at all.
+    """
+    if request.files or request.form:
+        return request.form
+    if request.mimetype == 'application/octet-stream':
+        return request.args
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+def read_image_bytes(field, params, raw_body=False):
+    """
+    Raw encoded bytes of an image field.
+
+    Multipart uploads (and, if ``raw_body`` is set, a raw ``application/octet-stream``
+    body) are used as-is, base64 strings (optionally data URLs) from JSON/form
+    fields are decoded. Returns None if the field is missing.
+    """
+    if field in request.files:
+        return request.files[field].read()
+    if raw_body and request.mimetype == 'application/octet-stream':
+        return request.get_data()
+    img_data = params.get(field) if params else None
+    if not img_data:
+        return None
+    if not isinstance(img_data, str):
+        # Ditangani seperti base64 rusak (400), bukan AttributeError (500)
+        raise base64.binascii.Error(f"'{field}' must be a base64 string")
+    with metrics.stage('base64_decode'):
+        return base64.b64decode(img_data.split(',')[-1])
+
+def validate_models(detector, model):
+    """Return an error message if the detector/model pair can't be used, otherwise None."""
+    if detector not in SUPPORTED_DETECTORS:
+        return f"Detector model '{detector}' not supported."
+    if model not in SUPPORTED_MODELS:
+        return f"Recognition model '{model}' not supported."
+    return model_registry.unavailable_reason(detector, model)
+
+def decode_image(img_bytes):
+    """Decode encoded image bytes straight into a BGR numpy array (None if invalid)."""
+    with metrics.stage('imdecode'):
+        return cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+
 @app.route("/match", methods=["POST"])
 def match_faces():
-    data = request.get_json()
-    if not data:
+    data = get_request_params()
+    if data is None:
         return jsonify({"error": "Invalid JSON payload"}), 400
 
-    ref_img_data = data.get('ref_img')
-    target_img_data = data.get('target_img')
     user_id = data.get('user_id', 'anonymous')
     detector = data.get('detector_backend', 'opencv')
     model = data.get('model_name', 'VGG-Face')
+    distance_metric = data.get('distance_metric', 'cosine')
 
-    if not ref_img_data or not target_img_data:
-        return jsonify({"error": "Missing image data"}), 400
-    
-    ref_img_data = ref_img_data.split(',')[-1]
-    target_img_data = target_img_data.split(',')[-1]
-
-    if detector not in SUPPORTED_DETECTORS:
-        return jsonify({"error": f"Detector model '{detector}' not supported."}), 400
-    if model not in SUPPORTED_MODELS:
-        return jsonify({"error": f"Recognition model '{model}' not supported."}), 400
+    error = validate_models(detector, model)
+    if error:
+        return jsonify({"error": error}), 400
+    if distance_metric not in face_engine.DISTANCE_METRICS:
+        return jsonify({"error": f"Distance metric '{distance_metric}' not supported."}), 400
+    metrics.set_stage_labels(detector, model)
 
-    temp_files_to_remove = []
     try:
-        ref_img_bytes = base64.b64decode(ref_img_data)
-        target_img_bytes = base64.b64decode(target_img_data)
+        ref_img_bytes = read_image_bytes('ref_img', data)
+        target_img_bytes = read_image_bytes('target_img', data)
 
-        ref_arr = np.frombuffer(ref_img_bytes, np.uint8)
-        target_arr = np.frombuffer(target_img_bytes, np.uint8)
+        if not ref_img_bytes or not target_img_bytes:
+            return jsonify({"error": "Missing image data"}), 400
 
-        ref_img = cv2.imdecode(ref_arr, cv2.IMREAD_COLOR)
-        target_img = cv2.imdecode(target_arr, cv2.IMREAD_COLOR)
+        start_time = time.time()
+        with metrics.stage('content_hash'):
+            ref_hash, target_hash = content_hash(ref_img_bytes), content_hash(target_img_bytes)
+        result_key = ('result', ref_hash, target_hash, detector, model, distance_metric)
+        cached = match_cache.get(result_key)
+        if cached is not None:
+            # Pasangan yang sama sudah pernah dicocokkan: tanpa decode, deteksi, maupun embedding
+            result = dict(cached, time=round(time.time() - start_time, 2))
+            result['cache'] = {'result': True, 'ref_img': True, 'target_img': True}
+            result['timing'] = {'queue_wait_ms': 0.0, 'inference_ms': 0.0}
+            return jsonify(result)
 
-        if ref_img is None or target_img is None:
-            return jsonify({"error": "Could not decode one or both images"}), 400
+        faces = {}
+        missing = {}
+        for img_hash, img_bytes in ((ref_hash, ref_img_bytes), (target_hash, target_img_bytes)):
+            faces[img_hash] = match_cache.get(('faces', img_hash, detector, model))
+            if faces[img_hash] is None and img_hash not in missing:
+                missing[img_hash] = decode_image(img_bytes)
+                if missing[img_hash] is None:
+                    return jsonify({"error": "Could not decode one or both images"}), 400
 
-        ref_file_path = None
-        tgt_file_path = None
+        timing = {'queue_wait_ms': 0.0, 'inference_ms': 0.0}
+        if missing:
+            # Deteksi per request, embedding gambar yang belum di-cache digabung ke batch model
+            represented, timing = run_inference(represent_images, list(missing.values()), detector, model)
+            for img_hash, img_faces in zip(missing, represented):
+                faces[img_hash] = img_faces
+                match_cache.put(('faces', img_hash, detector, model), img_faces, faces_nbytes(img_faces))
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as ref_temp_file:
-            cv2.imwrite(ref_temp_file.name, ref_img)
-            ref_file_path = ref_temp_file.name
-            temp_files_to_remove.append(ref_file_path)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tgt_temp_file:
-            cv2.imwrite(tgt_temp_file.name, target_img)
-            tgt_file_path = tgt_temp_file.name
-            temp_files_to_remove.append(tgt_file_path)
-
-        result = DeepFace.verify(
-            img1_path=ref_file_path, 
-            img2_path=tgt_file_path, 
-            enforce_detection=False,
-            detector_backend=detector,
-            model_name=model
-        )
+        with metrics.stage('distance'):
+            result = face_engine.verify_faces(faces[ref_hash], faces[target_hash], model, detector,
+                                              distance_metric, start_time=start_time)
+        match_cache.put(result_key, dict(result), result_nbytes(result))
+        result['cache'] = {'result': False, 'ref_img': ref_hash not in missing, 'target_img': target_hash not in missing}
+        result['timing'] = timing
         
         return jsonify(result)
 
+    except ExecutorFull as e:
+        return overloaded_response(e)
     except base64.binascii.Error:
         return jsonify({"error": "Invalid base64 string"}), 400
     except Exception as e:
         app.logger.error(f"Error in /match: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        for f_path in temp_files_to_remove:
-            if os.path.exists(f_path):
-                os.remove(f_path)
+
+class MatchBatch:
+    """Per-request state of /match_batch: embedded faces per distinct image and counters."""
+
+    def __init__(self, image_hashes, image_bytes, pairs, detector, model, distance_metric, start_time):
+        self.image_hashes = image_hashes
+        # Hash -> bytes hasil decode base64 saat hashing, dipakai lagi saat embedding
+        self.image_bytes = image_bytes
+        self.pairs = pairs
+        self.detector = detector
+        self.model = model
+        self.distance_metric = distance_metric
+        self.start_time = start_time
+        self.faces = {}
+        self.image_errors = {}
+        self.stats = {'failed': 0, 'embedded': 0, 'cached': 0}
+
+    def _embed_missing(self, indices):
+        """Embed the distinct images among ``indices`` that have no faces yet (match cache first)."""
+        missing = {}
+        for i in indices:
+            img_hash = self.image_hashes[i]
+            if img_hash in self.faces or img_hash in self.image_errors or img_hash in missing:
+                continue
+            cached = match_cache.get(('faces', img_hash, self.detector, self.model))
+            if cached is not None:
+                self.faces[img_hash] = cached
+                self.stats['cached'] += 1
+                continue
+            img = decode_image(self.image_bytes[img_hash])
+            if img is None:
+                self.image_errors[img_hash] = f"Could not decode image {i}"
+                continue
+            missing[img_hash] = img
+        if not missing:
+            return
+        represented, _ = run_inference(represent_images, list(missing.values()), self.detector, self.model)
+        for img_hash, img_faces in zip(missing, represented):
+            self.faces[img_hash] = img_faces
+            match_cache.put(('faces', img_hash, self.detector, self.model), img_faces, faces_nbytes(img_faces))
+        self.stats['embedded'] += len(missing)
+
+    def chunk_lines(self, chunk_start):
+        """NDJSON lines for the pairs of one chunk; ExecutorFull is only raised for the first chunk."""
+        chunk = self.pairs[chunk_start:chunk_start + MATCH_BATCH_CHUNK]
+        try:
+            self._embed_missing(i for pair in chunk for i in pair)
+        except ExecutorFull as e:
+            if chunk_start == 0:
+                raise
+            return self._error_lines(chunk_start, chunk, "Server is busy, please retry later", e.retry_after)
+        except Exception as e:
+            app.logger.error(f"Error in /match_batch: {e}")
+            return self._error_lines(chunk_start, chunk, str(e))
+
+        lines = []
+        verifiable = []
+        for offset, (i, j) in enumerate(chunk):
+            error = self.image_errors.get(self.image_hashes[i]) or self.image_errors.get(self.image_hashes[j])
+            if error:
+                lines.append((offset, {"error": error}))
+            else:
+                verifiable.append((offset, (self.image_hashes[i], self.image_hashes[j])))
+        with metrics.stage('distance'):
+            results = face_engine.verify_pairs(self.faces, [key for _, key in verifiable], self.model,
+                                               self.detector, self.distance_metric, self.start_time)
+        for (offset, _), result in zip(verifiable, results):
+            lines.append((offset, result or {"error": "No face could be embedded in one or both images"}))
+
+        output = []
+        for offset, result in sorted(lines, key=lambda line: line[0]):
+            if 'error' in result:
+                self.stats['failed'] += 1
+            output.append(json.dumps(dict({"index": chunk_start + offset, "pair": chunk[offset]}, **result)) + "\n")
+        return output
+
+    def _error_lines(self, chunk_start, chunk, error, retry_after=None):
+        self.stats['failed'] += len(chunk)
+        extra = {"retry_after": retry_after} if retry_after is not None else {}
+        return [json.dumps(dict({"index": chunk_start + offset, "pair": pair, "error": error}, **extra)) + "\n"
+                for offset, pair in enumerate(chunk)]
+
+    def summary(self):
+        return {
+            "pairs": len(self.pairs),
+            "failed": self.stats['failed'],
+            "distinct_images": len(set(self.image_hashes)),
+            "embedded": self.stats['embedded'],
+            "from_cache": self.stats['cached'],
+            "time": round(time.time() - self.start_time, 2)
+        }
+
+@app.route("/match_batch", methods=["POST"])
+def match_batch():
+    """
+    Verify many (reference, target) pairs of one image list.
+
+    JSON body: {"images": [base64, ...], "pairs": [[i, j], ...], "detector_backend",
+    "model_name", "distance_metric"}. Every distinct image is decoded and embedded
+    once; results are streamed as NDJSON, one line per pair in request order
+    ({"index", "pair", ...same keys as /match} or {"index", "pair", "error"}),
+    followed by a {"summary": ...} line.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    detector = data.get('detector_backend', 'opencv')
+    model = data.get('model_name', 'VGG-Face')
+    distance_metric = data.get('distance_metric', 'cosine')
+    images = data.get('images')
+    pairs = data.get('pairs')
+
+    error = validate_models(detector, model)
+    if error:
+        return jsonify({"error": error}), 400
+    if distance_metric not in face_engine.DISTANCE_METRICS:
+        return jsonify({"error": f"Distance metric '{distance_metric}' not supported."}), 400
+    if not isinstance(images, list) or not images or not isinstance(pairs, list) or not pairs:
+        return jsonify({"error": "'images' and 'pairs' must be non-empty lists"}), 400
+    if len(images) > MATCH_BATCH_MAX_IMAGES or len(pairs) > MATCH_BATCH_MAX_PAIRS:
+        return jsonify({"error": f"At most {MATCH_BATCH_MAX_IMAGES} images and {MATCH_BATCH_MAX_PAIRS} pairs per request"}), 400
+    if not all(isinstance(pair, list) and len(pair) == 2
+               and all(isinstance(i, int) and not isinstance(i, bool) and 0 <= i < len(images) for i in pair)
+               for pair in pairs):
+        return jsonify({"error": "Each pair must be [ref_index, target_index] into 'images'"}), 400
+    metrics.set_stage_labels(detector, model)
+
+    start_time = time.time()
+    try:
+        # Gambar identik (isi sama) hanya di-decode dan di-embed sekali
+        image_hashes = []
+        image_bytes = {}
+        for img_data in images:
+            with metrics.stage('base64_decode'):
+                img_bytes = base64.b64decode(img_data.split(',')[-1])
+            with metrics.stage('content_hash'):
+                img_hash = content_hash(img_bytes)
+            image_hashes.append(img_hash)
+            image_bytes.setdefault(img_hash, img_bytes)
+    except (base64.binascii.Error, AttributeError):
+        return jsonify({"error": "Invalid base64 string in 'images'"}), 400
+
+    batch = MatchBatch(image_hashes, image_bytes, pairs, detector, model, distance_metric, start_time)
+    try:
+        # Potongan pertama dihitung sebelum streaming agar antrean penuh masih bisa dijawab 503
+        first_lines = batch.chunk_lines(0)
+    except ExecutorFull as e:
+        return overloaded_response(e)
+
+    def generate():
+        yield from first_lines
+        for chunk_start in range(MATCH_BATCH_CHUNK, len(pairs), MATCH_BATCH_CHUNK):
+            yield from batch.chunk_lines(chunk_start)
+        yield json.dumps({"summary": batch.summary()}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route("/upload", methods=["POST"])
 def upload_ref():
@@ -106,73 +671,369 @@ def upload_ref():
     if ref_file.filename == '':
         return jsonify({"error": "No selected file"}), 400
     
-    try:
-        # Simpan sebagai REFERENCE_IMAGE_PATH
-        ref_file.save(REFERENCE_IMAGE_PATH)
-        app.logger.info(f"Reference image saved to {REFERENCE_IMAGE_PATH}")
-        return jsonify({"message": "Reference image uploaded successfully"}), 200
-    except Exception as e:
-        app.logger.error(f"Error saving reference image: {e}")
-        return jsonify({"error": f"Could not save reference image: {str(e)}"}), 500
+    ref_img = decode_image(ref_file.read())
+    if ref_img is None:
+        return jsonify({"error": "Could not decode reference image"}), 400
+
+    # Referensi disimpan di memori per sesi, bukan satu file global
+    session_id = get_session_id() or uuid.uuid4().hex
+    reference_store.put(session_id, ref_img)
+    app.logger.info(f"Reference image stored for session {session_id[:8]}")
+
+    # Hitung embedding referensi sekarang agar frame pertama tidak menunggu
+    detector = request.form.get('detector_backend')
+    model = request.form.get('model_name')
+    if detector and model and not validate_models(detector, model):
+        metrics.set_stage_labels(detector, model)
+        try:
+            run_inference(get_reference_faces, session_id, detector, model)
+        except Exception as e:
+            app.logger.warning(f"Could not precompute reference embedding for {detector} + {model}: {e}")
+
+    response = jsonify({"message": "Reference image uploaded successfully"})
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response, 200
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # Tetap 503 sampai warm-up model selesai
+    status = model_registry.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route("/reference_cache", methods=["GET"])
+def reference_cache_info():
+    return jsonify(reference_store.info())
+
+@app.route("/match_cache", methods=["GET"])
+def match_cache_info():
+    return jsonify(match_cache.info())
+
+@app.route("/inference_queue", methods=["GET"])
+def inference_queue_info():
+    return jsonify(inference_executor.info())
+
+@app.route("/detector_cascade", methods=["GET"])
+def detector_cascade_info():
+    return jsonify(detector_cascade.info())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return metrics.registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route("/batching", methods=["GET"])
+def batching_info():
+    return jsonify(batch_scheduler.stats())
 
 @app.route("/realtime_verify", methods=["POST"])
 def realtime_verify():
-    data = request.get_json()
-    if not data:
+    data = get_request_params()
+    if data is None:
         return jsonify({"error": "Invalid JSON payload"}), 400
 
-    frame_data_url = data.get('frame_data')
     detector = data.get('detector_backend', 'opencv')
     model = data.get('model_name', 'VGG-Face')
 
-    if not frame_data_url:
-        return jsonify({"error": "Missing frame_data"}), 400
-
-    if not os.path.exists(REFERENCE_IMAGE_PATH):
-        app.logger.error(f"Reference image not found at {REFERENCE_IMAGE_PATH}")
+    session_id = get_session_id()
+    if not session_id or not reference_store.has(session_id):
         return jsonify({"error": "Reference image not uploaded or found. Please upload one first."}), 400
 
-    if detector not in SUPPORTED_DETECTORS:
-        return jsonify({"error": f"Detector model '{detector}' not supported."}), 400
-    if model not in SUPPORTED_MODELS:
-        return jsonify({"error": f"Recognition model '{model}' not supported."}), 400
+    error = validate_models(detector, model)
+    if error:
+        return jsonify({"error": error}), 400
+    metrics.set_stage_labels(detector, model)
 
-    temp_frame_file_path = None
     try:
-        # Decode frame dari data URL
-        frame_b64_data = frame_data_url.split(',')[-1]
-        frame_bytes = base64.b64decode(frame_b64_data)
-        frame_arr = np.frombuffer(frame_bytes, np.uint8)
-        current_frame_img = cv2.imdecode(frame_arr, cv2.IMREAD_COLOR)
+        # Decode frame dari data URL atau body biner
+        frame_bytes = read_image_bytes('frame_data', data, raw_body=True)
+        if not frame_bytes:
+            return jsonify({"error": "Missing frame_data"}), 400
 
+        current_frame_img = decode_image(frame_bytes)
         if current_frame_img is None:
             return jsonify({"error": "Could not decode frame image"}), 400
 
-        # Simpan frame sementara
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_frame_file:
-            cv2.imwrite(temp_frame_file.name, current_frame_img)
-            temp_frame_file_path = temp_frame_file.name
-        
-        app.logger.info(f"Verifying: Ref='{REFERENCE_IMAGE_PATH}', Target='{temp_frame_file_path}', Detector='{detector}', Model='{model}'")
+        app.logger.info(f"Verifying: Session='{session_id[:8]}', Target=<frame {current_frame_img.shape[1]}x{current_frame_img.shape[0]}>, Detector='{detector}', Model='{model}'")
         
-        result = DeepFace.verify(
-            img1_path=REFERENCE_IMAGE_PATH, 
-            img2_path=temp_frame_file_path, 
-            enforce_detection=False,
-            detector_backend=detector,
-            model_name=model
-        )
-    
+        result, timing = run_inference(verify_frame, session_id, current_frame_img, detector, model)
+        result['timing'] = timing
         return jsonify(result)
 
+    except ExecutorFull as e:
+        return overloaded_response(e)
     except base64.binascii.Error:
         return jsonify({"error": "Invalid base64 string for frame_data"}), 400
     except Exception as e:
         app.logger.error(f"Error in /realtime_verify: {e}")
         return jsonify({"error": str(e)}), 500
+
+def verify_frame(session_id, frame_img, detector, model, tracker=None):
+    """Verify a decoded frame against the reference image uploaded in this session."""
+    start_time = time.time()
+    # Embedding referensi diambil dari cache sesi, hanya frame yang diproses
+    ref_faces = get_reference_faces(session_id, detector, model)
+    if ref_faces is None:
+        raise ValueError("Reference image not uploaded or found. Please upload one first.")
+    frame_faces = represent_faces(frame_img, detector, model, tracker)
+    with metrics.stage('distance'):
+        return face_engine.verify_faces(ref_faces, frame_faces, model, detector, start_time=start_time)
+
+class LatestFrameSlot:
+    """
+    Holds only the newest frame of a stream.
+
+    A frame that arrives while the previous one is still waiting replaces it,
+    so inference always works on the most recent frame and latency stays
+    bounded instead of growing with a queue.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame_bytes, params):
+        with self.condition:
+            if self.frame is not None:
+                self.dropped += 1
+            self.received += 1
+            self.frame = (self.received, frame_bytes, params, time.time())
+            self.condition.notify()
+
+    def take(self):
+        """Wait for the next frame; returns None once the stream is closed."""
+        with self.condition:
+            while self.frame is None and not self.closed:
+                self.condition.wait()
+            frame, self.frame = self.frame, None
+            return frame
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.frame = None
+            self.condition.notify()
+
+def stream_inference_worker(ws, slot, session_id):
+    """Per-connection inference loop: verify the latest frame and push the result."""
+    tracker = FaceTracker(ROI_MARGIN)
+    tracked_detector = None
+    while True:
+        frame = slot.take()
+        if frame is None:
+            return
+        frame_number, frame_bytes, params, received_at = frame
+        detector = params.get('detector_backend', 'opencv')
+        model = params.get('model_name', 'VGG-Face')
+        if detector != tracked_detector or not params.get('roi_tracking'):
+            tracker.reset()
+            tracked_detector = detector
+
+        try:
+            error = validate_models(detector, model)
+            if not error:
+                metrics.set_stage_labels(detector, model)
+            if not error and not (session_id and reference_store.has(session_id)):
+                error = "Reference image not uploaded or found. Please upload one first."
+            frame_img = decode_image(frame_bytes) if not error else None
+            if not error and frame_img is None:
+                error = "Could not decode frame image"
+            if error:
+                result = {"error": error}
+            else:
+                result, timing = run_inference(
+                    verify_frame, session_id, frame_img, detector, model,
+                    tracker if params.get('roi_tracking') else None
+                )
+                result['timing'] = timing
+                if params.get('roi_tracking'):
+                    result['detection_mode'] = tracker.last_mode
+        except ExecutorFull as e:
+            result = {"error": "Server is busy, please retry later", "retry_after": e.retry_after}
+        except Exception as e:
+            app.logger.error(f"Error in /ws/realtime: {e}")
+            result = {"error": str(e)}
+
+        result.update({
+            "frame": frame_number,
+            "dropped_frames": slot.dropped,
+            "latency_ms": round((time.time() - received_at) * 1000, 1)
+        })
+        try:
+            ws.send(json.dumps(result))
+        except ConnectionClosed:
+            return
+
+@sock.route("/ws/realtime")
+def realtime_stream(ws):
+    """
+    Continuous realtime verification over a WebSocket.
+
+    The client sends JPEG frames as binary messages and may change settings
+    with a JSON text message ({"detector_backend": ..., "model_name": ...,
+    "roi_tracking": bool}). Results are pushed back as JSON text messages as
+    soon as they are ready.
+    """
+    params = {
+        'detector_backend': request.args.get('detector_backend', 'opencv'),
+        'model_name': request.args.get('model_name', 'VGG-Face'),
+        'roi_tracking': request.args.get('roi_tracking', '1').lower() not in ('0', 'false')
+    }
+    slot = LatestFrameSlot()
+    # Inferensi berjalan di thread terpisah agar penerimaan frame tidak pernah terblokir
+    worker = threading.Thread(target=stream_inference_worker, args=(ws, slot, get_session_id()), daemon=True)
+    worker.start()
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, str):
+                try:
+                    params.update({k: v for k, v in json.loads(message).items()
+                                   if k in ('detector_backend', 'model_name', 'roi_tracking')})
+                except (ValueError, AttributeError):
+                    ws.send(json.dumps({"error": "Invalid settings message"}))
+                continue
+            slot.put(message, dict(params))
+    except ConnectionClosed:
+        pass
     finally:
-        if temp_frame_file_path and os.path.exists(temp_frame_file_path):
-            os.remove(temp_frame_file_path)
+        slot.close()
+        worker.join()
+
+@app.route("/enroll", methods=["POST"])
+def enroll():
+    data = get_request_params()
+    if data is None:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    person_id = data.get('person_id')
+    detector = data.get('detector_backend', 'opencv')
+    model = data.get('model_name', 'VGG-Face')
+
+    if not person_id:
+        return jsonify({"error": "Missing person_id"}), 400
+    error = validate_models(detector, model)
+    if error:
+        return jsonify({"error": error}), 400
+    metrics.set_stage_labels(detector, model)
+
+    try:
+        img_bytes = read_image_bytes('img', data, raw_body=True)
+        if not img_bytes:
+            return jsonify({"error": "Missing image data"}), 400
+        img = decode_image(img_bytes)
+        if img is None:
+            return jsonify({"error": "Could not decode image"}), 400
+
+        faces, timing = run_inference(represent_faces, img, detector, model)
+        if not faces:
+            return jsonify({"error": "No face found in image"}), 400
+        # Wajah terbesar dianggap milik person_id
+        face = max(faces, key=lambda f: f['facial_area']['w'] * f['facial_area']['h'])
+        count = embedding_gallery.enroll(person_id, model, face['embedding'])
+
+        app.logger.info(f"Enrolled '{person_id}' for {model} ({count} embeddings)")
+        return jsonify({
+            "person_id": person_id,
+            "model_name": model,
+            "detector_backend": detector,
+            "facial_area": face['facial_area'],
+            "embeddings": count,
+            "timing": timing
+        })
+
+    except ExecutorFull as e:
+        return overloaded_response(e)
+    except base64.binascii.Error:
+        return jsonify({"error": "Invalid base64 string"}), 400
+    except Exception as e:
+        app.logger.error(f"Error in /enroll: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/enroll/<person_id>", methods=["DELETE"])
+def unenroll(person_id):
+    removed = embedding_gallery.remove(person_id)
+    if not removed:
+        return jsonify({"error": f"Person '{person_id}' not enrolled"}), 404
+    return jsonify({"person_id": person_id, "removed_embeddings": removed})
+
+@app.route("/gallery", methods=["GET"])
+def gallery_info():
+    return jsonify({"models": embedding_gallery.stats()})
+
+@app.route("/gallery/save", methods=["POST"])
+def save_gallery():
+    if not GALLERY_DIR:
+        return jsonify({"error": "FACE_GALLERY_DIR is not configured"}), 400
+    try:
+        embedding_gallery.save(GALLERY_DIR)
+        return jsonify({"message": f"Gallery saved to {GALLERY_DIR}", "models": embedding_gallery.stats()})
+    except Exception as e:
+        app.logger.error(f"Error saving gallery: {e}")
+        return jsonify({"error": f"Could not save gallery: {str(e)}"}), 500
+
+@app.route("/identify", methods=["POST"])
+def identify():
+    data = get_request_params()
+    if data is None:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    detector = data.get('detector_backend', 'opencv')
+    model = data.get('model_name', 'VGG-Face')
+    distance_metric = data.get('distance_metric', 'cosine')
+
+    error = validate_models(detector, model)
+    if error:
+        return jsonify({"error": error}), 400
+    if distance_metric not in face_engine.DISTANCE_METRICS:
+        return jsonify({"error": f"Distance metric '{distance_metric}' not supported."}), 400
+    try:
+        top_k = int(data.get('top_k', 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+    if top_k < 1:
+        return jsonify({"error": "top_k must be at least 1"}), 400
+    metrics.set_stage_labels(detector, model)
+
+    try:
+        img_bytes = read_image_bytes('img', data, raw_body=True)
+        if not img_bytes:
+            return jsonify({"error": "Missing image data"}), 400
+        img = decode_image(img_bytes)
+        if img is None:
+            return jsonify({"error": "Could not decode image"}), 400
+
+        start_time = time.time()
+        faces, timing = run_inference(represent_faces, img, detector, model)
+        # Semua wajah dibandingkan dengan seluruh galeri dalam satu operasi matriks
+        with metrics.stage('search'):
+            matches = embedding_gallery.identify(
+                model, np.stack([f['embedding'] for f in faces]), distance_metric, top_k
+            ) if faces else []
+
+        return jsonify({
+            "results": [{"facial_area": face['facial_area'], "matches": face_matches}
+                        for face, face_matches in zip(faces, matches)],
+            "model": model,
+            "detector_backend": detector,
+            "similarity_metric": distance_metric,
+            "threshold": face_engine.find_threshold(model, distance_metric),
+            "time": round(time.time() - start_time, 2),
+            "timing": timing
+        })
+
+    except ExecutorFull as e:
+        return overloaded_response(e)
+    except base64.binascii.Error:
+        return jsonify({"error": "Invalid base64 string"}), 400
+    except Exception as e:
+        app.logger.error(f"Error in /identify: {e}")
+        return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
+    # Dengan reloader debug, warm-up langsung dijalankan di proses anak yang melayani request
+    # (host lain memulainya lewat ensure_warmup pada request pertama, mis. probe /ready)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        model_registry.start_warmup(parse_warmup_pairs(WARMUP_PAIRS))
     app.run(debug=True, host='0.0.0.0', port=5000) # Jalankan di port 5000
@@ -0,0 +1,114 @@
+"""
+Batching Scheduler
+==================
+Collects face crops from concurrent requests and embeds them with one batched
+forward pass per recognition model.
+
+A batch is dispatched as soon as it holds ``max_batch_size`` crops or the
+oldest crop has waited ``max_wait_ms``, so a lone request pays at most
+``max_wait_ms`` of extra latency while concurrent requests share one pass
+through the model.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class _ModelQueue:
+    """Pending crops of one model and the dispatcher thread that drains them."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.items = deque()
+        self.thread = None
+
+
+class BatchScheduler:
+    """
+    Dynamic batching in front of the recognition models.
+
+    Args:
+        embed_batch: ``embed_batch(model_name, faces) -> embeddings``, one call per batch
+        max_batch_size: Most crops per forward pass (1 disables batching)
+        max_wait_ms: Longest time the first crop of a batch waits for more
+    """
+
+    def __init__(self, embed_batch: Callable[[str, List[np.ndarray]], List[np.ndarray]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.lock = threading.Lock()
+        self.queues: Dict[str, _ModelQueue] = {}
+        self.batch_sizes = Counter()
+
+    def embed(self, model_name: str, faces: List[np.ndarray]) -> List[np.ndarray]:
+        """Embed the crops of one request, batched together with concurrent requests."""
+        if not faces:
+            return []
+        if self.max_batch_size == 1:
+            return self.embed_batch(model_name, faces)
+        futures = [self.submit(model_name, face) for face in faces]
+        return [future.result() for future in futures]
+
+    def submit(self, model_name: str, face: np.ndarray) -> Future:
+        """Queue one crop; the future resolves to its embedding."""
+        future = Future()
+        queue = self._queue(model_name)
+        with queue.condition:
+            queue.items.append((face, future, time.perf_counter()))
+            queue.condition.notify()
+        return future
+
+    def _queue(self, model_name: str) -> _ModelQueue:
+        with self.lock:
+            queue = self.queues.get(model_name)
+            if queue is None:
+                queue = self.queues[model_name] = _ModelQueue()
+                queue.thread = threading.Thread(target=self._dispatch, args=(model_name, queue), daemon=True)
+                queue.thread.start()
+            return queue
+
+    def _dispatch(self, model_name: str, queue: _ModelQueue) -> None:
+        while True:
+            with queue.condition:
+                while not queue.items:
+                    queue.condition.wait()
+                deadline = queue.items[0][2] + self.max_wait
+                while len(queue.items) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    queue.condition.wait(remaining)
+                batch = [queue.items.popleft() for _ in range(min(len(queue.items), self.max_batch_size))]
+
+            try:
+                embeddings = self.embed_batch(model_name, [face for face, _, _ in batch])
+                for (_, future, _), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+            with self.lock:
+                self.batch_sizes[len(batch)] += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            items = sum(size * count for size, count in self.batch_sizes.items())
+            pending = {model_name: len(queue.items) for model_name, queue in self.queues.items()}
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': batches,
+                'items': items,
+                'avg_batch_size': items / batches if batches else 0.0,
+                'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'pending': pending
+            }
@@ -24,16 +24,25 @@ import logging
 import traceback
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
-import pandas as pd
+from typing import Dict, List, Set, Tuple, Any
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from deepface import DeepFace
 import psutil
 import cv2
+from collections import Counter
 from itertools import combinations
+import hashlib
+import multiprocessing
+import queue
+import tempfile
+import threading
+import tracemalloc
 import warnings
+import embedding_index
+import embedding_store
+import face_engine
+import lazy_import
+import threshold_sweep
+from cascade import DetectorCascade, cascade_tiers
 
 # Suppress TensorFlow warnings
 warnings.filterwarnings('ignore')
@@ -50,24 +59,282 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class MemoryMonitor:
+    """
+    Memory used by this process while a block of code runs.
+
+    RSS is read for this process only, not the whole machine. A sampler thread
+    polls RSS to catch native peaks (TensorFlow, OpenCV) that are already
+    freed when the block ends, and tracemalloc reports the Python heap peak.
+    tracemalloc slows down every allocation, so blocks that are also timed
+    run with ``trace_heap=False`` (``python_heap_peak_mb`` is then NaN).
+    """
+    
+    def __init__(self, sample_interval: float = 0.005, trace_heap: bool = True):
+        self.process = psutil.Process()
+        self.sample_interval = sample_interval
+        self.trace_heap = trace_heap
+        self.usage: Dict[str, float] = {}
+    
+    def __enter__(self) -> 'MemoryMonitor':
+        self.rss_before = self.process.memory_info().rss
+        self.peak_rss = self.rss_before
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        if self.trace_heap:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._heap_before = tracemalloc.get_traced_memory()[0]
+        return self
+    
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+    
+    def __exit__(self, *exc) -> bool:
+        if self.trace_heap:
+            heap_peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+        self._stop.set()
+        self._sampler.join()
+        rss_after = self.process.memory_info().rss
+        self.peak_rss = max(self.peak_rss, rss_after)
+        
+        mb = 1024 ** 2
+        self.usage = {
+            'rss_delta_mb': (rss_after - self.rss_before) / mb,
+            'peak_rss_mb': self.peak_rss / mb,
+            'peak_rss_delta_mb': (self.peak_rss - self.rss_before) / mb,
+            'python_heap_peak_mb': (heap_peak - self._heap_before) / mb if self.trace_heap else np.nan
+        }
+        return False
+
+def _elapsed_s(start_ns: int) -> float:
+    """Seconds since a ``time.perf_counter_ns()`` reading."""
+    return (time.perf_counter_ns() - start_ns) / 1e9
+
+def detector_variant(detector: str, max_side: int) -> str:
+    """Benchmark name of a detector run on images downscaled to ``max_side`` (e.g. ``mtcnn@640``)."""
+    return f"{detector}@{max_side}" if max_side else detector
+
+def parse_detector_variant(name: str) -> Tuple[str, int]:
+    """Split a benchmark detector name into (backend, max input side or None)."""
+    backend, _, max_side = name.partition('@')
+    return backend, int(max_side) if max_side else None
+
+def detector_cache_dir(detector: str, cascade_min_confidence: float) -> Path:
+    """
+    Relative cache directory of a detector: ``<backend>/<max side or full>``,
+    plus the escalation confidence for cascades, so crops and embeddings
+    produced with other detection settings are never reused.
+    """
+    backend, max_side = parse_detector_variant(detector)
+    variant = f"max{max_side}" if max_side else "full"
+    if cascade_tiers(backend):
+        variant += f"_conf{cascade_min_confidence:g}"
+    return Path(backend) / variant
+
+class EmbeddingCache:
+    """
+    Per-image embeddings keyed by (file content hash, detector, model).
+
+    Entries are kept in memory and, if a cache directory is given, written to
+    ``cache_dir/<detector variant>/<model>/<sha256>.npz`` (see
+    ``detector_cache_dir``) so later runs only embed images that are new or
+    changed. Times of entries read from disk were measured by an earlier run
+    and are flagged with ``detection_time_cached``.
+    """
+    
+    def __init__(self, cache_dir: str = None, cascade_min_confidence: float = 0.9):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cascade_min_confidence = cascade_min_confidence
+        self.memory: Dict[Tuple[str, str, str], Dict] = {}
+        self.path_hashes: Dict[str, str] = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+    
+    def file_hash(self, img_path: str) -> str:
+        """SHA-256 of the file content, computed once per path."""
+        if img_path not in self.path_hashes:
+            with open(img_path, 'rb') as f:
+                self.path_hashes[img_path] = hashlib.sha256(f.read()).hexdigest()
+        return self.path_hashes[img_path]
+    
+    def _disk_path(self, key: Tuple[str, str, str]) -> Path:
+        content_hash, detector, model = key
+        variant_dir = detector_cache_dir(detector, self.cascade_min_confidence)
+        return self.cache_dir / variant_dir / model / f"{content_hash}.npz"
+    
+    def get(self, img_path: str, detector: str, model: str) -> Dict:
+        """Return the cached entry for an image, or None on a miss."""
+        key = (self.file_hash(img_path), detector, model)
+        if key in self.memory:
+            self.stats['memory_hits'] += 1
+            return self.memory[key]
+        
+        if self.cache_dir is not None and self._disk_path(key).exists():
+            with np.load(self._disk_path(key)) as data:
+                entry = {
+                    'faces': [
+                        {'embedding': embedding, 'facial_area': json.loads(str(area)), 'face_confidence': None}
+                        for embedding, area in zip(data['embeddings'], data['facial_areas'])
+                    ],
+                    'processing_time': float(data['processing_time']),
+                    # Entries written before detection/embedding were timed separately lack these
+                    'detection_time': float(data['detection_time']) if 'detection_time' in data.files else None,
+                    'embedding_time': float(data['embedding_time']) if 'embedding_time' in data.files else None,
+                    'memory_usage': float(data['memory_usage']),
+                    'peak_rss_mb': float(data['peak_rss_mb']) if 'peak_rss_mb' in data.files else None,
+                    'python_heap_peak_mb': (float(data['python_heap_peak_mb'])
+                                            if 'python_heap_peak_mb' in data.files else None),
+                    'detection_time_cached': True
+                }
+            self.memory[key] = entry
+            self.stats['disk_hits'] += 1
+            return entry
+        
+        self.stats['misses'] += 1
+        return None
+    
+    def put(self, img_path: str, detector: str, model: str, entry: Dict) -> None:
+        """Store an entry in memory and, if enabled, on disk."""
+        key = (self.file_hash(img_path), detector, model)
+        self.memory[key] = entry
+        
+        if self.cache_dir is not None:
+            disk_path = self._disk_path(key)
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(
+                disk_path,
+                embeddings=np.array([face['embedding'] for face in entry['faces']]),
+                facial_areas=np.array([json.dumps(face['facial_area']) for face in entry['faces']]),
+                processing_time=entry['processing_time'],
+                detection_time=entry['detection_time'],
+                embedding_time=entry['embedding_time'],
+                memory_usage=entry['memory_usage'],
+                peak_rss_mb=entry['peak_rss_mb'],
+                python_heap_peak_mb=entry['python_heap_peak_mb']
+            )
+
+class CropStore:
+    """
+    Aligned face crops per (image, detector), produced by the detection stage.
+
+    Crops are BGR uint8 and written compressed to
+    ``crop_dir/<detector variant>/<sha256>.npz`` (see ``detector_cache_dir``)
+    together with the detection time, so every recognition model (and later
+    runs) reuse one detector pass. Detection times read back from disk are
+    not re-measured and are flagged with ``detection_time_cached``.
+    Only the current detector's crops are kept in memory.
+    """
+    
+    def __init__(self, crop_dir: str, file_hash, cascade_min_confidence: float = 0.9):
+        self.crop_dir = Path(crop_dir) if crop_dir else None
+        self.file_hash = file_hash
+        self.cascade_min_confidence = cascade_min_confidence
+        # (image, detector) pairs detected by this run, possibly by another --workers process
+        self.measured: Set[Tuple[str, str]] = set()
+        self.memory: Dict[str, Dict] = {}
+        self.memory_detector = None
+    
+    def _disk_path(self, img_path: str, detector: str) -> Path:
+        variant_dir = detector_cache_dir(detector, self.cascade_min_confidence)
+        return self.crop_dir / variant_dir / f"{self.file_hash(img_path)}.npz"
+    
+    def _use_detector(self, detector: str) -> None:
+        if detector != self.memory_detector:
+            self.memory.clear()
+            self.memory_detector = detector
+    
+    def get(self, img_path: str, detector: str) -> Dict:
+        """Return {'faces': [...], 'detection_time': float} or None if not detected yet."""
+        self._use_detector(detector)
+        if img_path in self.memory:
+            return self.memory[img_path]
+        
+        if self.crop_dir is not None and self._disk_path(img_path, detector).exists():
+            with np.load(self._disk_path(img_path, detector)) as data:
+                areas = data['facial_areas']
+                confidences = data['confidences']
+                entry = {
+                    'faces': [
+                        {'face': data[f'face_{i}'], 'facial_area': json.loads(str(areas[i])),
+                         'confidence': float(confidences[i])}
+                        for i in range(len(areas))
+                    ],
+                    'detection_time': float(data['detection_time']),
+                    'detection_memory_mb': (float(data['detection_memory_mb'])
+                                            if 'detection_memory_mb' in data.files else None),
+                    'cascade_tier': (str(data['cascade_tier']) or None) if 'cascade_tier' in data.files else None,
+                    'detection_time_cached': (img_path, detector) not in self.measured
+                }
+            self.memory[img_path] = entry
+            return entry
+        return None
+    
+    def put(self, img_path: str, detector: str, entry: Dict) -> None:
+        self._use_detector(detector)
+        self.memory[img_path] = entry
+        self.measured.add((img_path, detector))
+        
+        if self.crop_dir is not None:
+            disk_path = self._disk_path(img_path, detector)
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(
+                disk_path,
+                facial_areas=np.array([json.dumps(face['facial_area']) for face in entry['faces']]),
+                confidences=np.array([face['confidence'] or 0.0 for face in entry['faces']], dtype=np.float32),
+                detection_time=entry['detection_time'],
+                detection_memory_mb=entry['detection_memory_mb'],
+                cascade_tier=entry.get('cascade_tier') or '',
+                **{f'face_{i}': face['face'] for i, face in enumerate(entry['faces'])}
+            )
+
 class FaceRecognitionBenchmark:
     """Main benchmarking class for face recognition models."""
     
-    SUPPORTED_DETECTORS = ['opencv', 'ssd', 'dlib', 'mtcnn', 'retinaface', 'mediapipe', 'yolov8', 'yunet']
+    SUPPORTED_DETECTORS = ['opencv', 'ssd', 'dlib', 'mtcnn', 'retinaface', 'mediapipe', 'yolov8', 'yunet',
+                           'opencv+retinaface']
     SUPPORTED_MODELS = ['VGG-Face', 'Facenet', 'Facenet512', 'OpenFace', 'DeepFace', 'DeepID', 'ArcFace', 'Dlib', 'SFace']
     
-    def __init__(self, test_data_dir: str, output_dir: str = "benchmark_results"):
+    def __init__(self, test_data_dir: str, output_dir: str = "benchmark_results", cache_dir: str = None,
+                 crop_dir: str = None, warmup_iterations: int = 1, memory_sample_interval: float = 0.005,
+                 cascade_min_confidence: float = 0.9):
         """
         Initialize the benchmark system.
         
         Args:
             test_data_dir: Directory containing test images
             output_dir: Directory to save benchmark results
+            cache_dir: Optional directory for the on-disk embedding cache
+            crop_dir: Directory for detected face crops (default: <output_dir>/face_crops)
+            warmup_iterations: Untimed calls per detector/model before measuring, so
+                               first-call model loading is not counted
+            memory_sample_interval: Seconds between RSS samples for peak memory
+            cascade_min_confidence: Face confidence a cascade tier needs before the
+                                    next, slower tier is skipped
         """
         self.test_data_dir = Path(test_data_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
+        # Embeddings are computed once per (image, detector, model)
+        self.embedding_cache = EmbeddingCache(cache_dir, cascade_min_confidence)
+        # Detection runs once per (image, detector), crops are shared by all models
+        self.crop_store = CropStore(crop_dir or self.output_dir / "face_crops", self.embedding_cache.file_hash,
+                                    cascade_min_confidence)
+        self.detection_errors: Dict[Tuple[str, str], str] = {}
+        
+        self.warmup_iterations = warmup_iterations
+        self.memory_sample_interval = memory_sample_interval
+        self.cascade_min_confidence = cascade_min_confidence
+        self.warmed_up = set()
+        # (detector, model) combinations whose Python heap peak was already sampled
+        self.heap_sampled = set()
+        
         # Results storage
         self.results = []
         self.performance_metrics = {}
@@ -75,6 +342,17 @@ class FaceRecognitionBenchmark:
         
         # System info
         self.system_info = self._get_system_info()
+        self.run_info = {}
+        
+        # Settings that change results; part of the checkpoint fingerprint used by --resume
+        self.config = {
+            'distance_metric': 'cosine',
+            'enforce_detection': False,
+            'align': True,
+            'warmup_iterations': warmup_iterations,
+            'cascade_min_confidence': cascade_min_confidence
+        }
+        self.fingerprint = None
         
         logger.info(f"Benchmark initialized with test data: {test_data_dir}")
         logger.info(f"Results will be saved to: {output_dir}")
@@ -159,30 +437,66 @@ class FaceRecognitionBenchmark:
             'predictions': [],
             'ground_truth': [],
             'processing_times': [],
-            'memory_usage': []
+            'detection_times': [],
+            'embedding_times': [],
+            # Images whose detection time comes from an earlier run's crop or embedding cache
+            'cached_detection_times': 0,
+            'memory_usage': [],
+            'peak_rss_mb': [],
+            'python_heap_peak_mb': []
         }
         
+        # Embed every distinct image once, then score all pairs from cached vectors
+        embeddings = {}
+        image_errors = {}
+        cache_stats_before = dict(self.embedding_cache.stats)
+        embedding_start = time.perf_counter_ns()
+        
+        for img_path in dict.fromkeys(path for pair in test_pairs for path in pair[:2]):
+            try:
+                entry = embeddings[img_path] = self._get_embedding(img_path, detector, model)
+                if entry['detection_time'] is not None:
+                    results['detection_times'].append(entry['detection_time'])
+                    results['embedding_times'].append(entry['embedding_time'])
+                    results['cached_detection_times'] += bool(entry.get('detection_time_cached'))
+                if entry.get('peak_rss_mb') is not None:
+                    results['peak_rss_mb'].append(entry['peak_rss_mb'])
+                    results['python_heap_peak_mb'].append(entry['python_heap_peak_mb'])
+            except Exception as e:
+                image_errors[img_path] = str(e)
+        
+        results['embedding_time_s'] = _elapsed_s(embedding_start)
+        results['cache_hits'] = sum(
+            self.embedding_cache.stats[k] - cache_stats_before[k] for k in ('memory_hits', 'disk_hits')
+        )
+        results['cache_misses'] = self.embedding_cache.stats['misses'] - cache_stats_before['misses']
+        
+        if cascade_tiers(parse_detector_variant(detector)[0]):
+            # Tier that produced each image's crops, recorded by the detection stage
+            crops = [self.crop_store.get(path, detector) for path in embeddings]
+            results['cascade_tier_hits'] = dict(Counter(c['cascade_tier'] for c in crops if c and c['cascade_tier']))
+        
+        # Every image against every other image, for all metrics, from the same embeddings
+        sweep_start = time.perf_counter_ns()
+        results['all_pairs'] = self._all_pairs_sweep(embeddings, model)
+        results['all_pairs_time_s'] = _elapsed_s(sweep_start)
+        
+        # Same pairs verified from float16/int8 copies of the embeddings
+        results['compact_storage'] = self._compact_storage_comparison(embeddings, model, test_pairs)
+        
         for i, (img1_path, img2_path, is_genuine) in enumerate(test_pairs):
             try:
-                # Monitor memory before processing
-                memory_before = psutil.virtual_memory().used / (1024**2)  # MB
+                for img_path in (img1_path, img2_path):
+                    if img_path in image_errors:
+                        raise RuntimeError(image_errors[img_path])
                 
-                # Time the verification
-                start_time = time.time()
+                entry1, entry2 = embeddings[img1_path], embeddings[img2_path]
                 
-                result = DeepFace.verify(
-                    img1_path=img1_path,
-                    img2_path=img2_path,
-                    detector_backend=detector,
-                    model_name=model,
-                    enforce_detection=False
-                )
-                
-                processing_time = time.time() - start_time
-                
-                # Monitor memory after processing
-                memory_after = psutil.virtual_memory().used / (1024**2)  # MB
-                memory_used = memory_after - memory_before
+                start_ns = time.perf_counter_ns()
+                result = face_engine.verify_faces(entry1['faces'], entry2['faces'], model, detector)
+                # Report the cost a single verify call would have: both embeddings plus the comparison
+                processing_time = entry1['processing_time'] + entry2['processing_time'] + _elapsed_s(start_ns)
+                memory_used = max(entry1['memory_usage'], entry2['memory_usage'])
                 
                 # Store results
                 results['successful_pairs'] += 1
@@ -199,12 +513,140 @@ class FaceRecognitionBenchmark:
                 results['failed_pairs'] += 1
                 logger.warning(error_msg)
         
+        logger.info(f"{detector} + {model}: {results['cache_misses']} images embedded, "
+                    f"{results['cache_hits']} served from cache")
+        
         # Calculate metrics
         if results['successful_pairs'] > 0:
             results.update(self._calculate_metrics(results))
         
         return results
     
+    def _get_crops(self, img_path: str, detector: str) -> Dict:
+        """
+        Detection stage: aligned face crops for an image, detected once per detector.
+
+        ``detector`` may carry a max input side (``mtcnn@640``), in which case the
+        image is downscaled before detection and cached as a separate detector.
+        It may also be a cascade (``opencv+retinaface``, see cascade.py); the tier
+        that produced the crops is stored with them.
+        """
+        if (img_path, detector) in self.detection_errors:
+            raise RuntimeError(self.detection_errors[(img_path, detector)])
+        
+        entry = self.crop_store.get(img_path, detector)
+        if entry is not None:
+            return entry
+        
+        backend, max_side = parse_detector_variant(detector)
+        try:
+            # Every cascade tier is warmed up, so escalations don't include model loading
+            for tier in cascade_tiers(backend) or [backend]:
+                self._warm_up('detector', detector_variant(tier, max_side),
+                              lambda: face_engine.detect_faces(img_path, tier, max_side))
+            # Only the RSS sampler runs alongside the timed call, tracemalloc stays off
+            with MemoryMonitor(self.memory_sample_interval, trace_heap=False) as monitor:
+                start_ns = time.perf_counter_ns()
+                faces, tier = self._detect(img_path, backend, max_side)
+                detection_time = _elapsed_s(start_ns)
+            entry = {
+                'faces': faces,
+                'detection_time': detection_time,
+                'detection_memory_mb': monitor.usage['peak_rss_delta_mb'],
+                'cascade_tier': tier,
+                'detection_time_cached': False
+            }
+        except Exception as e:
+            self.detection_errors[(img_path, detector)] = str(e)
+            raise
+        
+        self.crop_store.put(img_path, detector, entry)
+        return entry
+    
+    def _detect(self, img_path: str, backend: str, max_side: int) -> Tuple[List[Dict], str]:
+        """Faces from a single detector, or from a cascade together with the tier that found them."""
+        tiers = cascade_tiers(backend)
+        if tiers is None:
+            return face_engine.detect_faces(img_path, backend, max_side), None
+        cascade = DetectorCascade(tiers, self.cascade_min_confidence)
+        return cascade.detect(img_path, lambda img, tier: face_engine.detect_faces(img, tier, max_side))
+    
+    def run_detection_stage(self, detector: str, image_paths: List[str]) -> float:
+        """
+        Run a detector once over every image before any recognition model uses the crops.
+        
+        Returns:
+            Wall-clock time of the stage in seconds
+        """
+        start_ns = time.perf_counter_ns()
+        failed = 0
+        for img_path in image_paths:
+            try:
+                self._get_crops(img_path, detector)
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Detection failed for {img_path} with {detector}: {str(e)}")
+        elapsed = _elapsed_s(start_ns)
+        logger.info(f"Detection stage {detector}: {len(image_paths)} images in {elapsed:.2f}s ({failed} failed)")
+        return elapsed
+    
+    def _get_embedding(self, img_path: str, detector: str, model: str) -> Dict:
+        """Embedding stage: embed the detector's crops of an image, or return cached embeddings."""
+        entry = self.embedding_cache.get(img_path, detector, model)
+        if entry is not None:
+            return entry
+        
+        crops = self._get_crops(img_path, detector)
+        if crops['faces']:
+            self._warm_up('model', model, lambda: face_engine.embed_face(crops['faces'][0]['face'], model))
+        
+        def embed_crops():
+            return [{
+                'embedding': face_engine.embed_face(crop['face'], model),
+                'facial_area': crop['facial_area'],
+                'face_confidence': crop['confidence']
+            } for crop in crops['faces']]
+        
+        # Per-process peak RSS while the image is embedded; tracemalloc stays off for the timed call
+        with MemoryMonitor(self.memory_sample_interval, trace_heap=False) as monitor:
+            start_ns = time.perf_counter_ns()
+            faces = embed_crops()
+            embedding_time = _elapsed_s(start_ns)
+        
+        # Python heap peak from one extra, untimed call on the first image of each combination
+        heap_peak_mb = np.nan
+        if crops['faces'] and (detector, model) not in self.heap_sampled:
+            self.heap_sampled.add((detector, model))
+            with MemoryMonitor(self.memory_sample_interval) as heap_monitor:
+                embed_crops()
+            heap_peak_mb = heap_monitor.usage['python_heap_peak_mb']
+        
+        # Peak memory added by this image's detection or embedding, whichever is higher
+        memory_usage = monitor.usage['peak_rss_delta_mb']
+        if crops.get('detection_memory_mb') is not None:
+            memory_usage = max(memory_usage, crops['detection_memory_mb'])
+        
+        entry = {
+            'faces': faces,
+            'detection_time': crops['detection_time'],
+            'embedding_time': embedding_time,
+            'processing_time': crops['detection_time'] + embedding_time,
+            'memory_usage': memory_usage,
+            'peak_rss_mb': monitor.usage['peak_rss_mb'],
+            'python_heap_peak_mb': heap_peak_mb,
+            'detection_time_cached': crops['detection_time_cached']
+        }
+        self.embedding_cache.put(img_path, detector, model, entry)
+        return entry
+    
+    def _warm_up(self, kind: str, name: str, call) -> None:
+        """Run untimed calls the first time a detector or model is used in this process."""
+        if self.warmup_iterations <= 0 or (kind, name) in self.warmed_up:
+            return
+        self.warmed_up.add((kind, name))
+        for _ in range(self.warmup_iterations):
+            call()
+    
     def _calculate_metrics(self, results: Dict) -> Dict:
         """Calculate performance metrics from results."""
         predictions = np.array(results['predictions'])
@@ -225,11 +667,21 @@ class FaceRecognitionBenchmark:
         processing_times = results['processing_times']
         avg_processing_time = np.mean(processing_times)
         std_processing_time = np.std(processing_times)
+        p50, p90, p99 = np.percentile(processing_times, [50, 90, 99])
+        
+        # Per-image stage timings (detection is shared by every model of a detector)
+        detection_times = results.get('detection_times') or [np.nan]
+        embedding_times = results.get('embedding_times') or [np.nan]
         
         # Memory metrics
         memory_usage = results['memory_usage']
         avg_memory_usage = np.mean(memory_usage)
         max_memory_usage = np.max(memory_usage)
+        # Absolute peaks, only known for images embedded in this run or cached with them
+        peak_rss = np.max(results['peak_rss_mb']) if results.get('peak_rss_mb') else np.nan
+        # Python heap peak is sampled on one image per combination, the other images hold NaN
+        heap_peaks = [v for v in results.get('python_heap_peak_mb', []) if v is not None and not np.isnan(v)]
+        python_heap_peak = np.max(heap_peaks) if heap_peaks else np.nan
         
         return {
             'accuracy': accuracy,
@@ -244,17 +696,114 @@ class FaceRecognitionBenchmark:
             'std_processing_time': std_processing_time,
             'min_processing_time': np.min(processing_times),
             'max_processing_time': np.max(processing_times),
+            'p50_processing_time': p50,
+            'p90_processing_time': p90,
+            'p99_processing_time': p99,
+            'avg_detection_time': np.mean(detection_times),
+            'avg_embedding_time': np.mean(embedding_times),
             'avg_memory_usage_mb': avg_memory_usage,
-            'max_memory_usage_mb': max_memory_usage
+            'max_memory_usage_mb': max_memory_usage,
+            'peak_rss_mb': peak_rss,
+            'python_heap_peak_mb': python_heap_peak
         }
     
-    def run_comprehensive_benchmark(self, detectors: List[str] = None, models: List[str] = None) -> None:
+    def _all_pairs_sweep(self, embeddings: Dict[str, Dict], model: str) -> Dict[str, Dict]:
+        """
+        Threshold sweep over all image pairs, one embedding (the largest face) per image.
+        
+        Args:
+            embeddings: Embedding entries keyed by image path; the parent directory is the identity
+            model: Recognition model name, for the default thresholds
+        
+        Returns:
+            Summary per distance metric (see threshold_sweep.sweep_from_histograms), or {} if
+            there are not enough images
+        """
+        paths, vectors = self._image_vectors(embeddings)
+        if len(paths) < 2:
+            return {}
+        labels = np.array([Path(img_path).parent.name for img_path in paths])
+        return threshold_sweep.all_pairs_sweep(vectors, labels, model)
+    
+    @staticmethod
+    def _image_vectors(embeddings: Dict[str, Dict]) -> Tuple[List[str], np.ndarray]:
+        """Paths of the images with a face and the embedding of each one's largest face (float64)."""
+        paths, vectors = [], []
+        for img_path, entry in embeddings.items():
+            if not entry['faces']:
+                continue
+            face = max(entry['faces'], key=lambda f: f['facial_area'].get('w', 0) * f['facial_area'].get('h', 0))
+            paths.append(img_path)
+            vectors.append(face['embedding'])
+        return paths, np.array(vectors, dtype=np.float64)
+    
+    def _compact_storage_comparison(self, embeddings: Dict[str, Dict], model: str, test_pairs: List[Tuple],
+                                    distance_metric: str = 'cosine') -> Dict[str, Dict]:
+        """
+        Accuracy and size of the test pairs' embeddings in each compact storage dtype.
+        
+        The float64 baseline verifies the largest face of each image; every
+        dtype then verifies the same pairs with distances computed on its
+        codes (embedding_store). Sizes are per embedding store, compared with
+        float64 arrays and with the JSON float lists DeepFace output ends up as.
+        
+        Returns:
+            {'float64': {...}, 'float32': {...}, ...} with accuracy, accuracy_delta,
+            flipped decisions, max distance error, memory/disk bytes and saved fraction
+        """
+        paths, vectors = self._image_vectors(embeddings)
+        row = {img_path: i for i, img_path in enumerate(paths)}
+        pairs = [(row[a], row[b], is_genuine) for a, b, is_genuine in test_pairs if a in row and b in row]
+        if not pairs:
+            return {}
+        rows_a, rows_b, truth = (np.array(column) for column in zip(*pairs))
+        threshold = face_engine.find_threshold(model, distance_metric)
+        
+        baseline = face_engine.paired_distances(vectors[rows_a], vectors[rows_b], distance_metric)
+        baseline_verified = baseline <= threshold
+        baseline_accuracy = float(np.mean(baseline_verified == truth))
+        float64_bytes = vectors.nbytes
+        comparison = {'float64': {
+            'accuracy': baseline_accuracy,
+            'accuracy_delta': 0.0,
+            'flipped': 0,
+            'max_distance_error': 0.0,
+            'memory_bytes': float64_bytes,
+            'json_bytes': len(json.dumps(vectors.tolist())),
+            'saved_fraction': 0.0
+        }}
+        
+        for dtype in embedding_store.STORAGE_DTYPES:
+            store = embedding_store.EmbeddingStore(vectors.shape[1], dtype)
+            store.add(paths, vectors)
+            distances = store.pair_distances(rows_a, rows_b, distance_metric)
+            verified = distances <= threshold
+            accuracy = float(np.mean(verified == truth))
+            with tempfile.TemporaryDirectory() as store_dir:
+                store.save(store_dir)
+                disk_bytes = sum(f.stat().st_size for f in Path(store_dir).iterdir())
+            comparison[dtype] = {
+                'accuracy': accuracy,
+                'accuracy_delta': accuracy - baseline_accuracy,
+                'flipped': int(np.sum(verified != baseline_verified)),
+                'max_distance_error': float(np.max(np.abs(distances - baseline))),
+                'memory_bytes': store.nbytes,
+                'disk_bytes': disk_bytes,
+                'saved_fraction': 1 - store.nbytes / float64_bytes
+            }
+        return comparison
+    
+    def run_comprehensive_benchmark(self, detectors: List[str] = None, models: List[str] = None,
+                                    workers: int = 1, resume: bool = False) -> None:
         """
         Run comprehensive benchmark across all combinations.
         
         Args:
             detectors: List of detectors to test (default: all supported)
             models: List of models to test (default: all supported)
+            workers: Number of worker processes (1 runs everything in this process)
+            resume: Reuse combinations already checkpointed in the output directory
+                    for the same dataset and configuration
         """
         if detectors is None:
             detectors = self.SUPPORTED_DETECTORS
@@ -267,47 +816,239 @@ class FaceRecognitionBenchmark:
         genuine_pairs, impostor_pairs = self.prepare_test_data()
         all_test_pairs = genuine_pairs + impostor_pairs
         
-        total_combinations = len(detectors) * len(models)
-        current_combination = 0
+        image_paths = list(dict.fromkeys(path for pair in all_test_pairs for path in pair[:2]))
+        self.fingerprint = self._compute_fingerprint(all_test_pairs)
         
-        # Test each combination
-        for detector in detectors:
-            for model in models:
-                current_combination += 1
-                logger.info(f"Progress: {current_combination}/{total_combinations}")
-                
-                try:
-                    result = self.benchmark_single_combination(detector, model, all_test_pairs)
-                    self.results.append(result)
-                    
-                    # Save intermediate results
-                    self._save_intermediate_results()
-                    
-                except Exception as e:
-                    error_msg = f"Failed to benchmark {detector} + {model}: {str(e)}"
-                    logger.error(error_msg)
-                    self.error_log.append({
-                        'detector': detector,
-                        'model': model,
-                        'error': error_msg,
-                        'traceback': traceback.format_exc()
-                    })
+        all_combinations = [(d, m) for d in detectors for m in models]
+        completed = self._load_checkpoint(set(all_combinations)) if resume else set()
+        if not resume:
+            self._reset_checkpoint()
+        pending = [c for c in all_combinations if c not in completed]
+        if completed:
+            logger.info(f"Resuming: {len(completed)} combinations loaded from checkpoint, {len(pending)} remaining")
+        
+        start_ns = time.perf_counter_ns()
+        resumed_results = len(self.results)
+        if workers > 1 and pending:
+            stage_time = self._run_parallel(pending, all_test_pairs, image_paths, workers)
+        else:
+            stage_time = self._run_serial(pending, all_test_pairs, image_paths)
+        wall_time = _elapsed_s(start_ns)
+        
+        # Serial-equivalent time: every detection stage plus every combination's embedding/scoring work
+        serial_time = stage_time + sum(r.get('embedding_time_s', 0) for r in self.results[resumed_results:])
+        self.run_info = {
+            'workers': workers,
+            'resumed_combinations': len(completed),
+            'wall_clock_time_s': wall_time,
+            'serial_equivalent_time_s': serial_time,
+            'speedup': serial_time / wall_time if wall_time > 0 else None
+        }
+        logger.info(f"Wall-clock time {wall_time:.1f}s with {workers} worker(s), "
+                    f"serial-equivalent {serial_time:.1f}s ({self.run_info['speedup'] or 0:.2f}x)")
+        
+        # Same order as a serial run, whatever order results were produced or resumed in
+        order = {combination: i for i, combination in enumerate(all_combinations)}
+        self.results.sort(key=lambda r: order.get((r['detector'], r['model']), len(order)))
         
         logger.info("Benchmark completed. Generating reports...")
         self._generate_reports()
     
-    def _save_intermediate_results(self) -> None:
-        """Save intermediate results to prevent data loss."""
-        results_file = self.output_dir / "intermediate_results.json"
-        with open(results_file, 'w') as f:
-            json.dump({
-                'results': self.results,
-                'errors': self.error_log,
-                'system_info': self.system_info
-            }, f, indent=2, default=str)
+    def _compute_fingerprint(self, test_pairs: List[Tuple]) -> str:
+        """Hash of the dataset content, the test pairs and the benchmark configuration."""
+        digest = hashlib.sha256()
+        for img1_path, img2_path, is_genuine in test_pairs:
+            digest.update(f"{self.embedding_cache.file_hash(img1_path)}:"
+                          f"{self.embedding_cache.file_hash(img2_path)}:{is_genuine};".encode())
+        digest.update(json.dumps(self.config, sort_keys=True).encode())
+        return digest.hexdigest()
+    
+    def _checkpoint_file(self) -> Path:
+        return self.output_dir / "intermediate_results.jsonl"
+    
+    def _reset_checkpoint(self) -> None:
+        """Start a fresh checkpoint file for a new (non-resumed) run."""
+        self._checkpoint_file().write_text("")
+    
+    def _load_checkpoint(self, combinations: set) -> set:
+        """
+        Load completed combinations from the JSON Lines checkpoint.
+        
+        Only entries written for the same dataset/config fingerprint are used;
+        failed combinations are retried.
+        
+        Returns:
+            Set of (detector, model) pairs that were loaded into self.results
+        """
+        checkpoint_file = self._checkpoint_file()
+        if not checkpoint_file.exists():
+            if (self.output_dir / "intermediate_results.json").exists():
+                logger.warning("Found legacy intermediate_results.json without a dataset fingerprint, "
+                               "it can't be resumed safely and is ignored")
+            return set()
+        
+        completed = {}
+        stale = 0
+        with open(checkpoint_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash mid-write
+                    continue
+                if entry.get('kind') != 'result':
+                    continue
+                if entry.get('fingerprint') != self.fingerprint:
+                    stale += 1
+                    continue
+                result = entry['result']
+                combination = (result['detector'], result['model'])
+                if combination in combinations:
+                    completed[combination] = result
+        
+        if stale:
+            logger.info(f"Ignored {stale} checkpointed results from a different dataset or configuration")
+        self.results.extend(completed.values())
+        return set(completed)
+    
+    def _record_result(self, result: Dict) -> None:
+        """Keep a finished combination and checkpoint it."""
+        self.results.append(result)
+        
+        # Save intermediate results
+        self._save_intermediate_results('result', {'result': result})
+    
+    def _record_error(self, detector: str, model: str, error: str, tb: str) -> None:
+        error_msg = f"Failed to benchmark {detector} + {model}: {error}"
+        logger.error(error_msg)
+        error = {
+            'detector': detector,
+            'model': model,
+            'error': error_msg,
+            'traceback': tb
+        }
+        self.error_log.append(error)
+        self._save_intermediate_results('error', {'error': error})
+    
+    def _run_serial(self, combinations: List[Tuple[str, str]], all_test_pairs: List[Tuple],
+                    image_paths: List[str]) -> float:
+        """Run the combinations in this process; returns total detection stage time."""
+        total_combinations = len(combinations)
+        stage_time = 0.0
+        current_detector = None
+        
+        # Test each combination: one detection pass per detector, then every model on its crops
+        for current_combination, (detector, model) in enumerate(combinations, 1):
+            if detector != current_detector:
+                stage_time += self.run_detection_stage(detector, image_paths)
+                current_detector = detector
+            logger.info(f"Progress: {current_combination}/{total_combinations}")
+            
+            try:
+                self._record_result(self.benchmark_single_combination(detector, model, all_test_pairs))
+            except Exception as e:
+                self._record_error(detector, model, str(e), traceback.format_exc())
+        return stage_time
+    
+    @staticmethod
+    def _next_worker_message(result_queue, processes) -> Tuple:
+        """Wait for the next worker message, failing instead of hanging if a worker died."""
+        while True:
+            try:
+                return result_queue.get(timeout=5)
+            except queue.Empty:
+                dead = [p for p in processes if not p.is_alive() and p.exitcode != 0]
+                if dead:
+                    raise RuntimeError(f"Benchmark worker exited with code {dead[0].exitcode}")
+    
+    def _run_parallel(self, combinations: List[Tuple[str, str]], all_test_pairs: List[Tuple],
+                      image_paths: List[str], workers: int) -> float:
+        """
+        Spread the benchmark over worker processes.
+        
+        Detection stages are spread across workers first (crops land in the
+        shared crop store). Combinations are then routed by recognition model,
+        so each worker keeps only its own models resident. Results stream back
+        as they finish and are checkpointed here.
+        """
+        detectors = list(dict.fromkeys(d for d, _ in combinations))
+        models = list(dict.fromkeys(m for _, m in combinations))
+        ctx = multiprocessing.get_context('spawn')
+        workers = min(workers, max(len(detectors), len(models)))
+        # Split the cores between workers; children read these when they import TensorFlow
+        tf_threads = max(1, (psutil.cpu_count() or 1) // workers)
+        logger.info(f"Starting {workers} workers with {tf_threads} TensorFlow threads each")
+        
+        task_queues = [ctx.Queue() for _ in range(workers)]
+        result_queue = ctx.Queue()
+        bench_args = (str(self.test_data_dir), str(self.output_dir), self.embedding_cache.cache_dir,
+                      self.crop_store.crop_dir, self.warmup_iterations, self.memory_sample_interval,
+                      self.cascade_min_confidence)
+        processes = [
+            ctx.Process(target=_benchmark_worker, args=(i, bench_args, tf_threads, task_queues[i], result_queue),
+                        daemon=True)
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        
+        try:
+            # Stage 1: each detector runs once, on one worker
+            for i, detector in enumerate(detectors):
+                task_queues[i % workers].put(('detect', detector, image_paths))
+            stage_time = 0.0
+            measured = {}
+            for _ in detectors:
+                message = self._next_worker_message(result_queue, processes)
+                _, detector, elapsed, errors, measured[detector] = message
+                stage_time += elapsed
+                self.detection_errors.update(errors)
+            
+            # Stage 2: same model -> same worker (or same group of workers when models < workers)
+            for detector, model in combinations:
+                mi, di = models.index(model), detectors.index(detector)
+                model_workers = [w for w in range(workers) if w % len(models) == mi] or [mi % workers]
+                errors = {k: v for k, v in self.detection_errors.items() if k[1] == detector}
+                task_queues[model_workers[di % len(model_workers)]].put(
+                    ('combination', detector, model, all_test_pairs, errors, measured[detector])
+                )
+            
+            total_combinations = len(combinations)
+            for done in range(1, total_combinations + 1):
+                message = self._next_worker_message(result_queue, processes)
+                logger.info(f"Progress: {done}/{total_combinations}")
+                if message[0] == 'result':
+                    self._record_result(message[1])
+                else:
+                    self._record_error(*message[1:])
+        finally:
+            for task_queue in task_queues:
+                task_queue.put(None)
+            for process in processes:
+                process.join(timeout=60)
+        return stage_time
+    
+    def _save_intermediate_results(self, kind: str, payload: Dict) -> None:
+        """
+        Append one checkpoint entry to prevent data loss.
+        
+        The checkpoint is JSON Lines, so each save costs one appended line
+        instead of rewriting every result collected so far.
+        """
+        entry = {'kind': kind, 'fingerprint': self.fingerprint, 'timestamp': datetime.now().isoformat()}
+        entry.update(payload)
+        with open(self._checkpoint_file(), 'a') as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
     
     def _generate_reports(self) -> None:
-        """Generate comprehensive benchmark reports."""
+        """
+        Generate comprehensive benchmark reports.
+        
+        pandas, matplotlib and seaborn are imported by the report methods
+        themselves, so runs that fail before reporting never load them.
+        """
         # Save detailed results
         self._save_detailed_results()
         
@@ -317,6 +1058,9 @@ class FaceRecognitionBenchmark:
         # Generate visualizations
         self._generate_visualizations()
         
+        # ROC/DET curves of the all-pairs sweep
+        self._generate_curve_plots()
+        
         # Generate markdown report
         self._generate_markdown_report()
         
@@ -330,7 +1074,8 @@ class FaceRecognitionBenchmark:
                 'benchmark_info': {
                     'timestamp': datetime.now().isoformat(),
                     'total_combinations': len(self.results),
-                    'system_info': self.system_info
+                    'system_info': self.system_info,
+                    'run_info': self.run_info
                 },
                 'results': self.results,
                 'errors': self.error_log
@@ -338,6 +1083,8 @@ class FaceRecognitionBenchmark:
     
     def _generate_csv_summary(self) -> None:
         """Generate CSV summary of results."""
+        import pandas as pd
+        
         if not self.results:
             return
         
@@ -354,12 +1101,36 @@ class FaceRecognitionBenchmark:
                     'F1_Score': result['f1_score'],
                     'Avg_Processing_Time_s': result['avg_processing_time'],
                     'Std_Processing_Time_s': result['std_processing_time'],
+                    'P50_Processing_Time_s': result.get('p50_processing_time'),
+                    'P90_Processing_Time_s': result.get('p90_processing_time'),
+                    'P99_Processing_Time_s': result.get('p99_processing_time'),
+                    'Avg_Detection_Time_s': result.get('avg_detection_time'),
+                    'Avg_Embedding_Time_s': result.get('avg_embedding_time'),
+                    'Cached_Detection_Times': result.get('cached_detection_times'),
                     'Avg_Memory_Usage_MB': result['avg_memory_usage_mb'],
                     'Max_Memory_Usage_MB': result['max_memory_usage_mb'],
+                    'Peak_RSS_MB': result.get('peak_rss_mb'),
+                    'Python_Heap_Peak_MB': result.get('python_heap_peak_mb'),
+                    'Cascade_Tier_Hits': (' '.join(f"{tier}:{hits}" for tier, hits in result['cascade_tier_hits'].items())
+                                          if result.get('cascade_tier_hits') else None),
                     'Successful_Pairs': result['successful_pairs'],
                     'Failed_Pairs': result['failed_pairs'],
                     'Total_Pairs': result['total_pairs']
                 })
+                # Compact storage: accuracy change and memory saved against float64
+                for dtype, storage in (result.get('compact_storage') or {}).items():
+                    if dtype != 'float64':
+                        csv_data[-1].update({
+                            f'Accuracy_Delta_{dtype}': storage['accuracy_delta'],
+                            f'Memory_Saved_{dtype}': storage['saved_fraction']
+                        })
+                # All-pairs sweep, one AUC/EER/best threshold triple per metric
+                for metric, sweep in (result.get('all_pairs') or {}).items():
+                    csv_data[-1].update({
+                        f'AUC_{metric}': sweep.get('auc'),
+                        f'EER_{metric}': sweep.get('eer'),
+                        f'Best_Threshold_{metric}': sweep.get('best_threshold')
+                    })
         
         if csv_data:
             df = pd.DataFrame(csv_data)
@@ -368,6 +1139,10 @@ class FaceRecognitionBenchmark:
     
     def _generate_visualizations(self) -> None:
         """Generate benchmark visualization plots."""
+        import pandas as pd
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         if not self.results:
             return
         
@@ -451,6 +1226,42 @@ class FaceRecognitionBenchmark:
         
         logger.info("Visualizations saved")
     
+    def _generate_curve_plots(self, metric: str = 'cosine') -> None:
+        """ROC and DET curves of the all-pairs sweep for one distance metric."""
+        import matplotlib.pyplot as plt
+        
+        swept = [r for r in self.results if r.get('all_pairs', {}).get(metric, {}).get('curve')]
+        if not swept:
+            return
+        
+        fig, (roc_ax, det_ax) = plt.subplots(1, 2, figsize=(16, 7))
+        fig.suptitle(f'All-Pairs ROC and DET Curves ({metric})', fontsize=14, fontweight='bold')
+        for result in swept:
+            sweep = result['all_pairs'][metric]
+            fpr, tpr = np.array(sweep['curve']['fpr']), np.array(sweep['curve']['tpr'])
+            label = f"{result['detector']} + {result['model']} (EER {sweep['eer']:.3f})"
+            roc_ax.plot(fpr, tpr, label=label)
+            det_ax.plot(fpr, 1 - tpr, label=label)
+        
+        roc_ax.plot([0, 1], [0, 1], 'k--', alpha=0.3)
+        roc_ax.set_xlabel('False Accept Rate')
+        roc_ax.set_ylabel('True Accept Rate')
+        roc_ax.set_title('ROC')
+        det_ax.set_xscale('log')
+        det_ax.set_yscale('log')
+        det_ax.set_xlabel('False Accept Rate')
+        det_ax.set_ylabel('False Reject Rate')
+        det_ax.set_title('DET')
+        for ax in (roc_ax, det_ax):
+            ax.grid(True, alpha=0.3)
+            ax.legend(fontsize=8)
+        
+        plt.tight_layout()
+        plt.savefig(self.output_dir / "roc_det_curves.png", dpi=150, bbox_inches='tight')
+        plt.close()
+        
+        logger.info("ROC/DET curves saved")
+    
     def _generate_markdown_report(self) -> None:
         """Generate a comprehensive markdown report."""
         if not self.results:
@@ -472,7 +1283,20 @@ class FaceRecognitionBenchmark:
 - **CPU Cores**: {self.system_info['cpu_count']}
 - **Total Memory**: {self.system_info['memory_total_gb']} GB
 - **Python Version**: {self.system_info['python_version'].split()[0]}
+"""
+        
+        if self.run_info:
+            report_content += f"""
+## Execution
 
+- **Workers**: {self.run_info['workers']}
+- **Resumed Combinations**: {self.run_info.get('resumed_combinations', 0)}
+- **Wall-Clock Time**: {self.run_info['wall_clock_time_s']:.1f}s
+- **Serial-Equivalent Time**: {self.run_info['serial_equivalent_time_s']:.1f}s
+- **Speedup**: {self.run_info['speedup'] or 0:.2f}x
+"""
+        
+        report_content += """
 ## Performance Overview
 
 """
@@ -502,15 +1326,74 @@ class FaceRecognitionBenchmark:
 
 ### Detailed Results
 
-| Detector | Model | Accuracy | Precision | Recall | F1-Score | Avg Time (s) | Memory (MB) |
-|----------|-------|----------|-----------|--------|----------|--------------|-------------|
+| Detector | Model | Accuracy | Precision | Recall | F1-Score | Avg Time (s) | Detection (s) | Embedding (s) | Memory (MB) |
+|----------|-------|----------|-----------|--------|----------|--------------|---------------|---------------|-------------|
 """
             
             # Sort by accuracy for detailed table
             sorted_results = sorted(successful_results, key=lambda x: x['accuracy'], reverse=True)
             
             for result in sorted_results:
-                report_content += f"| {result['detector']} | {result['model']} | {result['accuracy']:.4f} | {result['precision']:.4f} | {result['recall']:.4f} | {result['f1_score']:.4f} | {result['avg_processing_time']:.3f} | {result['avg_memory_usage_mb']:.1f} |\n"
+                report_content += f"| {result['detector']} | {result['model']} | {result['accuracy']:.4f} | {result['precision']:.4f} | {result['recall']:.4f} | {result['f1_score']:.4f} | {result['avg_processing_time']:.3f} | {result.get('avg_detection_time', np.nan):.3f} | {result.get('avg_embedding_time', np.nan):.3f} | {result['avg_memory_usage_mb']:.1f} |\n"
+            
+            report_content += f"""
+### Latency and Memory
+
+Latencies are per verification pair, timed with `perf_counter_ns` after {self.warmup_iterations} untimed warm-up call(s) per detector and model. Detection and embedding times read from the crop or embedding cache of an earlier run are reused, not re-measured; the `Cached_Detection_Times` column of the CSV counts those images per combination. Memory is measured for this process only: peak RSS increase while an image is processed (sampled every {self.memory_sample_interval * 1000:.0f} ms by a thread running alongside the timed call) and absolute peak RSS. The Python heap peak (tracemalloc) comes from one extra, untimed embedding call on the first image of each combination, since tracing would slow down the timed calls.
+
+| Detector | Model | p50 (ms) | p90 (ms) | p99 (ms) | Avg Peak RSS Increase (MB) | Peak RSS (MB) | Python Heap Peak (MB) |
+|----------|-------|----------|----------|----------|----------------------------|---------------|-----------------------|
+"""
+            for result in sorted_results:
+                report_content += f"| {result['detector']} | {result['model']} | {result.get('p50_processing_time', np.nan) * 1000:.1f} | {result.get('p90_processing_time', np.nan) * 1000:.1f} | {result.get('p99_processing_time', np.nan) * 1000:.1f} | {result['avg_memory_usage_mb']:.1f} | {result.get('peak_rss_mb', np.nan):.1f} | {result.get('python_heap_peak_mb', np.nan):.2f} |\n"
+            
+            cascade_results = [r for r in sorted_results if r.get('cascade_tier_hits')]
+            if cascade_results:
+                report_content += f"""
+### Detector Cascade
+
+Cascade detectors run their tiers in order and only escalate when a tier finds no face or its best confidence is below {self.cascade_min_confidence}. Share of images whose crops came from each tier:
+
+| Detector | Model | Tier Hits | Avg Detection (s) | Accuracy |
+|----------|-------|-----------|-------------------|----------|
+"""
+                for result in cascade_results:
+                    hits = result['cascade_tier_hits']
+                    total = sum(hits.values())
+                    tier_hits = ', '.join(f"{tier} {count / total:.0%}" for tier, count in hits.items())
+                    report_content += f"| {result['detector']} | {result['model']} | {tier_hits} | {result.get('avg_detection_time', np.nan):.3f} | {result['accuracy']:.4f} |\n"
+        
+            swept_results = [r for r in sorted_results if r.get('all_pairs')]
+            if swept_results:
+                report_content += """
+### All-Pairs Threshold Sweep
+
+Every embedded image is compared with every other image (one embedding per image, the largest face) for each distance metric; same-identity pairs are genuine. EER is where false accepts equal false rejects, the best threshold maximises TPR - FPR, and TPR/FPR @ default use DeepFace's threshold for the model.
+
+| Detector | Model | Metric | Genuine / Impostor Pairs | AUC | EER | EER Threshold | Best Threshold | TPR / FPR @ Best | TPR / FPR @ Default | Sweep (s) |
+|----------|-------|--------|--------------------------|-----|-----|---------------|----------------|------------------|---------------------|-----------|
+"""
+                for result in swept_results:
+                    for metric, sweep in result['all_pairs'].items():
+                        if 'auc' not in sweep:
+                            continue
+                        report_content += f"| {result['detector']} | {result['model']} | {metric} | {sweep['genuine_pairs']} / {sweep['impostor_pairs']} | {sweep['auc']:.4f} | {sweep['eer']:.4f} | {sweep['eer_threshold']:.4f} | {sweep['best_threshold']:.4f} | {sweep['best_tpr']:.3f} / {sweep['best_fpr']:.3f} | {sweep.get('default_tpr', np.nan):.3f} / {sweep.get('default_fpr', np.nan):.3f} | {result['all_pairs_time_s']:.3f} |\n"
+        
+            storage_results = [r for r in sorted_results if r.get('compact_storage')]
+            if storage_results:
+                report_content += """
+### Compact Embedding Storage
+
+The test pairs are verified again (cosine, default threshold, largest face per image) from embeddings stored as float32, float16 and int8 with a per-row scale; distances are computed on the stored codes. Memory covers codes, scales and norms, saved is relative to float64 arrays; JSON is the size of the same embeddings as float lists.
+
+| Detector | Model | Storage | Accuracy | Change | Flipped Pairs | Max Distance Error | Memory (KB) | Disk (KB) | Saved |
+|----------|-------|---------|----------|--------|---------------|--------------------|-------------|-----------|-------|
+"""
+                for result in storage_results:
+                    for dtype, storage in result['compact_storage'].items():
+                        size_note = (f"{storage['disk_bytes'] / 1024:.1f}" if 'disk_bytes' in storage
+                                     else f"{storage['json_bytes'] / 1024:.1f} (JSON)")
+                        report_content += f"| {result['detector']} | {result['model']} | {dtype} | {storage['accuracy']:.4f} | {storage['accuracy_delta']:+.4f} | {storage['flipped']} | {storage['max_distance_error']:.2e} | {storage['memory_bytes'] / 1024:.1f} | {size_note} | {storage['saved_fraction']:.0%} |\n"
         
         if self.error_log:
             report_content += f"""
@@ -539,6 +1422,7 @@ Based on the benchmark results:
 - `benchmark_summary.csv`: Tabular summary of all results
 - `detailed_results.json`: Complete benchmark data with all metrics
 - `benchmark_visualizations.png`: Performance comparison charts
+- `roc_det_curves.png`: ROC and DET curves of the all-pairs sweep (cosine)
 - `benchmark_report.md`: This report
 
 ---
@@ -552,24 +1436,249 @@ Based on the benchmark results:
         
         logger.info("Markdown report generated")
 
+def _benchmark_worker(worker_id: int, bench_args: Tuple, tf_threads: int, task_queue, result_queue) -> None:
+    """Worker process for --workers: runs detection stages and combinations sent by the parent."""
+    # Set in the child only, before TensorFlow is imported, so the parent's environment stays untouched
+    for var in ('TF_NUM_INTRAOP_THREADS', 'OMP_NUM_THREADS'):
+        os.environ[var] = str(tf_threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except Exception:
+        # Already initialised; the environment variables above apply instead
+        pass
+    
+    benchmark = FaceRecognitionBenchmark(*bench_args)
+    
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        
+        if task[0] == 'detect':
+            _, detector, image_paths = task
+            elapsed = benchmark.run_detection_stage(detector, image_paths)
+            errors = {k: v for k, v in benchmark.detection_errors.items() if k[1] == detector}
+            measured = [path for path, d in benchmark.crop_store.measured if d == detector]
+            result_queue.put(('detected', detector, elapsed, errors, measured))
+            continue
+        
+        _, detector, model, test_pairs, errors, measured = task
+        benchmark.detection_errors.update(errors)
+        # Crops detected by another worker in this run are fresh measurements, not cached ones
+        benchmark.crop_store.measured.update((path, detector) for path in measured)
+        try:
+            result_queue.put(('result', benchmark.benchmark_single_combination(detector, model, test_pairs)))
+        except Exception as e:
+            result_queue.put(('error', detector, model, str(e), traceback.format_exc()))
+
+def run_index_benchmark(output_dir: str, n_vectors: int = 100000, dim: int = 512, n_queries: int = 500,
+                        top_k: int = 10, n_probes: List[int] = None, n_identities: int = None) -> List[Dict]:
+    """
+    Compare gallery index types on synthetic clustered embeddings.
+
+    Every index is scored against the exact search: recall@k is the fraction
+    of the true top-k ids it returns, queries/sec is measured over all
+    queries. IVF is also reopened from its memory-mapped files to show the
+    restart cost without a rebuild.
+
+    Args:
+        output_dir: Directory to save index_benchmark.csv
+        n_vectors: Number of gallery embeddings
+        dim: Embedding dimensions (512 matches Facenet512/ArcFace)
+        n_queries: Number of probe embeddings
+        top_k: k for recall@k
+        n_probes: IVF n_probe values to sweep
+        n_identities: Number of synthetic identities (default n_vectors / 5)
+
+    Returns:
+        List of result rows
+    """
+    import pandas as pd
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0)
+    n_identities = n_identities or max(1, n_vectors // 5)
+
+    logger.info(f"Index benchmark: {n_vectors} vectors, {dim} dims, {n_queries} queries, recall@{top_k}")
+    centers = rng.normal(size=(n_identities, dim)).astype(np.float32)
+    gallery = centers[rng.integers(0, n_identities, n_vectors)] + 0.3 * rng.normal(size=(n_vectors, dim)).astype(np.float32)
+    queries = gallery[rng.integers(0, n_vectors, n_queries)] + 0.1 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+
+    def measure(index_type: str, params: str, search, build_time: float, truth=None) -> Dict:
+        start_time = time.perf_counter()
+        ids, _ = search()
+        elapsed = time.perf_counter() - start_time
+        recall = 1.0 if truth is None else float(np.mean(
+            [len(set(found) & set(expected)) / top_k for found, expected in zip(ids, truth)]
+        ))
+        recall_at_1 = 1.0 if truth is None else float(np.mean(ids[:, 0] == truth[:, 0]))
+        row = {
+            'Index': index_type,
+            'Params': params,
+            'Build_Time_s': round(build_time, 3),
+            'Recall@1': round(recall_at_1, 4),
+            f'Recall@{top_k}': round(recall, 4),
+            'Queries_Per_Sec': round(n_queries / elapsed, 1),
+            'Avg_Query_Latency_ms': round(elapsed / n_queries * 1000, 3)
+        }
+        logger.info(f"{index_type} ({params}): recall@1={row['Recall@1']:.4f}, recall@{top_k}={row[f'Recall@{top_k}']:.4f}, {row['Queries_Per_Sec']:.1f} q/s")
+        return row
+
+    rows = []
+    start_time = time.perf_counter()
+    exact = embedding_index.build_index('exact', gallery)
+    build_time = time.perf_counter() - start_time
+    truth, _ = exact.search(queries, 'cosine', top_k)
+    rows.append(measure('exact', '-', lambda: exact.search(queries, 'cosine', top_k), build_time))
+
+    start_time = time.perf_counter()
+    ivf = embedding_index.build_index('ivf', gallery)
+    build_time = time.perf_counter() - start_time
+    for n_probe in n_probes or [1, 4, 16, 64]:
+        rows.append(measure('ivf', f"n_lists={ivf.n_lists}, n_probe={n_probe}",
+                            lambda: ivf.search(queries, 'cosine', top_k, n_probe=n_probe), build_time, truth))
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        ivf.save(index_dir)
+        start_time = time.perf_counter()
+        reopened = embedding_index.load_index(index_dir)
+        reopen_time = time.perf_counter() - start_time
+        rows.append(measure('ivf (mmap reopen)', f"n_lists={reopened.n_lists}, n_probe={reopened.n_probe}",
+                            lambda: reopened.search(queries, 'cosine', top_k), reopen_time, truth))
+        del reopened
+
+    pd.DataFrame(rows).to_csv(output_path / "index_benchmark.csv", index=False)
+    logger.info(f"Index benchmark saved to {output_path / 'index_benchmark.csv'}")
+    return rows
+
+def run_sweep_benchmark(output_dir: str, identity_counts: List[int] = None, images_per_identity: int = 5,
+                        dim: int = 512, block_size: int = 1024) -> List[Dict]:
+    """
+    Scale the all-pairs threshold sweep on synthetic identities.
+
+    For each identity count, every image is compared with every other one for
+    all distance metrics. Time and memory are measured around the sweep only,
+    not the data generation.
+
+    Args:
+        output_dir: Directory to save sweep_benchmark.csv
+        identity_counts: Numbers of synthetic identities to sweep
+        images_per_identity: Images per identity
+        dim: Embedding dimensions (512 matches Facenet512/ArcFace)
+        block_size: Rows per distance block
+
+    Returns:
+        List of result rows
+    """
+    import pandas as pd
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for n_identities in identity_counts or [100, 1000, 5000]:
+        embeddings, labels = threshold_sweep.synthetic_embeddings(n_identities, images_per_identity, dim)
+        n_images = len(embeddings)
+        n_pairs = n_images * (n_images - 1) // 2
+
+        with MemoryMonitor() as monitor:
+            start_time = time.perf_counter()
+            sweep = threshold_sweep.all_pairs_sweep(embeddings, labels, block_size=block_size)
+            elapsed = time.perf_counter() - start_time
+
+        row = {
+            'Identities': n_identities,
+            'Images': n_images,
+            'Pairs': n_pairs,
+            'Metrics': len(sweep),
+            'Sweep_Time_s': round(elapsed, 3),
+            'Pairs_Per_Sec': round(n_pairs * len(sweep) / elapsed),
+            'Peak_RSS_Increase_MB': round(monitor.usage['peak_rss_delta_mb'], 1),
+            'Python_Heap_Peak_MB': round(monitor.usage['python_heap_peak_mb'], 1),
+            'Full_Matrix_MB': round(n_images ** 2 * 4 / 1024 ** 2, 1)
+        }
+        for metric, summary in sweep.items():
+            row[f'EER_{metric}'] = round(summary['eer'], 4)
+        rows.append(row)
+        logger.info(f"Sweep: {n_images} images, {n_pairs} pairs x {len(sweep)} metrics in {elapsed:.2f}s, "
+                    f"peak RSS +{row['Peak_RSS_Increase_MB']:.1f} MB (full matrix would be {row['Full_Matrix_MB']:.1f} MB)")
+
+    pd.DataFrame(rows).to_csv(output_path / "sweep_benchmark.csv", index=False)
+    logger.info(f"Sweep benchmark saved to {output_path / 'sweep_benchmark.csv'}")
+    return rows
+
 def main():
     """Main function to run the benchmark."""
     parser = argparse.ArgumentParser(description="Face Recognition Benchmarking Tool")
-    parser.add_argument("--test-dir", required=True, help="Directory containing test images")
+    parser.add_argument("--test-dir", help="Directory containing test images")
     parser.add_argument("--output-dir", default="benchmark_results", help="Output directory for results")
     parser.add_argument("--detectors", nargs="+", help="Specific detectors to test")
     parser.add_argument("--models", nargs="+", help="Specific models to test")
     parser.add_argument("--quick", action="store_true", help="Run quick benchmark with limited combinations")
+    parser.add_argument("--cache-dir", help="Directory for the on-disk embedding cache (reused across runs)")
+    parser.add_argument("--crop-dir", help="Directory for detected face crops (default: <output-dir>/face_crops)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for detection stages and combinations (default: 1, serial)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="Untimed warm-up calls per detector and model before measuring (default: 1)")
+    parser.add_argument("--memory-sample-ms", type=float, default=5,
+                        help="RSS sampling interval in ms for peak memory tracking (default: 5)")
+    parser.add_argument("--max-input-side", type=int, nargs="+",
+                        help="Also run each detector on images downscaled to these longest sides "
+                             "(0 = original size), e.g. --max-input-side 0 640 320")
+    parser.add_argument("--cascade-min-confidence", type=float, default=0.9,
+                        help="Confidence a cascade tier (e.g. --detectors opencv+retinaface) needs "
+                             "before escalation is skipped (default: 0.9)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip combinations already checkpointed in --output-dir for the same dataset and config")
+    parser.add_argument("--index-benchmark", action="store_true",
+                        help="Benchmark gallery index types (recall@k, queries/sec) on synthetic embeddings")
+    parser.add_argument("--index-size", type=int, default=100000, help="Gallery size for --index-benchmark")
+    parser.add_argument("--index-dim", type=int, default=512, help="Embedding dimensions for --index-benchmark")
+    parser.add_argument("--index-k", type=int, default=10, help="k for recall@k in --index-benchmark")
+    parser.add_argument("--sweep-benchmark", action="store_true",
+                        help="Time the all-pairs threshold sweep on synthetic identities")
+    parser.add_argument("--sweep-identities", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="Identity counts for --sweep-benchmark (default: 100 1000 5000)")
+    parser.add_argument("--sweep-images-per-identity", type=int, default=5,
+                        help="Images per identity for --sweep-benchmark (default: 5)")
+    parser.add_argument("--sweep-block-size", type=int, default=1024,
+                        help="Rows per distance block for --sweep-benchmark (default: 1024)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print cold import times of this script and of the libraries it loads lazily, then exit")
     
     args = parser.parse_args()
     
+    if args.profile_startup:
+        lazy_import.print_import_profile(['benchmark'], ['deepface.DeepFace', 'pandas', 'matplotlib.pyplot', 'seaborn'])
+        return
+    
+    if args.index_benchmark:
+        run_index_benchmark(args.output_dir, n_vectors=args.index_size, dim=args.index_dim, top_k=args.index_k)
+        return
+    
+    if args.sweep_benchmark:
+        run_sweep_benchmark(args.output_dir, args.sweep_identities, args.sweep_images_per_identity,
+                            dim=args.index_dim, block_size=args.sweep_block_size)
+        return
+    
+    if not args.test_dir:
+        parser.error("--test-dir is required")
+    
     # Validate test directory
     if not os.path.exists(args.test_dir):
         logger.error(f"Test directory not found: {args.test_dir}")
         sys.exit(1)
     
     # Initialize benchmark
-    benchmark = FaceRecognitionBenchmark(args.test_dir, args.output_dir)
+    benchmark = FaceRecognitionBenchmark(args.test_dir, args.output_dir, args.cache_dir, args.crop_dir,
+                                         warmup_iterations=args.warmup,
+                                         memory_sample_interval=args.memory_sample_ms / 1000,
+                                         cascade_min_confidence=args.cascade_min_confidence)
     
     # Set up test parameters
     detectors = args.detectors
@@ -581,9 +1690,14 @@ def main():
         models = models or ['VGG-Face', 'Facenet', 'ArcFace']
         logger.info("Running quick benchmark")
     
+    if args.max_input_side:
+        detectors = [detector_variant(d, side)
+                     for d in detectors or FaceRecognitionBenchmark.SUPPORTED_DETECTORS
+                     for side in args.max_input_side]
+    
     try:
         # Run benchmark
-        benchmark.run_comprehensive_benchmark(detectors, models)
+        benchmark.run_comprehensive_benchmark(detectors, models, workers=args.workers, resume=args.resume)
         logger.info("Benchmark completed successfully!")
         
     except KeyboardInterrupt:
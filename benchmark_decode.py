@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Image Decode Micro-Benchmark
+============================
+Compares the request decode paths used by app.py:
+
+- ``tempfile``: base64 decode -> cv2.imdecode -> cv2.imwrite to a temp file ->
+  cv2.imread (what DeepFace did when given the temp file path)
+- ``base64``: base64 decode -> cv2.imdecode, array passed straight to DeepFace
+- ``raw``: cv2.imdecode on raw uploaded bytes (multipart / octet-stream)
+
+Usage:
+    python benchmark_decode.py --test-dir benchmark_data/test_images --iterations 20
+"""
+
+import os
+import sys
+import time
+import base64
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import cv2
+
+
+def decode_via_tempfile(b64_data: str) -> np.ndarray:
+    """Old path: decode, re-encode to a temp JPEG and read it back."""
+    img = cv2.imdecode(np.frombuffer(base64.b64decode(b64_data), np.uint8), cv2.IMREAD_COLOR)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
+        temp_path = temp_file.name
+    try:
+        cv2.imwrite(temp_path, img)
+        return cv2.imread(temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def decode_base64(b64_data: str) -> np.ndarray:
+    """New path for JSON clients: decode once, keep the array in memory."""
+    return cv2.imdecode(np.frombuffer(base64.b64decode(b64_data), np.uint8), cv2.IMREAD_COLOR)
+
+
+def decode_raw(raw_data: bytes) -> np.ndarray:
+    """New path for multipart / octet-stream clients."""
+    return cv2.imdecode(np.frombuffer(raw_data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def time_path(func: Callable, payloads: List, iterations: int) -> List[float]:
+    """Run a decode path over every payload and return per-call times in ms."""
+    times = []
+    for _ in range(iterations):
+        for payload in payloads:
+            start = time.perf_counter()
+            func(payload)
+            times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image decode micro-benchmark")
+    parser.add_argument("--test-dir", default="benchmark_data/test_images", help="Directory containing test images")
+    parser.add_argument("--iterations", type=int, default=10, help="Passes over the image set per decode path")
+    args = parser.parse_args()
+
+    image_files = [p for p in Path(args.test_dir).rglob("*") if p.suffix.lower() in ('.jpg', '.jpeg', '.png')]
+    if not image_files:
+        print(f"No images found in {args.test_dir}")
+        sys.exit(1)
+
+    raw_payloads = [p.read_bytes() for p in image_files]
+    b64_payloads = [base64.b64encode(raw).decode('ascii') for raw in raw_payloads]
+
+    raw_size = sum(len(p) for p in raw_payloads)
+    b64_size = sum(len(p) for p in b64_payloads)
+    print(f"{len(image_files)} images, raw payload {raw_size / 1024:.0f} KB, "
+          f"base64 payload {b64_size / 1024:.0f} KB (+{(b64_size / raw_size - 1) * 100:.0f}%)")
+
+    paths: Dict[str, tuple] = {
+        'tempfile': (decode_via_tempfile, b64_payloads),
+        'base64': (decode_base64, b64_payloads),
+        'raw': (decode_raw, raw_payloads),
+    }
+
+    results = {}
+    for name, (func, payloads) in paths.items():
+        time_path(func, payloads[:1], 1)  # warm-up
+        results[name] = time_path(func, payloads, args.iterations)
+
+    baseline = np.mean(results['tempfile'])
+    print(f"\n{'Path':<10} {'Mean (ms)':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'Speedup':>8}")
+    for name, times in results.items():
+        print(f"{name:<10} {np.mean(times):>10.2f} {np.percentile(times, 50):>10.2f} "
+              f"{np.percentile(times, 99):>10.2f} {baseline / np.mean(times):>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
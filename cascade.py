@@ -0,0 +1,104 @@
+"""
+Detector Cascade
+================
+Tiered face detection: a fast detector (opencv, yunet) runs first and a slower,
+more accurate one (retinaface, mtcnn) only runs when the previous tier finds no
+face or its best confidence is below ``min_confidence``.
+
+A cascade is named by its tiers joined with ``+`` (``opencv+retinaface``);
+``cascade`` alone means ``DEFAULT_TIERS``. Every call records which tier
+produced the result, so the share of escalations can be monitored.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from preprocessing import is_detected
+
+CASCADE_DETECTOR = 'cascade'
+DEFAULT_TIERS = ['opencv', 'retinaface']
+
+
+def cascade_tiers(name: str) -> List[str]:
+    """Tiers of a cascade detector name, or None if ``name`` is a single detector."""
+    if name == CASCADE_DETECTOR:
+        return list(DEFAULT_TIERS)
+    if '+' in name:
+        return name.split('+')
+    return None
+
+
+def best_confidence(faces: List[Dict]) -> float:
+    """Highest confidence among detected faces (1.0 if the detector reports none, 0.0 if no face)."""
+    detected = [face for face in faces if is_detected(face)]
+    if not detected:
+        return 0.0
+    return max(1.0 if face.get('confidence') is None else face['confidence'] for face in detected)
+
+
+class DetectorCascade:
+    """
+    Runs detectors in order until one is confident, with per-tier hit counts.
+
+    Args:
+        tiers: Detector backends, fastest first
+        min_confidence: Best face confidence a tier needs for its result to be accepted
+    """
+
+    def __init__(self, tiers: List[str], min_confidence: float = 0.9):
+        if not tiers:
+            raise ValueError("A detector cascade needs at least one tier")
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+        self.lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            # Tier whose result was accepted
+            'tier_hits': {tier: 0 for tier in self.tiers},
+            # Tier was run (escalations reach the later tiers)
+            'tier_runs': {tier: 0 for tier in self.tiers},
+            # No tier was confident; the most confident result was returned
+            'unresolved': 0
+        }
+
+    def detect(self, img: Any, detect_fn: Callable[[Any, str], List[Dict]]) -> Tuple[List[Dict], str]:
+        """
+        Detect faces with ``detect_fn(img, backend)``, escalating through the tiers.
+
+        Returns:
+            (faces, tier) where tier is the backend whose faces were returned
+        """
+        best = None
+        for tier in self.tiers:
+            faces = detect_fn(img, tier)
+            confidence = best_confidence(faces)
+            with self.lock:
+                self.stats['tier_runs'][tier] += 1
+            if confidence >= self.min_confidence:
+                with self.lock:
+                    self.stats['calls'] += 1
+                    self.stats['tier_hits'][tier] += 1
+                return faces, tier
+            # Ties go to the later, more accurate tier
+            if best is None or confidence >= best[0]:
+                best = (confidence, faces, tier)
+
+        with self.lock:
+            self.stats['calls'] += 1
+            self.stats['unresolved'] += 1
+        return best[1], best[2]
+
+    def info(self) -> Dict:
+        with self.lock:
+            calls = self.stats['calls']
+            return {
+                'tiers': self.tiers,
+                'min_confidence': self.min_confidence,
+                'calls': calls,
+                'tier_hits': dict(self.stats['tier_hits']),
+                'tier_runs': dict(self.stats['tier_runs']),
+                'unresolved': self.stats['unresolved'],
+                'tier_hit_rate': {tier: hits / calls if calls else 0.0
+                                  for tier, hits in self.stats['tier_hits'].items()},
+                'avg_tiers_per_call': sum(self.stats['tier_runs'].values()) / calls if calls else 0.0
+            }
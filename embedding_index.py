@@ -0,0 +1,236 @@
+"""
+Embedding Index
+===============
+Pluggable nearest-neighbour indexes for the identification gallery.
+
+- ``ExactIndex``: brute-force scan, always exact (default)
+- ``IVFIndex``: inverted-file index in pure NumPy. Vectors are clustered with
+  spherical k-means and only the ``n_probe`` closest clusters are scanned per
+  query; raising ``n_probe`` trades latency for recall.
+
+Indexes are saved as a directory of ``.npy`` files plus ``meta.json`` and are
+reopened with ``np.load(mmap_mode='r')``, so a restarted worker maps the
+existing files instead of rebuilding the index.
+"""
+
+import json
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+import face_engine
+
+INDEX_TYPES = ['exact', 'ivf']
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest distances, sorted ascending."""
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+    return top[np.argsort(distances[top])]
+
+
+def _pad_results(ids: list, dists: list, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack per-query results into (n_queries, k) arrays, padding with -1 / inf."""
+    out_ids = np.full((len(ids), k), -1, dtype=np.int64)
+    out_dists = np.full((len(ids), k), np.inf, dtype=np.float32)
+    for i, (row_ids, row_dists) in enumerate(zip(ids, dists)):
+        out_ids[i, :len(row_ids)] = row_ids
+        out_dists[i, :len(row_dists)] = row_dists
+    return out_ids, out_dists
+
+
+class ExactIndex:
+    """Brute-force index: one matrix product against every stored vector."""
+
+    kind = 'exact'
+
+    def __init__(self, vectors: np.ndarray, norms: np.ndarray = None):
+        self.vectors = vectors
+        self.norms = norms if norms is not None else np.linalg.norm(vectors, axis=1).astype(np.float32)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, distance_metric: str = 'cosine', k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (ids, distances), both shaped (n_queries, k), closest first.
+
+        Missing results (fewer than k vectors) are padded with id -1.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(self.vectors) == 0:
+            return _pad_results([[]] * len(queries), [[]] * len(queries), k)
+
+        distances = face_engine.find_distances(self.vectors, queries, distance_metric, row_norms=self.norms)
+        ids, dists = [], []
+        for row in np.atleast_2d(distances):
+            top = _top_k(row, k)
+            ids.append(top)
+            dists.append(row[top])
+        return _pad_results(ids, dists, k)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+        np.save(path / "norms.npy", np.ascontiguousarray(self.norms, dtype=np.float32))
+        with open(path / "meta.json", 'w') as f:
+            json.dump({'kind': self.kind, 'size': len(self.vectors)}, f)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> 'ExactIndex':
+        mode = 'r' if mmap else None
+        path = Path(path)
+        return cls(np.load(path / "vectors.npy", mmap_mode=mode), np.load(path / "norms.npy", mmap_mode=mode))
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a spherical k-means coarse quantizer.
+
+    Vectors are stored sorted by cluster so each probed cluster is one
+    contiguous slice (a sequential read when memory-mapped). Candidates from
+    the probed clusters are re-ranked with the exact requested metric.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, vectors: np.ndarray,
+                 norms: np.ndarray, ids: np.ndarray, n_probe: int = 8):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.norms = norms
+        self.ids = ids
+        self.n_probe = n_probe
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: int = None, n_probe: int = None,
+              n_iter: int = 20, max_train: int = 50000, seed: int = 0) -> 'IVFIndex':
+        """
+        Cluster the vectors and lay them out by cluster.
+
+        Args:
+            vectors: (n, dim) embeddings, row i gets id i
+            n_lists: Number of clusters (default ~4*sqrt(n))
+            n_probe: Clusters scanned per query (default n_lists / 16, at least 1)
+            n_iter: k-means iterations
+            max_train: Max vectors sampled to train the centroids
+            seed: Random seed for sampling / initialisation
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(n)))
+        n_lists = max(1, min(n_lists, n))
+        if n_probe is None:
+            n_probe = max(1, n_lists // 16)
+
+        rng = np.random.default_rng(seed)
+        unit = face_engine.l2_normalize(vectors).astype(np.float32)
+        train = unit[rng.choice(n, size=min(n, max_train), replace=False)]
+
+        centroids = train[rng.choice(len(train), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = cls._assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            # Cluster kosong diisi ulang dengan titik acak
+            sums[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+            centroids = face_engine.l2_normalize(sums).astype(np.float32)
+
+        assign = cls._assign(unit, centroids)
+        order = np.argsort(assign, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+        sorted_vectors = vectors[order]
+        return cls(centroids, offsets, sorted_vectors,
+                   np.linalg.norm(sorted_vectors, axis=1).astype(np.float32),
+                   order.astype(np.int64), n_probe)
+
+    @staticmethod
+    def _assign(unit_vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        """Nearest centroid (max cosine similarity) per vector, in chunks to bound memory."""
+        return np.concatenate([
+            np.argmax(unit_vectors[i:i + chunk] @ centroids.T, axis=1)
+            for i in range(0, len(unit_vectors), chunk)
+        ]) if len(unit_vectors) else np.empty(0, dtype=np.int64)
+
+    def search(self, queries: np.ndarray, distance_metric: str = 'cosine', k: int = 10,
+               n_probe: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as ``ExactIndex.search``; ``n_probe`` overrides the default."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+
+        similarity = face_engine.l2_normalize(queries).astype(np.float32) @ self.centroids.T
+        probes = np.argpartition(-similarity, n_probe - 1, axis=1)[:, :n_probe]
+
+        ids, dists = [], []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists])
+            if len(rows) == 0:
+                ids.append([])
+                dists.append([])
+                continue
+            # Slices per cluster are contiguous, so this reads few pages from a memmap
+            candidates = np.concatenate([self.vectors[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            cand_norms = np.concatenate([self.norms[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            distances = face_engine.find_distances(candidates, query, distance_metric, row_norms=cand_norms)
+            top = _top_k(distances, k)
+            ids.append(self.ids[rows[top]])
+            dists.append(distances[top])
+        return _pad_results(ids, dists, k)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ('centroids', 'offsets', 'vectors', 'norms', 'ids'):
+            np.save(path / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        with open(path / "meta.json", 'w') as f:
+            json.dump({'kind': self.kind, 'size': len(self.vectors),
+                       'n_lists': self.n_lists, 'n_probe': self.n_probe}, f)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> 'IVFIndex':
+        mode = 'r' if mmap else None
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mode)
+                  for name in ('centroids', 'offsets', 'vectors', 'norms', 'ids')}
+        # Centroids and offsets are tiny and touched on every query, keep them in RAM
+        arrays['centroids'] = np.array(arrays['centroids'])
+        arrays['offsets'] = np.array(arrays['offsets'])
+        return cls(n_probe=meta['n_probe'], **arrays)
+
+
+def build_index(kind: str, vectors: np.ndarray, **params):
+    """Build an index of the given kind ('exact' or 'ivf')."""
+    if kind == 'exact':
+        return ExactIndex(np.asarray(vectors, dtype=np.float32))
+    if kind == 'ivf':
+        return IVFIndex.build(vectors, **params)
+    raise ValueError(f"Index type '{kind}' not supported.")
+
+
+def load_index(path: Path, mmap: bool = True):
+    """Reopen a saved index, memory-mapping its arrays by default."""
+    with open(Path(path) / "meta.json") as f:
+        kind = json.load(f)['kind']
+    if kind == 'exact':
+        return ExactIndex.load(path, mmap)
+    if kind == 'ivf':
+        return IVFIndex.load(path, mmap)
+    raise ValueError(f"Index type '{kind}' not supported.")
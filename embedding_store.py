@@ -0,0 +1,213 @@
+"""
+Embedding Store
+===============
+Compact, memory-mappable storage for face embeddings.
+
+DeepFace returns embeddings as float64 lists; stored as JSON or float64
+arrays they take 2-8x more memory and disk than verification needs. Rows
+here are kept in one of:
+
+- ``float32``: half of float64, numerically identical for verification
+- ``float16``: a quarter of float64
+- ``int8``: one byte per dimension plus a float32 scale per row
+  (symmetric per-row quantization, ``x ~= code * scale``)
+
+Distances are computed on the compact codes directly: dot products are taken
+against the codes in row blocks and the per-row scale is applied to the
+result, so the full-precision matrix is never rebuilt. Norms of the decoded
+rows are stored alongside, as in the gallery. ``EmbeddingStore`` adds a
+string id -> row map and saves everything as ``.npy`` files that are reopened
+with ``np.load(mmap_mode='r')``.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import face_engine
+
+STORAGE_DTYPES = ['float32', 'float16', 'int8']
+INT8_MAX = 127
+# Rows decoded to float32 at a time while computing distances
+BLOCK_ROWS = 65536
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode embeddings in a storage dtype.
+
+    Returns:
+        (codes, scales): (n, dim) codes and (n,) float32 per-row scales (1.0 unless int8)
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / INT8_MAX
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+        return codes, scales
+    if dtype in ('float32', 'float16'):
+        return vectors.astype(dtype), np.ones(len(vectors), dtype=np.float32)
+    raise ValueError(f"Storage dtype '{dtype}' not supported.")
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Decode codes back to float32 embeddings."""
+    vectors = np.asarray(codes, dtype=np.float32)
+    return vectors * np.asarray(scales)[:, None] if codes.dtype == np.int8 else vectors
+
+
+def compact_distances(codes: np.ndarray, scales: np.ndarray, row_norms: np.ndarray, queries: np.ndarray,
+                      distance_metric: str = 'cosine', block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """
+    ``face_engine.find_distances`` against compact rows.
+
+    Args:
+        codes: (rows, dim) float32/float16/int8 codes
+        scales: (rows,) per-row scales
+        row_norms: (rows,) norms of the decoded rows
+        queries: (dim,) or (n_queries, dim) full-precision query embeddings
+        distance_metric: 'cosine', 'euclidean' or 'euclidean_l2'
+        block_rows: Rows converted to float32 at a time
+
+    Returns:
+        (n_queries, rows) array of distances, (rows,) for a single query
+    """
+    if distance_metric not in face_engine.DISTANCE_METRICS:
+        raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+    queries = np.asarray(queries, dtype=np.float32)
+    single = queries.ndim == 1
+    queries = np.atleast_2d(queries)
+    query_norms = np.linalg.norm(queries, axis=1)[:, None]
+
+    distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+    for start in range(0, len(codes), block_rows):
+        block = slice(start, start + block_rows)
+        # q . (code * scale) = (q . code) * scale
+        dots = (queries @ np.asarray(codes[block], dtype=np.float32).T) * scales[block]
+        distances[:, block] = face_engine.distances_from_dots(dots, query_norms, row_norms[block][None, :],
+                                                              distance_metric)
+    return distances[0] if single else distances
+
+
+class EmbeddingStore:
+    """Compact embedding matrix of one recognition model, addressed by string ids."""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, dim: int, dtype: str = 'float32'):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Storage dtype '{dtype}' not supported.")
+        self.dim = dim
+        self.dtype = dtype
+        self.size = 0
+        self.codes = np.empty((0, dim), dtype=dtype)
+        self.scales = np.empty(0, dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self.ids: List[str] = []
+        self.id_index: Dict[str, int] = {}
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, embedding_id: str) -> bool:
+        return embedding_id in self.id_index
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the arrays geometrically; memory-mapped (read-only) arrays are copied first."""
+        if rows <= len(self.codes) and self.codes.flags.writeable:
+            return
+        capacity = max(rows, 2 * len(self.codes), self.INITIAL_CAPACITY)
+        self.codes = np.resize(self.codes, (capacity, self.dim))
+        self.scales = np.resize(self.scales, capacity)
+        self.norms = np.resize(self.norms, capacity)
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> None:
+        """Store embeddings under the given ids; an existing id is overwritten."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} {self.dim}-d embeddings, got shape {vectors.shape}")
+
+        codes, scales = quantize(vectors, self.dtype)
+        rows = []
+        for embedding_id in ids:
+            if embedding_id not in self.id_index:
+                self.id_index[embedding_id] = len(self.ids)
+                self.ids.append(embedding_id)
+            rows.append(self.id_index[embedding_id])
+
+        self._reserve(len(self.ids))
+        rows = np.array(rows, dtype=np.int64)
+        self.codes[rows] = codes
+        self.scales[rows] = scales
+        self.norms[rows] = np.linalg.norm(dequantize(codes, scales), axis=1)
+        self.size = len(self.ids)
+
+    def rows(self, ids: List[str]) -> np.ndarray:
+        """Row numbers of the given ids (KeyError for unknown ids)."""
+        return np.array([self.id_index[embedding_id] for embedding_id in ids], dtype=np.int64)
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        """Decoded float32 embeddings of the given ids."""
+        rows = self.rows(ids)
+        return dequantize(self.codes[rows], self.scales[rows])
+
+    def distances(self, queries: np.ndarray, distance_metric: str = 'cosine') -> np.ndarray:
+        """Distances from full-precision queries to every stored embedding (columns follow ``ids``)."""
+        return compact_distances(self.codes[:self.size], self.scales[:self.size], self.norms[:self.size],
+                                 queries, distance_metric)
+
+    def pair_distances(self, rows_a: np.ndarray, rows_b: np.ndarray, distance_metric: str = 'cosine') -> np.ndarray:
+        """Distance between stored rows ``rows_a[i]`` and ``rows_b[i]`` for every i, on the codes."""
+        if distance_metric not in face_engine.DISTANCE_METRICS:
+            raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+        codes_a = np.asarray(self.codes[rows_a], dtype=np.float32)
+        codes_b = np.asarray(self.codes[rows_b], dtype=np.float32)
+        dots = np.einsum('ij,ij->i', codes_a, codes_b) * self.scales[rows_a] * self.scales[rows_b]
+        return face_engine.distances_from_dots(dots, self.norms[rows_a], self.norms[rows_b], distance_metric)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the stored rows (codes, scales and norms), excluding spare capacity."""
+        return self.size * (self.codes.itemsize * self.dim + self.scales.itemsize + self.norms.itemsize)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        # Arrays mapped from these same files must be read into memory before overwriting them
+        arrays = {name: np.array(getattr(self, name)[:self.size]) for name in ('codes', 'scales', 'norms')}
+        for name, array in arrays.items():
+            np.save(path / f"{name}.npy", array)
+        with open(path / "ids.json", 'w') as f:
+            json.dump(self.ids, f)
+        with open(path / "meta.json", 'w') as f:
+            json.dump({'dtype': self.dtype, 'dim': self.dim, 'size': self.size}, f)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> 'EmbeddingStore':
+        """Reopen a saved store, memory-mapping its arrays by default."""
+        mode = 'r' if mmap else None
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        store = cls(meta['dim'], meta['dtype'])
+        store.codes = np.load(path / "codes.npy", mmap_mode=mode)
+        store.scales = np.load(path / "scales.npy", mmap_mode=mode)
+        store.norms = np.load(path / "norms.npy", mmap_mode=mode)
+        with open(path / "ids.json") as f:
+            store.ids = json.load(f)
+        store.id_index = {embedding_id: i for i, embedding_id in enumerate(store.ids)}
+        store.size = meta['size']
+        return store
+
+    def info(self) -> Dict:
+        float64_bytes = self.size * self.dim * 8
+        return {
+            'dtype': self.dtype,
+            'embeddings': self.size,
+            'dimensions': self.dim,
+            'memory_bytes': self.nbytes,
+            'float64_bytes': float64_bytes,
+            'saved_fraction': 1 - self.nbytes / float64_bytes if float64_bytes else 0.0
+        }
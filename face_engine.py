@@ -0,0 +1,309 @@
+"""
+Face Engine Helpers
+===================
+Thin helpers around DeepFace used by app.py to compute face embeddings once
+and compare them later without going through ``DeepFace.verify`` again.
+
+The thresholds and distance formulas mirror the ones DeepFace uses in
+``DeepFace.verify`` so results stay compatible with the existing endpoints.
+"""
+
+import time
+from typing import Dict, List, Any, Tuple
+
+import cv2
+import numpy as np
+
+import preprocessing
+from lazy_import import LazyModule
+
+# Imported (with TensorFlow) on first inference, not when this module loads
+DeepFace = LazyModule('deepface.DeepFace')
+
+DISTANCE_METRICS = ['cosine', 'euclidean', 'euclidean_l2']
+
+# Default verification thresholds, identical to DeepFace's own table
+BASE_THRESHOLDS = {'cosine': 0.40, 'euclidean': 0.55, 'euclidean_l2': 0.75}
+THRESHOLDS = {
+    'VGG-Face': {'cosine': 0.68, 'euclidean': 1.17, 'euclidean_l2': 1.17},
+    'Facenet': {'cosine': 0.40, 'euclidean': 10, 'euclidean_l2': 0.80},
+    'Facenet512': {'cosine': 0.30, 'euclidean': 23.56, 'euclidean_l2': 1.04},
+    'ArcFace': {'cosine': 0.68, 'euclidean': 4.15, 'euclidean_l2': 1.13},
+    'Dlib': {'cosine': 0.07, 'euclidean': 0.6, 'euclidean_l2': 0.4},
+    'SFace': {'cosine': 0.593, 'euclidean': 10.734, 'euclidean_l2': 1.055},
+    'OpenFace': {'cosine': 0.10, 'euclidean': 0.55, 'euclidean_l2': 0.55},
+    'DeepFace': {'cosine': 0.23, 'euclidean': 64, 'euclidean_l2': 0.64},
+    'DeepID': {'cosine': 0.015, 'euclidean': 45, 'euclidean_l2': 0.17},
+}
+
+
+def find_threshold(model_name: str, distance_metric: str = 'cosine') -> float:
+    """Return the DeepFace verification threshold for a model and metric."""
+    if distance_metric not in DISTANCE_METRICS:
+        raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+    return THRESHOLDS.get(model_name, BASE_THRESHOLDS)[distance_metric]
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector (or each row of a matrix)."""
+    x = np.asarray(x, dtype=np.float64)
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norm, 1e-10)
+
+
+def find_distance(emb1: np.ndarray, emb2: np.ndarray, distance_metric: str = 'cosine') -> float:
+    """Distance between two embeddings using DeepFace's formulas."""
+    emb1 = np.asarray(emb1, dtype=np.float64)
+    emb2 = np.asarray(emb2, dtype=np.float64)
+
+    if distance_metric == 'cosine':
+        denom = np.linalg.norm(emb1) * np.linalg.norm(emb2)
+        return float(1 - np.dot(emb1, emb2) / max(denom, 1e-10))
+    if distance_metric == 'euclidean':
+        return float(np.linalg.norm(emb1 - emb2))
+    if distance_metric == 'euclidean_l2':
+        return float(np.linalg.norm(l2_normalize(emb1) - l2_normalize(emb2)))
+    raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+
+
+def find_distances(matrix: np.ndarray, queries: np.ndarray, distance_metric: str = 'cosine',
+                   row_norms: np.ndarray = None) -> np.ndarray:
+    """
+    Distances from one or more query embeddings to every row of a matrix.
+
+    Everything is computed from a single matrix product, so the cost is one
+    BLAS call instead of a Python loop over the rows.
+
+    Args:
+        matrix: (rows, dim) embedding matrix
+        queries: (dim,) or (n_queries, dim) query embeddings
+        distance_metric: 'cosine', 'euclidean' or 'euclidean_l2'
+        row_norms: Precomputed L2 norms of the matrix rows (optional)
+
+    Returns:
+        (n_queries, rows) array of distances, (rows,) for a single query
+    """
+    if distance_metric not in DISTANCE_METRICS:
+        raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+
+    queries = np.asarray(queries, dtype=matrix.dtype)
+    single = queries.ndim == 1
+    queries = np.atleast_2d(queries)
+
+    if row_norms is None:
+        row_norms = np.linalg.norm(matrix, axis=1)
+    distances = distances_from_dots(queries @ matrix.T, np.linalg.norm(queries, axis=1)[:, None],
+                                    np.asarray(row_norms)[None, :], distance_metric)
+    return distances[0] if single else distances
+
+
+def distances_from_dots(dots: np.ndarray, query_norms: np.ndarray, row_norms: np.ndarray,
+                        distance_metric: str = 'cosine') -> np.ndarray:
+    """
+    Distances from dot products and L2 norms, so callers that compute the dot
+    products themselves (e.g. on int8 codes, see embedding_store.py) share the formulas.
+
+    Args:
+        dots: Dot products, any shape
+        query_norms: Norms of the left-hand vectors, broadcastable against ``dots``
+        row_norms: Norms of the right-hand vectors, broadcastable against ``dots``
+        distance_metric: 'cosine', 'euclidean' or 'euclidean_l2'
+    """
+    if distance_metric == 'euclidean':
+        squared = query_norms ** 2 + row_norms ** 2 - 2 * dots
+        return np.sqrt(np.maximum(squared, 0))
+    similarity = dots / np.maximum(query_norms * row_norms, 1e-10)
+    if distance_metric == 'cosine':
+        return 1 - similarity
+    # ||a/|a| - b/|b||| = sqrt(2 - 2 cos(a, b))
+    return np.sqrt(np.maximum(2 - 2 * similarity, 0))
+
+
+def paired_distances(a: np.ndarray, b: np.ndarray, distance_metric: str = 'cosine') -> np.ndarray:
+    """Distance between row i of ``a`` and row i of ``b`` for every i, without a Python loop."""
+    if distance_metric not in DISTANCE_METRICS:
+        raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if distance_metric == 'euclidean':
+        return np.linalg.norm(a - b, axis=1)
+    similarity = np.einsum('ij,ij->i', a, b) / np.maximum(
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-10
+    )
+    if distance_metric == 'cosine':
+        return 1 - similarity
+    return np.sqrt(np.maximum(2 - 2 * similarity, 0))
+
+
+def represent(img: Any, detector_backend: str, model_name: str) -> List[Dict]:
+    """
+    Detect every face in an image and embed it.
+
+    Args:
+        img: Image path or BGR numpy array
+        detector_backend: Detector backend name
+        model_name: Recognition model name
+
+    Returns:
+        List of dicts with 'embedding' (numpy array), 'facial_area' and
+        'face_confidence', one per detected face.
+    """
+    faces = DeepFace.represent(
+        img_path=img,
+        model_name=model_name,
+        detector_backend=detector_backend,
+        enforce_detection=False
+    )
+    return [{
+        'embedding': np.asarray(face['embedding'], dtype=np.float64),
+        'facial_area': face['facial_area'],
+        'face_confidence': face.get('face_confidence')
+    } for face in faces]
+
+
+def detect_faces(img: Any, detector_backend: str, max_side: int = None) -> List[Dict]:
+    """
+    Run only the detection/alignment stage.
+
+    Args:
+        img: Image path or BGR numpy array
+        detector_backend: Detector backend name
+        max_side: Downscale so the longest side is at most this many pixels
+                  before detecting (facial areas are still in original pixels)
+
+    Returns:
+        List of dicts with 'face' (aligned BGR uint8 crop), 'facial_area' and
+        'confidence', ready to be passed to ``embed_face`` for any model.
+    """
+    scale = 1.0
+    if max_side:
+        if isinstance(img, str):
+            path, img = img, cv2.imread(img)
+            if img is None:
+                raise ValueError(f"Could not read image {path}")
+        img, scale = preprocessing.downscale(img, max_side)
+
+    faces = DeepFace.extract_faces(
+        img_path=img,
+        detector_backend=detector_backend,
+        enforce_detection=False,
+        align=True
+    )
+    return [{
+        # extract_faces returns RGB floats in [0, 1]; keep compact BGR uint8 like a decoded image
+        'face': np.ascontiguousarray((face['face'][:, :, ::-1] * 255).round().astype(np.uint8)),
+        'facial_area': (preprocessing.transform_facial_area(face['facial_area'], scale)
+                        if scale != 1.0 else face['facial_area']),
+        'confidence': face.get('confidence')
+    } for face in faces]
+
+
+def embed_face(face: np.ndarray, model_name: str) -> np.ndarray:
+    """Embed an already detected and aligned face crop (BGR uint8)."""
+    result = DeepFace.represent(
+        img_path=face,
+        model_name=model_name,
+        detector_backend='skip',
+        enforce_detection=False
+    )
+    return np.asarray(result[0]['embedding'], dtype=np.float64)
+
+
+def embed_faces(faces: List[np.ndarray], model_name: str) -> List[np.ndarray]:
+    """Embed several detected face crops with a single batched forward pass."""
+    if not faces:
+        return []
+    results = DeepFace.represent(
+        img_path=list(faces),
+        model_name=model_name,
+        detector_backend='skip',
+        enforce_detection=False
+    )
+    # DeepFace unwraps the outer list when given a single image
+    if len(faces) == 1:
+        results = [results]
+    return [np.asarray(result[0]['embedding'], dtype=np.float64) for result in results]
+
+
+def verify_faces(ref_faces: List[Dict], target_faces: List[Dict], model_name: str,
+                 detector_backend: str, distance_metric: str = 'cosine',
+                 start_time: float = None) -> Dict:
+    """
+    Compare two lists of embedded faces like ``DeepFace.verify`` does.
+
+    The closest pair of faces decides the result, and the returned dict has
+    the same keys as ``DeepFace.verify`` so clients don't need to change.
+    """
+    if not ref_faces or not target_faces:
+        raise ValueError("No face could be embedded in one or both images")
+
+    best = None
+    for ref_face in ref_faces:
+        for target_face in target_faces:
+            distance = find_distance(ref_face['embedding'], target_face['embedding'], distance_metric)
+            if best is None or distance < best[0]:
+                best = (distance, ref_face, target_face)
+
+    distance, ref_face, target_face = best
+    threshold = find_threshold(model_name, distance_metric)
+    return {
+        'verified': bool(distance <= threshold),
+        'distance': distance,
+        'threshold': threshold,
+        'model': model_name,
+        'detector_backend': detector_backend,
+        'similarity_metric': distance_metric,
+        'facial_areas': {
+            'img1': ref_face['facial_area'],
+            'img2': target_face['facial_area']
+        },
+        'time': round(time.time() - start_time, 2) if start_time is not None else None
+    }
+
+
+def verify_pairs(faces: Dict[Any, List[Dict]], pairs: List[Tuple[Any, Any]], model_name: str,
+                 detector_backend: str, distance_metric: str = 'cosine', start_time: float = None) -> List[Dict]:
+    """
+    ``verify_faces`` for many pairs of embedded images at once.
+
+    Every face combination of every pair is compared in a single vectorized
+    distance computation; the closest combination decides each pair, like
+    ``verify_faces``. ``faces`` maps an image key to its embedded faces and
+    ``pairs`` holds (ref key, target key). A pair whose images have no face
+    gets None.
+    """
+    ref_rows, target_rows, combos, bounds = [], [], [], []
+    for ref_key, target_key in pairs:
+        begin = len(combos)
+        for ref_face in faces[ref_key]:
+            for target_face in faces[target_key]:
+                ref_rows.append(ref_face['embedding'])
+                target_rows.append(target_face['embedding'])
+                combos.append((ref_face, target_face))
+        bounds.append((begin, len(combos)))
+
+    distances = paired_distances(np.stack(ref_rows), np.stack(target_rows), distance_metric) if combos else []
+    threshold = find_threshold(model_name, distance_metric)
+    elapsed = round(time.time() - start_time, 2) if start_time is not None else None
+
+    results = []
+    for begin, end in bounds:
+        if begin == end:
+            results.append(None)
+            continue
+        best = begin + int(np.argmin(distances[begin:end]))
+        ref_face, target_face = combos[best]
+        results.append({
+            'verified': bool(distances[best] <= threshold),
+            'distance': float(distances[best]),
+            'threshold': threshold,
+            'model': model_name,
+            'detector_backend': detector_backend,
+            'similarity_metric': distance_metric,
+            'facial_areas': {
+                'img1': ref_face['facial_area'],
+                'img2': target_face['facial_area']
+            },
+            'time': elapsed
+        })
+    return results
@@ -0,0 +1,358 @@
+"""
+Embedding Gallery
+=================
+In-memory store of enrolled face embeddings used for 1:N identification.
+
+Embeddings for each recognition model live in one contiguous float32 matrix,
+so identifying a face is a single vectorized distance computation against the
+whole gallery instead of one ``DeepFace.verify`` call per enrolled person.
+
+Large galleries can be searched through an approximate index (see
+embedding_index.py) and saved to disk as memory-mappable ``.npy`` files.
+Rows can be stored as float16 or int8 instead (see embedding_store.py); the
+exact scan then runs on the compact codes.
+"""
+
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import face_engine
+import embedding_store
+from embedding_index import ExactIndex, build_index, load_index
+
+
+class ModelGallery:
+    """Contiguous embedding matrix for a single recognition model, in float32, float16 or int8."""
+
+    INITIAL_CAPACITY = 1024
+    # Below this many rows an exact scan is already fast, so no ANN index is built
+    MIN_INDEX_ROWS = 10000
+    # Rebuild the ANN index once this fraction of rows was added after the last build
+    REBUILD_FRACTION = 0.1
+
+    def __init__(self, model_name: str, dim: int, index_kind: str = 'exact', index_params: Dict = None,
+                 storage_dtype: str = 'float32'):
+        if storage_dtype not in embedding_store.STORAGE_DTYPES:
+            raise ValueError(f"Storage dtype '{storage_dtype}' not supported.")
+        self.model_name = model_name
+        self.dim = dim
+        self.storage_dtype = storage_dtype
+        self.index_kind = index_kind
+        self.index_params = index_params or {}
+        self.index = None
+        self.indexed_rows = 0
+        # Bumped whenever existing rows change (remove), so an index built from older rows is discarded
+        self.version = 0
+        self.size = 0
+        self.matrix = np.empty((self.INITIAL_CAPACITY, dim), dtype=storage_dtype)
+        # Per-row int8 scale (1.0 for float rows) and norm of the decoded row
+        self.scales = np.empty(self.INITIAL_CAPACITY, dtype=np.float32)
+        self.norms = np.empty(self.INITIAL_CAPACITY, dtype=np.float32)
+        # Row -> index into person_ids, kept as an array for vectorized grouping
+        self.row_person = np.empty(self.INITIAL_CAPACITY, dtype=np.int64)
+        self.person_ids: List[str] = []
+        self.person_index: Dict[str, int] = {}
+
+    def add(self, person_id: str, embedding: np.ndarray) -> None:
+        """Append one embedding, growing the matrix geometrically when full."""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if embedding.shape != (self.dim,):
+            raise ValueError(f"Expected a {self.dim}-d embedding for {self.model_name}, got shape {embedding.shape}")
+
+        if self.size == len(self.matrix):
+            capacity = max(2 * len(self.matrix), self.INITIAL_CAPACITY)
+            self.matrix = np.resize(self.matrix, (capacity, self.dim))
+            self.scales = np.resize(self.scales, capacity)
+            self.norms = np.resize(self.norms, capacity)
+            self.row_person = np.resize(self.row_person, capacity)
+
+        if person_id not in self.person_index:
+            self.person_index[person_id] = len(self.person_ids)
+            self.person_ids.append(person_id)
+
+        codes, scales = embedding_store.quantize(embedding, self.storage_dtype)
+        self.matrix[self.size] = codes[0]
+        self.scales[self.size] = scales[0]
+        self.norms[self.size] = np.linalg.norm(embedding_store.dequantize(codes, scales))
+        self.row_person[self.size] = self.person_index[person_id]
+        self.size += 1
+
+    def remove(self, person_id: str) -> int:
+        """Drop every embedding of a person and return how many rows were removed."""
+        if person_id not in self.person_index:
+            return 0
+        removed_idx = self.person_index[person_id]
+        keep = self.row_person[:self.size] != removed_idx
+        kept = int(keep.sum())
+        removed = self.size - kept
+
+        # New arrays rather than in-place compaction, the old ones may be read-only memmaps
+        self.matrix = self.matrix[:self.size][keep]
+        self.scales = self.scales[:self.size][keep]
+        self.norms = self.norms[:self.size][keep]
+        row_person = self.row_person[:self.size][keep]
+        # Re-number the remaining persons so person indices stay dense
+        self.row_person = np.where(row_person > removed_idx, row_person - 1, row_person)
+        self.size = kept
+        self.index = None
+        self.indexed_rows = 0
+        self.version += 1
+
+        del self.person_ids[removed_idx]
+        self.person_index = {pid: i for i, pid in enumerate(self.person_ids)}
+        return removed
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the stored rows (matrix, scales, norms and row_person), excluding spare capacity."""
+        per_row = (self.matrix.itemsize * self.dim + self.scales.itemsize + self.norms.itemsize
+                   + self.row_person.itemsize)
+        return self.size * per_row
+
+    def needs_index(self) -> bool:
+        """True when the gallery is large enough for an ANN index and it is missing or its unindexed tail has grown."""
+        if self.index_kind == 'exact' or self.size < self.MIN_INDEX_ROWS:
+            return False
+        return self.index is None or self.size - self.indexed_rows > self.REBUILD_FRACTION * self.indexed_rows
+
+    def index_snapshot(self):
+        """
+        Rows to build the next index from, taken while the caller holds the gallery lock.
+
+        ``add`` only appends and ``remove`` replaces the arrays, so views of the
+        first ``size`` rows stay valid while the index is built without the lock.
+
+        Returns:
+            (codes, scales, version)
+        """
+        return self.matrix[:self.size], self.scales[:self.size], self.version
+
+    def build_index(self, codes: np.ndarray, scales: np.ndarray):
+        """Build the ANN index over a snapshot (slow; called without the gallery lock)."""
+        return build_index(self.index_kind, embedding_store.dequantize(codes, scales), **self.index_params)
+
+    def swap_index(self, index, indexed_rows: int, version: int) -> bool:
+        """Install a freshly built index unless rows were removed since its snapshot."""
+        if version != self.version:
+            return False
+        self.index = index
+        self.indexed_rows = indexed_rows
+        return True
+
+    def _decoded(self, start: int, stop: int) -> np.ndarray:
+        """Rows start:stop as float32 (the ANN index keeps full-precision vectors)."""
+        return embedding_store.dequantize(self.matrix[start:stop], self.scales[start:stop])
+
+    def _candidate_rows(self, queries: np.ndarray, distance_metric: str, top_k: int):
+        """Row ids and distances to group by person, from the ANN index plus the unindexed tail."""
+        if self.index is None:
+            rows = np.arange(self.size)
+            distances = embedding_store.compact_distances(
+                self.matrix[:self.size], self.scales[:self.size], self.norms[:self.size], queries, distance_metric
+            )
+            return [rows] * len(queries), list(distances)
+
+        # A person can own several rows, so ask the index for more rows than persons
+        index_ids, index_dists = self.index.search(queries, distance_metric, k=4 * top_k)
+        tail = ExactIndex(self._decoded(self.indexed_rows, self.size), self.norms[self.indexed_rows:self.size])
+        tail_ids, tail_dists = tail.search(queries, distance_metric, k=4 * top_k)
+
+        all_rows, all_dists = [], []
+        for q in range(len(queries)):
+            ids = np.concatenate([index_ids[q], tail_ids[q] + self.indexed_rows])
+            dists = np.concatenate([index_dists[q], tail_dists[q]])
+            valid = (ids >= 0) & (ids < self.size) & np.isfinite(dists)
+            all_rows.append(ids[valid])
+            all_dists.append(dists[valid])
+        return all_rows, all_dists
+
+    def search(self, queries: np.ndarray, distance_metric: str = 'cosine', top_k: int = 5) -> List[List[Dict]]:
+        """
+        Find the closest enrolled persons for each query embedding.
+
+        A person's distance is the minimum over all of their enrolled
+        embeddings; the result holds at most ``top_k`` distinct persons per
+        query, sorted by distance.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.size == 0:
+            return [[] for _ in range(len(queries))]
+
+        candidate_rows, candidate_dists = self._candidate_rows(queries, distance_metric, top_k)
+
+        n_persons = len(self.person_ids)
+        results = []
+        for rows, row_dists in zip(candidate_rows, candidate_dists):
+            best = np.full(n_persons, np.inf)
+            np.minimum.at(best, self.row_person[rows], row_dists)
+            k = min(top_k, int(np.isfinite(best).sum()))
+            if k == 0:
+                results.append([])
+                continue
+            top = np.argpartition(best, k - 1)[:k] if k < n_persons else np.arange(n_persons)
+            top = top[np.argsort(best[top])][:k]
+            results.append([{'person_id': self.person_ids[i], 'distance': float(best[i])} for i in top])
+        return results
+
+    def save(self, path: Path) -> None:
+        """Write the gallery as .npy files (plus the ANN index, if built)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        # Arrays mapped from these same files must be read into memory before overwriting them
+        if isinstance(self.matrix, np.memmap):
+            self.matrix = np.array(self.matrix)
+            self.scales = np.array(self.scales)
+            self.norms = np.array(self.norms)
+            self.row_person = np.array(self.row_person)
+        if self.index is not None and isinstance(self.index.vectors, np.memmap):
+            self.index = load_index(path / "index", mmap=False)
+        np.save(path / "embeddings.npy", np.ascontiguousarray(self.matrix[:self.size]))
+        np.save(path / "scales.npy", np.ascontiguousarray(self.scales[:self.size]))
+        np.save(path / "norms.npy", np.ascontiguousarray(self.norms[:self.size]))
+        np.save(path / "row_person.npy", np.ascontiguousarray(self.row_person[:self.size]))
+        with open(path / "gallery.json", 'w') as f:
+            json.dump({
+                'model_name': self.model_name,
+                'dim': self.dim,
+                'storage_dtype': self.storage_dtype,
+                'person_ids': self.person_ids,
+                'index_kind': self.index_kind,
+                'indexed_rows': self.indexed_rows if self.index is not None else 0
+            }, f)
+        if (path / "index").exists():
+            shutil.rmtree(path / "index")
+        if self.index is not None:
+            self.index.save(path / "index")
+
+    @classmethod
+    def load(cls, path: Path, index_kind: str = 'exact', index_params: Dict = None) -> 'ModelGallery':
+        """Reopen a saved gallery with its arrays memory-mapped; nothing is rebuilt."""
+        path = Path(path)
+        with open(path / "gallery.json") as f:
+            meta = json.load(f)
+        gallery = cls(meta['model_name'], meta['dim'], index_kind, index_params, meta['storage_dtype'])
+        gallery.matrix = np.load(path / "embeddings.npy", mmap_mode='r')
+        gallery.scales = np.load(path / "scales.npy", mmap_mode='r')
+        gallery.norms = np.load(path / "norms.npy", mmap_mode='r')
+        gallery.row_person = np.load(path / "row_person.npy", mmap_mode='r')
+        gallery.size = len(gallery.matrix)
+        gallery.person_ids = meta['person_ids']
+        gallery.person_index = {pid: i for i, pid in enumerate(gallery.person_ids)}
+        if meta['indexed_rows'] and meta['index_kind'] == index_kind and (path / "index").exists():
+            gallery.index = load_index(path / "index")
+            gallery.indexed_rows = meta['indexed_rows']
+        return gallery
+
+
+class EmbeddingGallery:
+    """Thread-safe collection of per-model galleries."""
+
+    def __init__(self, index_kind: str = 'exact', index_params: Dict = None, storage_dtype: str = 'float32'):
+        self.lock = threading.Lock()
+        self.galleries: Dict[str, ModelGallery] = {}
+        # Model name -> thread building that gallery's next ANN index
+        self.rebuilds: Dict[str, threading.Thread] = {}
+        self.index_kind = index_kind
+        self.index_params = index_params or {}
+        # Used for new model galleries; loaded ones keep the dtype they were saved with
+        self.storage_dtype = storage_dtype
+
+    def enroll(self, person_id: str, model_name: str, embedding: np.ndarray) -> int:
+        """Add an embedding for a person and return their embedding count for that model."""
+        with self.lock:
+            gallery = self.galleries.get(model_name)
+            if gallery is None:
+                gallery = ModelGallery(model_name, len(embedding), self.index_kind, self.index_params,
+                                       self.storage_dtype)
+                self.galleries[model_name] = gallery
+            gallery.add(person_id, embedding)
+            self._maybe_start_rebuild(gallery)
+            person_idx = gallery.person_index[person_id]
+            return int(np.sum(gallery.row_person[:gallery.size] == person_idx))
+
+    def _maybe_start_rebuild(self, gallery: ModelGallery) -> None:
+        """
+        Start building a gallery's next ANN index in the background (caller holds the lock).
+
+        Searches keep using the previous index plus an exact scan of the rows
+        added since (or a full exact scan before the first index) until the new
+        index is swapped in.
+        """
+        thread = self.rebuilds.get(gallery.model_name)
+        if (thread is not None and thread.is_alive()) or not gallery.needs_index():
+            return
+        codes, scales, version = gallery.index_snapshot()
+        thread = threading.Thread(target=self._rebuild_index, args=(gallery, codes, scales, version),
+                                  name=f"gallery-index-{gallery.model_name}", daemon=True)
+        self.rebuilds[gallery.model_name] = thread
+        thread.start()
+
+    def _rebuild_index(self, gallery: ModelGallery, codes: np.ndarray, scales: np.ndarray, version: int) -> None:
+        index = gallery.build_index(codes, scales)
+        with self.lock:
+            self.rebuilds.pop(gallery.model_name, None)
+            # The gallery may have been replaced by load() in the meantime
+            if self.galleries.get(gallery.model_name) is gallery and not gallery.swap_index(index, len(codes), version):
+                # Rows were removed during the build; start again from the current rows
+                self._maybe_start_rebuild(gallery)
+
+    def remove(self, person_id: str) -> int:
+        """Remove a person from every model's gallery."""
+        with self.lock:
+            return sum(gallery.remove(person_id) for gallery in self.galleries.values())
+
+    def identify(self, model_name: str, queries: np.ndarray, distance_metric: str = 'cosine',
+                 top_k: int = 5) -> List[List[Dict]]:
+        """
+        Top-k matches for each query embedding, with DeepFace thresholds applied.
+        """
+        threshold = face_engine.find_threshold(model_name, distance_metric)
+        with self.lock:
+            gallery = self.galleries.get(model_name)
+            if gallery is None:
+                return [[] for _ in range(len(np.atleast_2d(queries)))]
+            self._maybe_start_rebuild(gallery)
+            results = gallery.search(queries, distance_metric, top_k)
+
+        for matches in results:
+            for match in matches:
+                match['threshold'] = threshold
+                match['verified'] = match['distance'] <= threshold
+        return results
+
+    def save(self, path: Path) -> None:
+        """Persist every model's gallery under ``path/<model_name>``."""
+        with self.lock:
+            for model_name, gallery in self.galleries.items():
+                gallery.save(Path(path) / model_name)
+
+    def load(self, path: Path) -> None:
+        """Load (memory-map) every model gallery saved under ``path``."""
+        path = Path(path)
+        if not path.exists():
+            return
+        with self.lock:
+            for model_dir in path.iterdir():
+                if (model_dir / "gallery.json").exists():
+                    gallery = ModelGallery.load(model_dir, self.index_kind, self.index_params)
+                    self.galleries[gallery.model_name] = gallery
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                model_name: {
+                    'persons': len(gallery.person_ids),
+                    'embeddings': gallery.size,
+                    'dimensions': gallery.dim,
+                    'storage_dtype': gallery.storage_dtype,
+                    'memory_bytes': gallery.nbytes,
+                    'index': gallery.index.kind if gallery.index is not None else 'exact',
+                    'indexed_rows': gallery.indexed_rows
+                }
+                for model_name, gallery in self.galleries.items()
+            }
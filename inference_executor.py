@@ -0,0 +1,113 @@
+"""
+Inference Executor
+==================
+Bounded admission (backpressure) for face detection/embedding.
+
+At most ``max_workers`` inference calls run at once and at most
+``queue_depth`` more wait for a thread. Beyond that ``run`` raises
+``ExecutorFull`` immediately, so the endpoints can answer 503 with a
+Retry-After header instead of piling up requests during a traffic spike.
+This limits how much work is admitted; it does not free the request
+thread, which blocks in ``run`` until its call has finished.
+Every call reports its queue wait separately from its inference time.
+Context variables of the caller (e.g. the request's trace) are visible to
+the function on the pool thread.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+
+class ExecutorFull(Exception):
+    """The inference queue is at capacity; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """Thread pool with a hard limit on queued work and per-call timing."""
+
+    def __init__(self, max_workers: int = 4, queue_depth: int = 16):
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(0, queue_depth)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.stats = {'completed': 0, 'failed': 0, 'rejected': 0,
+                      'queue_wait_s_total': 0.0, 'inference_s_total': 0.0}
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_depth
+
+    def run(self, fn: Callable, *args) -> Tuple[Any, Dict[str, float]]:
+        """
+        Run ``fn(*args)`` on the pool, blocking the calling thread until it finishes.
+
+        Returns:
+            (result, {'queue_wait_ms': ..., 'inference_ms': ...})
+
+        Raises:
+            ExecutorFull: if ``max_workers + queue_depth`` calls are already pending
+        """
+        with self.lock:
+            if self.pending >= self.capacity:
+                self.stats['rejected'] += 1
+                raise ExecutorFull(self._retry_after())
+            self.pending += 1
+
+        timing = {'submitted': time.perf_counter()}
+
+        def task():
+            timing['started'] = time.perf_counter()
+            with self.lock:
+                self.running += 1
+            failed = True
+            try:
+                result = fn(*args)
+                failed = False
+                return result
+            finally:
+                timing['finished'] = time.perf_counter()
+                queue_wait = timing['started'] - timing['submitted']
+                inference = timing['finished'] - timing['started']
+                with self.lock:
+                    self.pending -= 1
+                    self.running -= 1
+                    self.stats['failed' if failed else 'completed'] += 1
+                    self.stats['queue_wait_s_total'] += queue_wait
+                    self.stats['inference_s_total'] += inference
+
+        result = self.executor.submit(contextvars.copy_context().run, task).result()
+        return result, {
+            'queue_wait_ms': round((timing['started'] - timing['submitted']) * 1000, 1),
+            'inference_ms': round((timing['finished'] - timing['started']) * 1000, 1)
+        }
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (at least 1)."""
+        done = self.stats['completed'] + self.stats['failed']
+        avg_inference = self.stats['inference_s_total'] / done if done else 1.0
+        return max(1, math.ceil(self.pending / self.max_workers * avg_inference))
+
+    def info(self) -> Dict:
+        with self.lock:
+            done = self.stats['completed'] + self.stats['failed']
+            return {
+                'max_workers': self.max_workers,
+                'queue_depth': self.queue_depth,
+                'running': self.running,
+                'queued': self.pending - self.running,
+                'completed': self.stats['completed'],
+                'failed': self.stats['failed'],
+                'rejected': self.stats['rejected'],
+                'avg_queue_wait_ms': self.stats['queue_wait_s_total'] / done * 1000 if done else 0.0,
+                'avg_inference_ms': self.stats['inference_s_total'] / done * 1000 if done else 0.0
+            }
@@ -0,0 +1,95 @@
+"""
+Lazy Imports
+============
+Defers heavy imports (DeepFace and with it TensorFlow) until first use.
+
+``LazyModule('deepface.DeepFace')`` stands in for the module: the real import
+runs on the first attribute access, e.g. the first inference or the
+background model warm-up, so routes that never touch a model (templates,
+``/ready``, ``/metrics``) can serve while TensorFlow is still loading.
+
+``import_profile`` measures cold import times in a fresh interpreter
+(``python -X importtime``) for the ``--profile-startup`` options of
+serve.py and benchmark.py.
+"""
+
+import importlib
+import logging
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Module name -> seconds its deferred import took in this process
+import_seconds: Dict[str, float] = {}
+
+
+class LazyModule:
+    """Module proxy that imports ``name`` on first attribute access."""
+
+    def __init__(self, name: str):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                start = time.perf_counter()
+                already_imported = self._name in sys.modules
+                module = importlib.import_module(self._name)
+                if not already_imported:
+                    import_seconds[self._name] = time.perf_counter() - start
+                    logger.info(f"Imported {self._name} in {import_seconds[self._name]:.2f}s")
+                object.__setattr__(self, '_module', module)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def import_profile(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Cold import time of a module in a fresh interpreter, split by top-level package.
+
+    Returns:
+        (total seconds, [(package, seconds of its own imports)] slowest first)
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {completed.stderr.strip().splitlines()[-1]}")
+
+    packages = defaultdict(float)
+    total = 0.0
+    for line in completed.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented name>"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+    return total, sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def print_import_profile(eager: List[str], deferred: List[str] = (), top: int = 10) -> None:
+    """Print cold import times of the modules loaded at startup and of the ones deferred to first use."""
+    for kind, modules in (('startup', eager), ('deferred', deferred)):
+        for module in modules:
+            total, packages = import_profile(module)
+            print(f"[{kind}] import {module}: {total:.2f}s")
+            for package, seconds in packages[:top]:
+                print(f"    {package:<24} {seconds:8.3f}s")
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+HTTP Load Generator
+===================
+Replays the benchmark images against a running app.py and reports throughput,
+error rate and latency percentiles per endpoint, detector/model combination
+and concurrency level. Unlike benchmark.py this measures the whole serving
+path: HTTP, JSON/base64 parsing, decoding, queueing, batching and Flask.
+
+- ``/match``: JSON bodies with two base64 images.
+- ``/realtime_verify``: a reference image is uploaded once per combination
+  (session cookie), then frames are sent as raw JPEG bodies.
+
+Requests are closed-loop (each of ``--concurrency`` threads sends as soon as
+its previous request finished) unless ``--rate`` sets a target request rate.
+Every request carries distinct image bytes so the ``/match`` content cache
+doesn't serve it; pass ``--allow-cache`` to measure repeated images instead.
+Use it to tune the batching scheduler (``FACE_BATCH_MAX_SIZE`` /
+``FACE_BATCH_MAX_WAIT_MS``): larger batches raise throughput until the added
+wait shows up in p99.
+
+Results are written to ``--output-dir`` as ``load_test_summary.csv``,
+``load_test_results.json`` and ``load_test_report.md``.
+
+Usage:
+    python load_test.py --url http://localhost:5000 --test-dir benchmark_data/test_images \\
+        --endpoints match realtime_verify --detectors opencv --models VGG-Face Facenet \\
+        --concurrency 1 2 4 8 16 --requests 200
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import base64
+import random
+import argparse
+import itertools
+import platform
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+ENDPOINTS = ['match', 'realtime_verify']
+
+
+def load_images(test_dir: str) -> List[bytes]:
+    """Encoded bytes of every test image."""
+    image_files = sorted(p for p in Path(test_dir).rglob("*") if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    return [p.read_bytes() for p in image_files]
+
+
+# Differs per run so a second run against the same server doesn't hit the first run's cache entries
+RUN_NONCE = os.urandom(8)
+
+
+def unique_bytes(img_bytes: bytes, nonce: int) -> bytes:
+    """Image bytes with trailing data after the end marker: decodes the same, hashes differently."""
+    return img_bytes + RUN_NONCE + nonce.to_bytes(8, 'little')
+
+
+def match_target(images: List[bytes], detector: str, model: str, unique: bool) -> Tuple[str, Dict, Callable]:
+    """Path, headers and body factory for /match, pairing random test images."""
+    rng = random.Random(0)
+    pairs = [(rng.choice(images), rng.choice(images)) for _ in range(min(50, len(images) ** 2))]
+    counter = itertools.count()
+
+    def make_body() -> bytes:
+        i = next(counter)
+        ref_img, target_img = pairs[i % len(pairs)]
+        if unique:
+            ref_img, target_img = unique_bytes(ref_img, 2 * i), unique_bytes(target_img, 2 * i + 1)
+        return json.dumps({
+            'ref_img': base64.b64encode(ref_img).decode('ascii'),
+            'target_img': base64.b64encode(target_img).decode('ascii'),
+            'detector_backend': detector,
+            'model_name': model
+        }).encode()
+
+    return "/match", {'Content-Type': 'application/json'}, make_body
+
+
+def realtime_target(url: str, images: List[bytes], detector: str, model: str, unique: bool,
+                    timeout: float) -> Tuple[str, Dict, Callable]:
+    """Upload a reference image for a new session, then path, headers and frame factory for /realtime_verify."""
+    boundary = uuid.uuid4().hex
+    fields = b''.join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in (('detector_backend', detector), ('model_name', model))
+    )
+    body = (fields
+            + f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="ref.jpg"\r\n'
+              f'Content-Type: image/jpeg\r\n\r\n'.encode()
+            + images[0] + f'\r\n--{boundary}--\r\n'.encode())
+    request = urllib.request.Request(url + "/upload", data=body,
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        cookie = response.headers.get('Set-Cookie', '').split(';')[0]
+
+    frames = images[1:] or images
+    counter = itertools.count()
+
+    def make_body() -> bytes:
+        i = next(counter)
+        frame = frames[i % len(frames)]
+        return unique_bytes(frame, i) if unique else frame
+
+    query = urllib.parse.urlencode({'detector_backend': detector, 'model_name': model})
+    return f"/realtime_verify?{query}", {'Content-Type': 'application/octet-stream', 'Cookie': cookie}, make_body
+
+
+def send_request(url: str, body: bytes, headers: Dict, timeout: float) -> Dict:
+    """POST one body and return its latency and status."""
+    request = urllib.request.Request(url, data=body, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+    return {'latency': time.perf_counter() - start, 'status': status}
+
+
+def get_json(url: str) -> Dict:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return json.loads(response.read())
+    except Exception:
+        return {}
+
+
+def run_level(url: str, path: str, headers: Dict, make_body: Callable, concurrency: int, n_requests: int,
+              timeout: float, rate: float = 0) -> Dict:
+    """
+    Send ``n_requests`` with at most ``concurrency`` in flight and summarise them.
+
+    With ``rate`` > 0 request i is not sent before i / rate seconds into the run.
+    """
+    # Bodies are built before timing so client-side encoding isn't measured
+    bodies = [make_body() for _ in range(n_requests)]
+    batching_before = get_json(url + "/batching")
+
+    start = time.perf_counter()
+
+    def send(i: int) -> Dict:
+        if rate > 0:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return send_request(url + path, bodies[i], headers, timeout)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    batching_after = get_json(url + "/batching")
+    batches = batching_after.get('batches', 0) - batching_before.get('batches', 0)
+    items = batching_after.get('items', 0) - batching_before.get('items', 0)
+
+    latencies = np.array([r['latency'] for r in results if r['status'] == 200]) * 1000
+    errors = sum(1 for r in results if r['status'] != 200)
+    return {
+        'concurrency': concurrency,
+        'target_rate': rate or None,
+        'requests': n_requests,
+        'errors': errors,
+        'rejected': sum(1 for r in results if r['status'] == 503),
+        'error_rate': errors / n_requests if n_requests else 0.0,
+        'throughput': (n_requests - errors) / elapsed if elapsed > 0 else 0.0,
+        'avg_ms': float(np.mean(latencies)) if len(latencies) else np.nan,
+        'p50_ms': np.percentile(latencies, 50) if len(latencies) else np.nan,
+        'p90_ms': np.percentile(latencies, 90) if len(latencies) else np.nan,
+        'p99_ms': np.percentile(latencies, 99) if len(latencies) else np.nan,
+        'avg_batch_size': items / batches if batches else np.nan
+    }
+
+
+def write_reports(rows: List[Dict], output_dir: str, run_info: Dict) -> None:
+    """CSV summary, JSON results and markdown report, laid out like benchmark.py's reports."""
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    with open(output_path / "load_test_results.json", 'w') as f:
+        json.dump({'run_info': run_info, 'results': rows}, f, indent=2, default=str)
+
+    columns = {
+        'Endpoint': 'endpoint', 'Detector': 'detector', 'Model': 'model', 'Concurrency': 'concurrency',
+        'Target_Rate_rps': 'target_rate', 'Requests': 'requests', 'Errors': 'errors', 'Rejected_503': 'rejected',
+        'Error_Rate': 'error_rate', 'Throughput_rps': 'throughput', 'Avg_Latency_ms': 'avg_ms',
+        'P50_Latency_ms': 'p50_ms', 'P90_Latency_ms': 'p90_ms', 'P99_Latency_ms': 'p99_ms',
+        'Avg_Batch_Size': 'avg_batch_size'
+    }
+    with open(output_path / "load_test_summary.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(columns))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row.get(key) for column, key in columns.items()})
+
+    report_content = f"""# Face Recognition Load Test Report
+
+## Executive Summary
+
+- **Test Date**: {run_info['timestamp']}
+- **Server**: {run_info['url']}
+- **Endpoints**: {', '.join(run_info['endpoints'])}
+- **Requests per Level**: {run_info['requests']}
+- **Request Rate**: {f"{run_info['rate']} req/s" if run_info['rate'] else 'closed loop (as fast as responses return)'}
+- **Content Cache**: {'allowed (repeated images)' if run_info['allow_cache'] else 'bypassed (distinct bytes per request)'}
+
+## Client Information
+
+- **Host**: {run_info['client_host']}
+- **Python Version**: {run_info['python_version']}
+
+## Performance Overview
+"""
+    ok_rows = [r for r in rows if r['requests'] > r['errors']]
+    for endpoint in run_info['endpoints']:
+        endpoint_rows = [r for r in ok_rows if r['endpoint'] == endpoint]
+        if not endpoint_rows:
+            continue
+        best = max(endpoint_rows, key=lambda r: r['throughput'])
+        report_content += f"""
+#### Highest Throughput: /{endpoint}
+- **Combination**: {best['detector']} + {best['model']} at concurrency {best['concurrency']}
+- **Throughput**: {best['throughput']:.2f} req/s
+- **p99 Latency**: {best['p99_ms']:.1f} ms
+"""
+
+    report_content += """
+### Detailed Results
+
+| Endpoint | Detector | Model | Concurrency | Req/s | Error Rate | p50 (ms) | p90 (ms) | p99 (ms) | Avg Batch |
+|----------|----------|-------|-------------|-------|------------|----------|----------|----------|-----------|
+"""
+    for r in rows:
+        report_content += f"| /{r['endpoint']} | {r['detector']} | {r['model']} | {r['concurrency']} | {r['throughput']:.2f} | {r['error_rate']:.1%} | {r['p50_ms']:.1f} | {r['p90_ms']:.1f} | {r['p99_ms']:.1f} | {r['avg_batch_size']:.2f} |\n"
+
+    failures = run_info.get('failures')
+    if failures:
+        report_content += "\n## Errors and Issues\n\n"
+        for failure in failures:
+            report_content += f"- **/{failure['endpoint']} {failure['detector']} + {failure['model']}**: {failure['error']}\n"
+
+    report_content += """
+## Files Generated
+
+- `load_test_summary.csv`: One row per endpoint, combination and concurrency level
+- `load_test_results.json`: Same results with run information
+- `load_test_report.md`: This report
+"""
+    with open(output_path / "load_test_report.md", 'w') as f:
+        f.write(report_content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load generator for app.py")
+    parser.add_argument("--url", default="http://localhost:5000", help="Base URL of the running app")
+    parser.add_argument("--test-dir", default="benchmark_data/test_images", help="Directory containing test images")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=['match'], help="Endpoints to load")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Concurrent requests in flight, one run per value")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Target requests per second (default: 0, closed loop)")
+    parser.add_argument("--detectors", "--detector", nargs="+", default=['opencv'], help="Detector backends")
+    parser.add_argument("--models", "--model", nargs="+", default=['VGG-Face'], help="Recognition models")
+    parser.add_argument("--allow-cache", action="store_true",
+                        help="Repeat identical image bytes so the /match content cache can answer")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--output-dir", default="load_test_results", help="Directory for the CSV/JSON/markdown reports")
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    images = load_images(args.test_dir)
+    if not images:
+        print(f"No images found in {args.test_dir}")
+        sys.exit(1)
+
+    run_info = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'url': url,
+        'endpoints': args.endpoints,
+        'requests': args.requests,
+        'rate': args.rate,
+        'allow_cache': args.allow_cache,
+        'client_host': f"{platform.node()} ({os.cpu_count()} cores)",
+        'python_version': platform.python_version(),
+        'failures': []
+    }
+    unique = not args.allow_cache
+    rows = []
+
+    print(f"{'Endpoint':>16} {'Detector':>10} {'Model':>10} {'Concurrency':>11} {'Req/s':>8} {'p50 (ms)':>9} "
+          f"{'p90 (ms)':>9} {'p99 (ms)':>9} {'Errors':>6} {'Avg batch':>9}")
+    for endpoint in args.endpoints:
+        for detector in args.detectors:
+            for model in args.models:
+                try:
+                    if endpoint == 'match':
+                        path, headers, make_body = match_target(images, detector, model, unique)
+                    else:
+                        path, headers, make_body = realtime_target(url, images, detector, model, unique, args.timeout)
+                except Exception as e:
+                    run_info['failures'].append({'endpoint': endpoint, 'detector': detector, 'model': model,
+                                                 'error': str(e)})
+                    print(f"Skipping /{endpoint} {detector} + {model}: {e}")
+                    continue
+
+                # Satu request awal agar model sudah dimuat sebelum pengukuran
+                send_request(url + path, make_body(), headers, args.timeout)
+
+                for concurrency in args.concurrency:
+                    row = run_level(url, path, headers, make_body, concurrency, args.requests, args.timeout, args.rate)
+                    row.update({'endpoint': endpoint, 'detector': detector, 'model': model})
+                    rows.append(row)
+                    print(f"{'/' + endpoint:>16} {detector:>10} {model:>10} {row['concurrency']:>11} "
+                          f"{row['throughput']:>8.2f} {row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} "
+                          f"{row['p99_ms']:>9.1f} {row['errors']:>6} {row['avg_batch_size']:>9.2f}")
+
+    write_reports(rows, args.output_dir, run_info)
+    print(f"Reports written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
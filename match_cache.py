@@ -0,0 +1,90 @@
+"""
+Match Cache
+===========
+Content-addressed cache for ``/match``.
+
+Images are keyed by the SHA-256 of their encoded bytes, so a re-submitted
+image is recognised before it is even decoded. Two kinds of entries share
+one LRU byte budget:
+
+- ``('faces', image_hash, detector, model)``: embedded faces of an image,
+  reused whenever the same image shows up in another pair.
+- ``('result', ref_hash, target_hash, detector, model, metric)``: the whole
+  verification result of a pair, for retries and repeated checks.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+# Rough per-entry overhead (key tuple, dicts, facial area) on top of the arrays
+ENTRY_OVERHEAD_BYTES = 512
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def faces_nbytes(faces: List[Dict]) -> int:
+    return ENTRY_OVERHEAD_BYTES + sum(face['embedding'].nbytes + ENTRY_OVERHEAD_BYTES for face in faces)
+
+
+def result_nbytes(result: Dict) -> int:
+    return ENTRY_OVERHEAD_BYTES + len(json.dumps(result, default=str))
+
+
+class MatchCache:
+    """Thread-safe LRU map with a byte budget and hit/miss counts per entry kind."""
+
+    KINDS = ('faces', 'result')
+
+    def __init__(self, max_bytes: int = 64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Ordered from least to most recently used; values are (value, nbytes)
+        self.entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {kind: {'hits': 0, 'misses': 0} for kind in self.KINDS}
+        self.evictions = 0
+
+    def get(self, key: tuple) -> Any:
+        """Cached value for a key (its first element is the kind), or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats[key[0]]['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats[key[0]]['hits'] += 1
+            return entry[0]
+
+    def put(self, key: tuple, value: Any, nbytes: int) -> None:
+        """Store a value; values larger than the whole budget are not cached."""
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def info(self) -> Dict:
+        with self.lock:
+            stats = {}
+            for kind, counts in self.stats.items():
+                lookups = counts['hits'] + counts['misses']
+                stats[kind] = dict(counts, hit_rate=counts['hits'] / lookups if lookups else 0.0,
+                                   entries=sum(1 for key in self.entries if key[0] == kind))
+            return {
+                'stats': stats,
+                'evictions': self.evictions,
+                'memory_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,246 @@
+"""
+Metrics and Tracing
+===================
+Prometheus-style metrics without extra dependencies, plus per-request stage
+tracing.
+
+- ``Counter``, ``Gauge`` and ``Histogram`` live in a ``MetricsRegistry`` whose
+  ``render`` output is the Prometheus text exposition format (version 0.0.4).
+  Collectors registered with ``add_collector`` export stats that other
+  components already keep (queue depth, cache hits) at scrape time.
+- ``stage(name)`` times one pipeline stage (decode, detection, embedding, ...)
+  into ``face_stage_duration_seconds{stage, detector, model}``. The detector
+  and model labels and the optional ``Trace`` of the current request are
+  context variables, so they follow the request into the inference executor.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Base class: one metric family with a fixed set of label names."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values: Dict[tuple, float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        """(sample name, labels, value) for every label combination seen so far."""
+        with self.lock:
+            return [(self.name, list(zip(self.labelnames, key)), value) for key, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                # Per-bucket counts (not cumulative), then sum
+                counts = self.values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        with self.lock:
+            items = [(key, list(counts)) for key, counts in self.values.items()]
+        samples = []
+        for key, counts in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', labels + [('le', _format_value(bound))], cumulative))
+            samples.append((self.name + '_count', labels, cumulative))
+            samples.append((self.name + '_sum', labels, counts[-1]))
+        return samples
+
+
+# A collector returns (name, kind, documentation, {label tuple-of-pairs: value}) families
+Collector = Callable[[], Iterable[Tuple[str, str, str, Dict[tuple, float]]]]
+
+
+class MetricsRegistry:
+    """Metrics of one process, rendered for a Prometheus scrape."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Collector] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self.collectors:
+            for name, kind, documentation, values in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in values.items():
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'face_stage_duration_seconds', 'Time spent in one pipeline stage of a request',
+    ('stage', 'detector', 'model')
+)
+
+
+class Trace:
+    """Stage durations of one request, returned to the client as a Server-Timing header."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # stage -> [total seconds, calls], in first-seen order
+        self.stages: Dict[str, list] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self) -> str:
+        with self.lock:
+            return ', '.join(
+                f'{name};dur={seconds * 1000:.1f}' + (f';desc="x{calls}"' if calls > 1 else '')
+                for name, (seconds, calls) in self.stages.items()
+            )
+
+    def breakdown(self) -> Dict[str, float]:
+        """Milliseconds per stage."""
+        with self.lock:
+            return {name: round(seconds * 1000, 1) for name, (seconds, _) in self.stages.items()}
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar('face_trace', default=None)
+_stage_labels: ContextVar[Tuple[str, str]] = ContextVar('face_stage_labels', default=('', ''))
+
+
+def begin_request(traced: bool = False) -> Optional[Trace]:
+    """Reset the stage context of the current request; returns its Trace if ``traced``."""
+    trace = Trace() if traced else None
+    _trace.set(trace)
+    _stage_labels.set(('', ''))
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def set_stage_labels(detector: str, model: str) -> None:
+    """Detector/model labels for the stages that follow in this request."""
+    _stage_labels.set((detector, model))
+
+
+def record_stage(name: str, seconds: float) -> None:
+    detector, model = _stage_labels.get()
+    STAGE_SECONDS.observe(seconds, stage=name, detector=detector, model=model)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as pipeline stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
@@ -0,0 +1,107 @@
+"""
+Frame Preprocessing
+===================
+Cheap steps that run before face detection, whose cost grows with the
+number of pixels (mtcnn, retinaface).
+
+- ``downscale``: cap the longest image side; detected facial areas are
+  mapped back to the original resolution with ``transform_facial_area``.
+- ``FaceTracker``: ROI tracking for realtime streams. The previous frame's
+  face box, expanded by a margin, is cropped from the next frame and only
+  that crop is searched; the full frame is only scanned again once the face
+  is lost.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+
+def downscale(img: np.ndarray, max_side: int) -> Tuple[np.ndarray, float]:
+    """
+    Shrink an image so its longest side is at most ``max_side`` pixels.
+
+    Returns:
+        (image, scale) where scale = new size / original size (1.0 if unchanged)
+    """
+    if not max_side or max(img.shape[:2]) <= max_side:
+        return img, 1.0
+    scale = max_side / max(img.shape[:2])
+    size = (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA), scale
+
+
+def transform_facial_area(area: Dict, scale: float = 1.0, offset: Tuple[int, int] = (0, 0)) -> Dict:
+    """
+    Map a DeepFace facial area from a resized and/or cropped image back to the original.
+
+    Box and landmark (eye, nose, mouth) coordinates are divided by ``scale``
+    and shifted by ``offset`` = (x, y) of the crop.
+    """
+    dx, dy = offset
+    mapped = {}
+    for key, value in area.items():
+        if key in ('x', 'y', 'w', 'h'):
+            value = int(round(value / scale)) + (dx if key == 'x' else dy if key == 'y' else 0)
+        elif isinstance(value, (tuple, list)) and len(value) == 2:
+            value = (int(round(value[0] / scale)) + dx, int(round(value[1] / scale)) + dy)
+        mapped[key] = value
+    return mapped
+
+
+def is_detected(face: Dict) -> bool:
+    """False for the whole-image placeholder DeepFace returns when no face was found."""
+    confidence = face.get('confidence')
+    return confidence is None or confidence > 0
+
+
+class FaceTracker:
+    """
+    Reuses the last face box of a stream to limit detection to a region of interest.
+
+    Args:
+        margin: Fraction of the box size added on every side of the ROI
+    """
+
+    def __init__(self, margin: float = 0.5):
+        self.margin = margin
+        self.box = None
+        self.last_mode = None
+        self.stats = {'roi': 0, 'full': 0, 'lost': 0}
+
+    def reset(self) -> None:
+        self.box = None
+
+    def detect(self, img: np.ndarray, detect_fn: Callable[[np.ndarray], List[Dict]]) -> List[Dict]:
+        """Run ``detect_fn`` on the ROI if a face is tracked, otherwise (or if lost) on the full frame."""
+        if self.box is not None:
+            x0, y0, x1, y1 = self._roi(img.shape)
+            faces = [face for face in detect_fn(img[y0:y1, x0:x1]) if is_detected(face)]
+            if faces:
+                for face in faces:
+                    face['facial_area'] = transform_facial_area(face['facial_area'], offset=(x0, y0))
+                self._update(faces)
+                self.last_mode = 'roi'
+                self.stats['roi'] += 1
+                return faces
+            self.box = None
+            self.stats['lost'] += 1
+
+        faces = detect_fn(img)
+        detected = [face for face in faces if is_detected(face)]
+        if detected:
+            self._update(detected)
+        self.last_mode = 'full'
+        self.stats['full'] += 1
+        return faces
+
+    def _roi(self, shape) -> Tuple[int, int, int, int]:
+        x, y, w, h = self.box
+        pad_x, pad_y = int(w * self.margin), int(h * self.margin)
+        return max(0, x - pad_x), max(0, y - pad_y), min(shape[1], x + w + pad_x), min(shape[0], y + h + pad_y)
+
+    def _update(self, faces: List[Dict]) -> None:
+        # Wajah terbesar yang diikuti pada frame berikutnya
+        area = max((face['facial_area'] for face in faces), key=lambda a: a['w'] * a['h'])
+        self.box = (area['x'], area['y'], area['w'], area['h'])
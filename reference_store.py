@@ -0,0 +1,183 @@
+"""
+Reference Store
+===============
+Per-session reference images for realtime verification.
+
+Each browser session gets its own decoded reference image plus the embedded
+reference faces for every detector/model pair it has used, all in memory.
+Sessions expire after a TTL of inactivity and the least recently used ones
+are evicted when the session count or the memory budget is exceeded.
+
+With several server processes, ``shared_dir`` also writes each reference
+image to disk so a worker that didn't receive the upload can load it once.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class SessionReference:
+    """Decoded reference image of one session and its embeddings per (detector, model)."""
+
+    def __init__(self, image: np.ndarray, version: int = None):
+        self.image = image
+        self.faces: Dict[tuple, List[Dict]] = {}
+        self.last_used = time.time()
+        # mtime (ns) of the shared file this image came from, to notice newer uploads
+        self.version = version
+
+    @property
+    def nbytes(self) -> int:
+        embeddings = sum(face['embedding'].nbytes for faces in self.faces.values() for face in faces)
+        return self.image.nbytes + embeddings
+
+
+class ReferenceStore:
+    """Thread-safe session -> reference map with TTL, LRU eviction and a memory cap."""
+
+    def __init__(self, ttl: float = 1800, max_sessions: int = 1000, max_bytes: int = 256 * 1024 ** 2,
+                 shared_dir: str = None):
+        self.ttl = ttl
+        self.shared_dir = Path(shared_dir) if shared_dir else None
+        if self.shared_dir is not None:
+            self.shared_dir.mkdir(parents=True, exist_ok=True)
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Ordered from least to most recently used
+        self.entries: 'OrderedDict[str, SessionReference]' = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0, 'expirations': 0}
+
+    def put(self, session_id: str, image: np.ndarray) -> None:
+        """Set (or replace) a session's reference image; its cached embeddings are dropped."""
+        with self.lock:
+            old = self.entries.pop(session_id, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+                self.stats['invalidations'] += 1
+            entry = SessionReference(image)
+            self._add(session_id, entry)
+        if self.shared_dir is not None:
+            path = self.shared_dir / f"{session_id}.npy"
+            np.save(path, image)
+            entry.version = path.stat().st_mtime_ns
+
+    def _add(self, session_id: str, entry: SessionReference) -> None:
+        self.entries[session_id] = entry
+        self.total_bytes += entry.nbytes
+        self._evict(keep=session_id)
+
+    def _lookup(self, session_id: str) -> SessionReference:
+        """
+        Entry of a session, (re)loaded from ``shared_dir`` when another worker
+        process received the upload or a newer one.
+        """
+        entry = self.entries.get(session_id)
+        if self.shared_dir is None:
+            return entry
+        path = self.shared_dir / f"{session_id}.npy"
+        try:
+            version = path.stat().st_mtime_ns
+            if entry is not None and (entry.version is None or entry.version >= version):
+                return entry
+            if time.time() - version / 1e9 > self.ttl:
+                path.unlink()
+                return entry
+            shared = SessionReference(np.load(path), version)
+        except (OSError, ValueError):
+            return entry
+        if entry is not None:
+            self._remove(session_id)
+            self.stats['invalidations'] += 1
+        self._add(session_id, shared)
+        return shared
+
+    def has(self, session_id: str) -> bool:
+        with self.lock:
+            self._expire()
+            return self._lookup(session_id) is not None
+
+    def get_faces(self, session_id: str, detector: str, model: str,
+                  embed: Callable[[np.ndarray], List[Dict]]) -> List[Dict]:
+        """
+        Embedded reference faces of a session for a detector/model pair.
+
+        ``embed`` is called with the reference image on a miss, outside the
+        lock. Returns None if the session has no (unexpired) reference.
+        """
+        key = (detector, model)
+        with self.lock:
+            self._expire()
+            entry = self._lookup(session_id)
+            if entry is None:
+                return None
+            self._touch(session_id, entry)
+            faces = entry.faces.get(key)
+            if faces is not None:
+                self.stats['hits'] += 1
+                return faces
+            self.stats['misses'] += 1
+
+        faces = embed(entry.image)
+
+        with self.lock:
+            # Don't keep the result if the reference was replaced or evicted meanwhile
+            if self.entries.get(session_id) is entry and key not in entry.faces:
+                self.total_bytes -= entry.nbytes
+                entry.faces[key] = faces
+                self.total_bytes += entry.nbytes
+                self._evict(keep=session_id)
+        return faces
+
+    def _touch(self, session_id: str, entry: SessionReference) -> None:
+        entry.last_used = time.time()
+        self.entries.move_to_end(session_id)
+
+    def _expire(self) -> None:
+        """Drop sessions idle for longer than the TTL (oldest are at the front)."""
+        cutoff = time.time() - self.ttl
+        while self.entries:
+            session_id, entry = next(iter(self.entries.items()))
+            if entry.last_used >= cutoff:
+                break
+            self._remove(session_id)
+            self.stats['expirations'] += 1
+
+    def _evict(self, keep: str = None) -> None:
+        """Evict least recently used sessions until both limits hold."""
+        self._expire()
+        while self.entries and (len(self.entries) > self.max_sessions or self.total_bytes > self.max_bytes):
+            session_id = next(iter(self.entries))
+            if session_id == keep:
+                # Only the session in use is left over budget; keep it rather than failing its request
+                if len(self.entries) == 1:
+                    break
+                self.entries.move_to_end(session_id)
+                continue
+            self._remove(session_id)
+            self.stats['evictions'] += 1
+
+    def _remove(self, session_id: str) -> None:
+        entry = self.entries.pop(session_id)
+        self.total_bytes -= entry.nbytes
+
+    def info(self) -> Dict:
+        with self.lock:
+            self._expire()
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            return {
+                'stats': stats,
+                'sessions': len(self.entries),
+                'memory_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl
+            }
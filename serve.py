@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Production Server
+=================
+Runs app.py behind a production WSGI server instead of Flask's debug server.
+
+- Linux/macOS: gunicorn with preforked ``gthread`` workers. Each worker
+  builds the models from ``FACE_WARMUP_PAIRS`` after it is forked and runs
+  the dummy warm-up inference; TensorFlow's thread pools are not fork-safe,
+  so the master never loads a model. Workers are recycled gracefully after ``--max-requests``
+  (with jitter) or when their RSS passes ``--max-worker-memory-mb``.
+- Windows: waitress (single process, ``--threads`` threads). The
+  ``/ws/realtime`` WebSocket stream is not available there.
+
+TensorFlow threads are split across workers (cores / workers intra-op
+threads each) through environment variables set before TensorFlow is
+imported.
+
+``--profile-startup`` prints where startup import time goes and times a
+cold start of the server with the other options: until the first response
+and until ``/ready``. DeepFace/TensorFlow are imported lazily (see
+lazy_import.py) by the background warm-up in each worker, so the first
+response doesn't wait for them.
+
+Usage:
+    python serve.py --workers 4 --threads 4 --port 5000
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import tempfile
+import logging
+import urllib.error
+import urllib.request
+
+
+def configure_tf_threads(workers: int, tf_threads: int = None) -> int:
+    """Set per-worker TensorFlow/OpenMP thread counts; must run before TensorFlow is imported."""
+    threads = tf_threads or max(1, (os.cpu_count() or 1) // workers)
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(threads))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    return int(os.environ['TF_NUM_INTRAOP_THREADS'])
+
+
+def run_gunicorn(args) -> None:
+    from gunicorn.app.base import BaseApplication
+    import psutil
+    import app as face_app
+
+    pairs = face_app.parse_warmup_pairs(face_app.WARMUP_PAIRS)
+
+    def post_fork(server, worker):
+        # Model dimuat di tiap worker setelah fork; runtime TensorFlow tidak aman di-fork
+        face_app.model_registry.start_warmup(pairs)
+
+    def post_request(worker, req, environ, resp):
+        if not args.max_worker_memory_mb:
+            return
+        rss_mb = psutil.Process().memory_info().rss / 1024 ** 2
+        if rss_mb > args.max_worker_memory_mb and worker.alive:
+            worker.log.info(f"Worker {worker.pid} uses {rss_mb:.0f} MB, recycling after in-flight requests")
+            worker.alive = False
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'preload_app': True,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'post_fork': post_fork,
+        'post_request': post_request,
+    }
+
+    class FaceRecognitionApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return face_app.app
+
+    FaceRecognitionApplication().run()
+
+
+def run_waitress(args) -> None:
+    from waitress import serve
+    import app as face_app
+
+    face_app.model_registry.start_warmup(face_app.parse_warmup_pairs(face_app.WARMUP_PAIRS))
+    serve(face_app.app, host=args.host, port=args.port, threads=args.threads)
+
+
+def _wait_for(url: str, process: subprocess.Popen, timeout: float, status: int = 200) -> float:
+    """Poll a URL until it returns ``status``; returns the time it took."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                code = response.status
+        except urllib.error.HTTPError as e:
+            code = e.code
+        except (urllib.error.URLError, ConnectionError):
+            code = None
+        if code == status:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} did not return {status} within {timeout}s")
+
+
+def profile_startup(args, argv) -> None:
+    """
+    Print cold import times, then start the server with the other options and
+    time its first response (``/``) and the end of model warm-up (``/ready``).
+    """
+    import lazy_import
+
+    lazy_import.print_import_profile(['app'], ['deepface.DeepFace'])
+
+    host = '127.0.0.1' if args.host in ('0.0.0.0', '') else args.host
+    base_url = f"http://{host}:{args.port}"
+    command = [sys.executable, os.path.abspath(__file__)] + [arg for arg in argv if arg != '--profile-startup']
+    start = time.perf_counter()
+    process = subprocess.Popen(command)
+    try:
+        _wait_for(base_url + '/', process, args.timeout)
+        first_response = time.perf_counter() - start
+        _wait_for(base_url + '/ready', process, args.timeout)
+        ready = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    print(f"Cold start: first response after {first_response:.2f}s, models ready after {ready:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the face recognition app in production mode")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=5000, help="Port")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes (gunicorn only)")
+    parser.add_argument("--threads", type=int, default=4, help="Request threads per worker")
+    parser.add_argument("--tf-threads", type=int,
+                        help="TensorFlow intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--max-requests", type=int, default=1000,
+                        help="Recycle a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=100,
+                        help="Random extra requests so workers don't all restart together")
+    parser.add_argument("--max-worker-memory-mb", type=float, default=0,
+                        help="Recycle a worker once its RSS exceeds this (0 disables)")
+    parser.add_argument("--timeout", type=int, default=120, help="Kill workers silent for this many seconds")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds a recycled worker gets to finish in-flight requests")
+    parser.add_argument("--server", choices=['gunicorn', 'waitress'],
+                        default='waitress' if sys.platform == 'win32' else 'gunicorn',
+                        help="WSGI server (default: waitress on Windows, gunicorn elsewhere)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print an import-time breakdown and time a cold start to first response, then exit")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup(args, sys.argv[1:])
+        return
+
+    workers = args.workers if args.server == 'gunicorn' else 1
+    tf_threads = configure_tf_threads(workers, args.tf_threads)
+    if workers > 1:
+        # Referensi sesi dibagi antar worker lewat folder bersama
+        os.environ.setdefault('FACE_REFERENCE_DIR', os.path.join(tempfile.gettempdir(), 'face_references'))
+    logging.info(f"Starting {args.server} with {workers} worker(s) x {args.threads} thread(s), "
+                 f"{tf_threads} TensorFlow thread(s) per worker")
+
+    if args.server == 'gunicorn':
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -40,28 +40,17 @@ async function sendImages() {
     return;
   }
 
-  const toBase64 = file => new Promise((resolve, reject) => {
-    const reader = new FileReader();
-    reader.readAsDataURL(file);
-    reader.onload = () => resolve(reader.result);
-    reader.onerror = error => reject(error);
-  });
-
-  const refImgBase64 = await toBase64(refInput);
-  const targetImgBase64 = await toBase64(targetInput);
+  // Kirim file mentah sebagai multipart, tanpa konversi base64
+  const formData = new FormData();
+  formData.append("ref_img", refInput);
+  formData.append("target_img", targetInput);
+  formData.append("user_id", "web-user");
+  formData.append("detector_backend", detectorModel); // Send detector model
+  formData.append("model_name", recognitionModel);    // Send recognition model
 
   const res = await fetch("/match", {
     method: "POST",
-    headers: {
-      "Content-Type": "application/json"
-    },
-    body: JSON.stringify({
-      ref_img: refImgBase64,
-      target_img: targetImgBase64,
-      user_id: "web-user",
-      detector_backend: detectorModel, // Send detector model
-      model_name: recognitionModel      // Send recognition model
-    })
+    body: formData
   });
 
   const result = await res.json();
@@ -8,8 +8,17 @@ const stopButton = document.getElementById('stop');
 const matchButton = document.getElementById('matchButton'); // Tambahkan ID ke tombol "Face Match" di HTML
 const detectorModelSelectRt = document.getElementById('detector-model-rt');
 const recognitionModelSelectRt = document.getElementById('recognition-model-rt');
+const streamButton = document.getElementById('streamButton');
+
+const STREAM_FPS = 5; // Frame per detik yang dikirim saat streaming
+const STREAM_JPEG_QUALITY = 0.8;
+const MAX_FRAME_SIDE = 640; // Sisi terpanjang frame yang dikirim ke server (piksel)
 
 let stream = null; // Untuk menyimpan stream kamera
+let socket = null; // Koneksi WebSocket untuk streaming
+let streamTimer = null;
+let encodingFrame = false;
+const streamCanvas = document.createElement('canvas');
 
 // Fungsi untuk memulai kamera
 async function startCamera() {
@@ -23,17 +32,20 @@ async function startCamera() {
         startButton.disabled = true;
         stopButton.disabled = false;
         matchButton.disabled = false;
+        streamButton.disabled = false;
     } catch (err) {
         console.error("Kesalahan webcam:", err);
         resultElement.textContent = "Gagal mengakses kamera: " + err.message;
         startButton.disabled = false;
         stopButton.disabled = true;
         matchButton.disabled = true;
+        streamButton.disabled = true;
     }
 }
 
 // Fungsi untuk menghentikan kamera
 function stopCamera() {
+    stopStreaming();
     if (stream) {
         stream.getTracks().forEach(track => track.stop());
         video.srcObject = null;
@@ -42,12 +54,115 @@ function stopCamera() {
         startButton.disabled = false;
         stopButton.disabled = true;
         matchButton.disabled = true;
+        streamButton.disabled = true;
+    }
+}
+
+// Tampilkan hasil verifikasi dari server
+function showResult(data) {
+    if (data.error) {
+        resultElement.textContent = `Error: ${data.error}`;
+    } else if (data.verified !== undefined) {
+        resultElement.textContent = data.verified
+            ? `COCOK ✅ (jarak: ${data.distance ? data.distance.toFixed(4) : 'N/A'})`
+            : `TIDAK COCOK ❌ (jarak: ${data.distance ? data.distance.toFixed(4) : 'N/A'})`;
+    } else {
+        resultElement.textContent = "Respons tidak dikenali dari server.";
+    }
+}
+
+// Fungsi untuk memulai streaming frame lewat WebSocket
+function startStreaming() {
+    if (!stream) {
+        resultElement.textContent = "Kamera belum aktif.";
+        return;
+    }
+    const params = new URLSearchParams({
+        detector_backend: detectorModelSelectRt.value,
+        model_name: recognitionModelSelectRt.value,
+    });
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    socket = new WebSocket(`${protocol}://${window.location.host}/ws/realtime?${params}`);
+
+    socket.onopen = () => {
+        resultElement.textContent = "Streaming aktif...";
+        streamTimer = setInterval(sendFrame, 1000 / STREAM_FPS);
+    };
+    socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        showResult(data);
+        if (data.latency_ms !== undefined) {
+            resultElement.textContent += ` | latensi ${data.latency_ms} ms, frame dilewati ${data.dropped_frames}`;
+        }
+    };
+    socket.onerror = (err) => {
+        console.error("Kesalahan WebSocket:", err);
+    };
+    socket.onclose = () => {
+        if (socket) {
+            resultElement.textContent = "Streaming terputus.";
+        }
+        stopStreaming();
+    };
+    streamButton.textContent = "Hentikan Streaming";
+    matchButton.disabled = true;
+}
+
+// Fungsi untuk menghentikan streaming
+function stopStreaming() {
+    clearInterval(streamTimer);
+    streamTimer = null;
+    if (socket) {
+        const oldSocket = socket;
+        socket = null;
+        oldSocket.close();
+    }
+    streamButton.textContent = "Mulai Streaming";
+    matchButton.disabled = !stream;
+}
+
+// Gambar frame video ke canvas, diperkecil agar sisi terpanjang maksimal MAX_FRAME_SIDE
+function drawFrame(canvas) {
+    const scale = Math.min(1, MAX_FRAME_SIDE / Math.max(video.videoWidth, video.videoHeight));
+    canvas.width = Math.round(video.videoWidth * scale);
+    canvas.height = Math.round(video.videoHeight * scale);
+    canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+}
+
+// Kirim satu frame JPEG biner; lewati jika frame sebelumnya belum terkirim agar antrean tidak menumpuk
+function sendFrame() {
+    if (!socket || socket.readyState !== WebSocket.OPEN || video.readyState !== video.HAVE_ENOUGH_DATA) {
+        return;
+    }
+    if (encodingFrame || socket.bufferedAmount > 0) {
+        return;
+    }
+    encodingFrame = true;
+    drawFrame(streamCanvas);
+    streamCanvas.toBlob((blob) => {
+        encodingFrame = false;
+        if (blob && socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(blob);
+        }
+    }, 'image/jpeg', STREAM_JPEG_QUALITY);
+}
+
+// Kirim pengaturan model baru ke server tanpa memutus streaming
+function sendStreamSettings() {
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({
+            detector_backend: detectorModelSelectRt.value,
+            model_name: recognitionModelSelectRt.value,
+        }));
     }
 }
 
 // Event listener untuk tombol
 startButton.addEventListener('click', startCamera);
 stopButton.addEventListener('click', stopCamera);
+streamButton.addEventListener('click', () => (socket ? stopStreaming() : startStreaming()));
+detectorModelSelectRt.addEventListener('change', sendStreamSettings);
+recognitionModelSelectRt.addEventListener('change', sendStreamSettings);
 
 // Event listener untuk unggah gambar referensi
 uploadRefInput.addEventListener("change", (event) => {
@@ -67,6 +182,9 @@ uploadRefInput.addEventListener("change", (event) => {
 async function uploadReferenceImage(file) {
     const formData = new FormData();
     formData.append("file", file);
+    // Kirim model yang dipilih agar server bisa menghitung embedding referensi sekarang
+    formData.append("detector_backend", detectorModelSelectRt.value);
+    formData.append("model_name", recognitionModelSelectRt.value);
     resultElement.textContent = "Mengunggah gambar referensi...";
     try {
         const response = await fetch("/upload", {
@@ -102,40 +220,30 @@ matchButton.addEventListener('click', async () => {
     matchButton.disabled = true;
 
     const canvas = document.createElement('canvas');
-    const ctx = canvas.getContext('2d');
-    canvas.width = video.videoWidth;
-    canvas.height = video.videoHeight;
-    ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-    const frameDataUrl = canvas.toDataURL('image/jpeg');
+    drawFrame(canvas);
+    // Kirim frame sebagai JPEG biner (tanpa base64) agar payload lebih kecil
+    const frameBlob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg'));
 
     const detectorModel = detectorModelSelectRt.value;
     const recognitionModel = recognitionModelSelectRt.value;
+    const params = new URLSearchParams({
+        detector_backend: detectorModel,
+        model_name: recognitionModel,
+    });
 
     try {
-        const response = await fetch("/realtime_verify", {
+        const response = await fetch(`/realtime_verify?${params}`, {
             method: "POST",
             headers: {
-                "Content-Type": "application/json",
+                "Content-Type": "application/octet-stream",
             },
-            body: JSON.stringify({
-                frame_data: frameDataUrl,
-                detector_backend: detectorModel,
-                model_name: recognitionModel,
-            }),
+            body: frameBlob,
         });
 
         const data = await response.json();
 
         if (response.ok) {
-            if (data.error) {
-                 resultElement.textContent = `Error: ${data.error}`;
-            } else if (data.verified !== undefined) {
-                resultElement.textContent = data.verified 
-                    ? `COCOK ✅ (jarak: ${data.distance ? data.distance.toFixed(4) : 'N/A'})` 
-                    : `TIDAK COCOK ❌ (jarak: ${data.distance ? data.distance.toFixed(4) : 'N/A'})`;
-            } else {
-                resultElement.textContent = "Respons tidak dikenali dari server.";
-            }
+            showResult(data);
         } else {
             resultElement.textContent = `Kesalahan server: ${data.error || response.statusText}`;
         }
@@ -150,5 +258,6 @@ matchButton.addEventListener('click', async () => {
 // Inisialisasi kondisi tombol
 stopButton.disabled = true;
 matchButton.disabled = true;
+streamButton.disabled = true;
 resultElement.textContent = "Silakan aktifkan kamera dan unggah gambar referensi.";
 
@@ -0,0 +1,154 @@
+"""
+Threshold Sweep
+===============
+All-pairs verification metrics from one embedding per image.
+
+Every image is compared with every other image (the full N x N distance
+matrix, upper triangle) for each distance metric. Pairs of the same identity
+are genuine, all others impostors. Distances are computed in row blocks with
+one matrix product each and accumulated into fine genuine/impostor
+histograms, so memory stays bounded by the block size instead of N^2. ROC
+and DET curves, EER and the best threshold all come from the cumulative
+histograms in one pass, so other thresholds or metrics never need a new
+inference run.
+
+``synthetic_embeddings`` generates clustered identities for scaling tests.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import face_engine
+
+# Histogram bins per metric; threshold resolution is (upper bound / bins)
+DEFAULT_BINS = 10000
+# Points kept of each curve in the returned summary
+CURVE_POINTS = 200
+# np.trapz was renamed np.trapezoid in NumPy 2 (and removed in 2.4)
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def _upper_bound(metric: str, norms: np.ndarray) -> float:
+    """Largest possible distance between two of the embeddings."""
+    if metric == 'euclidean':
+        return float(2 * norms.max()) if len(norms) else 1.0
+    return 2.0
+
+
+def distance_histograms(embeddings: np.ndarray, labels: np.ndarray, metric: str = 'cosine',
+                        bins: int = DEFAULT_BINS, block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Histograms of genuine and impostor distances over all pairs i < j.
+
+    Args:
+        embeddings: (n, dim) matrix, one embedding per image
+        labels: (n,) identity of each image
+        metric: 'cosine', 'euclidean' or 'euclidean_l2'
+        bins: Number of histogram bins between 0 and the largest possible distance
+        block_size: Rows per distance block (memory is about block_size * n * 16 bytes:
+            float32 distances, int64 bin indices and boolean masks)
+
+    Returns:
+        (bin_edges, genuine_counts, impostor_counts)
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    labels = np.asarray(labels)
+    norms = np.linalg.norm(matrix, axis=1)
+    upper = _upper_bound(metric, norms)
+    scale = bins / upper
+    genuine = np.zeros(bins, dtype=np.int64)
+    impostor = np.zeros(bins, dtype=np.int64)
+
+    n = len(matrix)
+    for r0 in range(0, n, block_size):
+        r1 = min(n, r0 + block_size)
+        # Rows r0:r1 against columns r0:, keeping only j > i
+        distances = face_engine.find_distances(matrix[r0:], matrix[r0:r1], metric, row_norms=norms[r0:])
+        keep = np.arange(r0, r1)[:, None] < np.arange(r0, n)[None, :]
+        same = labels[r0:r1, None] == labels[None, r0:]
+        indices = np.minimum((distances * scale).astype(np.int64), bins - 1)
+        genuine += np.bincount(indices[keep & same], minlength=bins)
+        impostor += np.bincount(indices[keep & ~same], minlength=bins)
+
+    return np.linspace(0, upper, bins + 1), genuine, impostor
+
+
+def sweep_from_histograms(edges: np.ndarray, genuine: np.ndarray, impostor: np.ndarray,
+                          default_threshold: float = None) -> Dict:
+    """
+    ROC/DET summary of a pair of distance histograms (a pair is accepted if distance <= threshold).
+
+    Returns:
+        Dict with auc, eer, eer_threshold, best_threshold (max TPR - FPR), its
+        tpr/fpr, rates at ``default_threshold`` and downsampled curves
+    """
+    n_genuine, n_impostor = int(genuine.sum()), int(impostor.sum())
+    if not n_genuine or not n_impostor:
+        return {'genuine_pairs': n_genuine, 'impostor_pairs': n_impostor}
+
+    thresholds = edges[1:]
+    tpr = np.cumsum(genuine) / n_genuine
+    fpr = np.cumsum(impostor) / n_impostor
+    fnr = 1 - tpr
+
+    eer_index = int(np.argmin(np.abs(fpr - fnr)))
+    best_index = int(np.argmax(tpr - fpr))
+    auc = float(_trapezoid(np.concatenate([[0.0], tpr]), np.concatenate([[0.0], fpr])))
+    points = np.unique(np.concatenate([
+        np.linspace(0, len(thresholds) - 1, CURVE_POINTS).astype(int), [eer_index, best_index]
+    ]))
+
+    summary = {
+        'genuine_pairs': n_genuine,
+        'impostor_pairs': n_impostor,
+        'auc': auc,
+        'eer': float((fpr[eer_index] + fnr[eer_index]) / 2),
+        'eer_threshold': float(thresholds[eer_index]),
+        'best_threshold': float(thresholds[best_index]),
+        'best_tpr': float(tpr[best_index]),
+        'best_fpr': float(fpr[best_index]),
+        'curve': {
+            'threshold': thresholds[points].tolist(),
+            'tpr': tpr[points].tolist(),
+            'fpr': fpr[points].tolist()
+        }
+    }
+    if default_threshold is not None:
+        index = min(int(np.searchsorted(thresholds, default_threshold)), len(thresholds) - 1)
+        summary.update({
+            'default_threshold': default_threshold,
+            'default_tpr': float(tpr[index]),
+            'default_fpr': float(fpr[index])
+        })
+    return summary
+
+
+def all_pairs_sweep(embeddings: np.ndarray, labels: np.ndarray, model_name: str = None,
+                    metrics: List[str] = None, bins: int = DEFAULT_BINS, block_size: int = 1024) -> Dict[str, Dict]:
+    """
+    ``sweep_from_histograms`` for every distance metric.
+
+    ``model_name`` selects the DeepFace default thresholds reported alongside.
+    """
+    results = {}
+    for metric in metrics or face_engine.DISTANCE_METRICS:
+        edges, genuine, impostor = distance_histograms(embeddings, labels, metric, bins, block_size)
+        default = face_engine.find_threshold(model_name, metric) if model_name else None
+        results[metric] = sweep_from_histograms(edges, genuine, impostor, default)
+    return results
+
+
+def synthetic_embeddings(n_identities: int, images_per_identity: int = 5, dim: int = 512,
+                         noise: float = 2.5, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clustered embeddings: a random center per identity plus Gaussian noise per image.
+
+    Returns:
+        (embeddings (n_identities * images_per_identity, dim) float32, labels)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_identities, dim)).astype(np.float32)
+    labels = np.repeat(np.arange(n_identities), images_per_identity)
+    embeddings = centers[labels] + noise * rng.normal(size=(len(labels), dim)).astype(np.float32)
+    return embeddings, labels
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Video Pipeline
+==============
+Offline face recognition over a recorded video file.
+
+Frames are read with OpenCV and sampled at ``--sample-fps``, then flow
+through four stages, each in its own thread, connected by bounded queues:
+
+    decode -> detect -> embed -> match
+
+so decoding the next frames, detecting faces and running the recognition
+model overlap instead of running one after the other. A full queue blocks
+the stage before it, which bounds memory to ``--queue-size`` frames per
+stage. The embed stage takes up to ``--batch-size`` waiting frames at once
+and embeds all their faces in one forward pass.
+
+Faces are matched against a reference image (``--reference``, like
+``/realtime_verify``) or an enrolled gallery saved with ``/gallery/save``
+(``--gallery-dir``, like ``/identify``). Results are written as JSON Lines,
+one line per sampled frame with its video timestamp, followed by a
+``summary`` line. Per-stage frames/sec, idle and blocked time show which
+stage is the bottleneck.
+
+Usage:
+    python video_pipeline.py footage.mp4 --reference person.jpg --detector opencv --model Facenet \\
+        --sample-fps 5 --output footage_results.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+import cv2
+import numpy as np
+
+import face_engine
+from cascade import DetectorCascade, cascade_tiers
+from gallery import EmbeddingGallery
+from preprocessing import FaceTracker, is_detected
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream; every stage forwards it after its last item
+END = object()
+
+
+def format_timecode(seconds: float) -> str:
+    """Video position as HH:MM:SS.mmm."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600 * 1000)
+    minutes, millis = divmod(millis, 60 * 1000)
+    return f"{hours:02d}:{minutes:02d}:{millis / 1000:06.3f}"
+
+
+class Stage:
+    """
+    One pipeline stage running in its own thread.
+
+    ``work`` receives a list of up to ``batch_size`` items from the inbox and
+    returns the items to pass on. A source stage has no inbox; its ``work``
+    is called without arguments and returns an iterator of items. If ``work``
+    raises, the error is recorded on every item of the batch and they are
+    still passed on, so one bad frame doesn't stop the video.
+    """
+
+    def __init__(self, name: str, work: Callable, inbox: queue.Queue = None, outbox: queue.Queue = None,
+                 batch_size: int = 1):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.thread = threading.Thread(target=self._run, name=f"video-{name}", daemon=True)
+        self.error = None
+        self.stats = {
+            'items': 0,
+            'batches': 0,
+            # Time spent in ``work``
+            'busy_s': 0.0,
+            # Waiting for input (starved by the previous stage)
+            'idle_s': 0.0,
+            # Waiting for room in the output queue (blocked by the next stage)
+            'blocked_s': 0.0,
+            'max_queue': 0
+        }
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def join(self) -> None:
+        self.thread.join()
+
+    def _emit(self, item) -> None:
+        if self.outbox is None:
+            return
+        start = time.perf_counter()
+        self.outbox.put(item)
+        self.stats['blocked_s'] += time.perf_counter() - start
+        self.stats['max_queue'] = max(self.stats['max_queue'], self.outbox.qsize())
+
+    def _run(self) -> None:
+        try:
+            if self.inbox is None:
+                self._run_source()
+            else:
+                self._run_inbox()
+        except Exception as e:
+            # Only a failing source gets here; downstream stages still drain what was sent
+            self.error = e
+            logger.error(f"Stage {self.name} failed: {e}")
+        finally:
+            self._emit(END)
+
+    def _run_source(self) -> None:
+        items = iter(self.work())
+        while True:
+            start = time.perf_counter()
+            item = next(items, END)
+            self.stats['busy_s'] += time.perf_counter() - start
+            if item is END:
+                return
+            self.stats['items'] += 1
+            self.stats['batches'] += 1
+            self._emit(item)
+
+    def _run_inbox(self) -> None:
+        finished = False
+        while not finished:
+            start = time.perf_counter()
+            item = self.inbox.get()
+            self.stats['idle_s'] += time.perf_counter() - start
+            if item is END:
+                return
+            batch = [item]
+            # Take whatever else is already waiting, up to the batch size
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is END:
+                    finished = True
+                    break
+                batch.append(item)
+
+            start = time.perf_counter()
+            try:
+                outputs = self.work(batch)
+            except Exception as e:
+                for item in batch:
+                    item.setdefault('error', f"{self.name}: {e}")
+                outputs = batch
+            self.stats['busy_s'] += time.perf_counter() - start
+            self.stats['items'] += len(batch)
+            self.stats['batches'] += 1
+            for output in outputs:
+                self._emit(output)
+
+    def info(self, wall_s: float) -> Dict:
+        busy = self.stats['busy_s']
+        return dict(
+            self.stats,
+            busy_s=round(busy, 3),
+            idle_s=round(self.stats['idle_s'], 3),
+            blocked_s=round(self.stats['blocked_s'], 3),
+            # Rate this stage could sustain on its own
+            fps=round(self.stats['items'] / busy, 2) if busy else None,
+            utilization=round(busy / wall_s, 3) if wall_s else None
+        )
+
+
+class VideoPipeline:
+    """
+    Decode/detect/embed/match pipeline for one video file.
+
+    Args:
+        video_path: Video file readable by OpenCV
+        detector: Detector backend, or a cascade ('cascade', 'opencv+retinaface')
+        model: Recognition model name
+        reference_path: Reference image to verify every face against
+        gallery_dir: Saved gallery to identify every face in (instead of a reference)
+        distance_metric: 'cosine', 'euclidean' or 'euclidean_l2'
+        sample_fps: Frames per second of video to process (0 = every frame)
+        queue_size: Capacity of each queue between stages
+        batch_size: Max frames embedded in one forward pass
+        max_side: Longest image side before detection (0 = original size)
+        roi_tracking: Search only around the previous frame's face while it is found
+        top_k: Gallery matches per face
+        max_frames: Stop after this many sampled frames (0 = whole video)
+    """
+
+    def __init__(self, video_path: str, detector: str = 'opencv', model: str = 'VGG-Face',
+                 reference_path: str = None, gallery_dir: str = None, distance_metric: str = 'cosine',
+                 sample_fps: float = 5.0, queue_size: int = 8, batch_size: int = 8, max_side: int = 1280,
+                 roi_tracking: bool = False, top_k: int = 3, max_frames: int = 0, roi_margin: float = 0.5):
+        if (reference_path is None) == (gallery_dir is None):
+            raise ValueError("Pass exactly one of a reference image or a gallery directory")
+        if distance_metric not in face_engine.DISTANCE_METRICS:
+            raise ValueError(f"Distance metric '{distance_metric}' not supported.")
+        self.video_path = video_path
+        self.detector = detector
+        self.model = model
+        self.distance_metric = distance_metric
+        self.sample_fps = sample_fps
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_side = max_side
+        self.top_k = top_k
+        self.max_frames = max_frames
+        self.tracker = FaceTracker(roi_margin) if roi_tracking else None
+        tiers = cascade_tiers(detector)
+        self.cascade = DetectorCascade(tiers) if tiers else None
+        self.reference_path = reference_path
+        self.reference_faces = None
+        self.gallery = None
+        if gallery_dir is not None:
+            self.gallery = EmbeddingGallery()
+            self.gallery.load(gallery_dir)
+            if model not in self.gallery.galleries:
+                raise ValueError(f"No {model} embeddings enrolled in {gallery_dir}")
+        self.video_info = {}
+
+    def _detect(self, img: np.ndarray) -> List[Dict]:
+        if self.cascade is not None:
+            faces, _ = self.cascade.detect(img, lambda img, tier: face_engine.detect_faces(img, tier, self.max_side))
+        else:
+            faces = face_engine.detect_faces(img, self.detector, self.max_side)
+        return [face for face in faces if is_detected(face)]
+
+    def _load_reference(self) -> None:
+        img = cv2.imread(self.reference_path)
+        if img is None:
+            raise ValueError(f"Could not read reference image {self.reference_path}")
+        crops = self._detect(img)
+        if not crops:
+            raise ValueError(f"No face found in reference image {self.reference_path}")
+        embeddings = face_engine.embed_faces([crop['face'] for crop in crops], self.model)
+        self.reference_faces = [{
+            'embedding': embedding,
+            'facial_area': crop['facial_area'],
+            'face_confidence': crop['confidence']
+        } for crop, embedding in zip(crops, embeddings)]
+
+    # Stages
+
+    def read_frames(self) -> Iterator[Dict]:
+        """Decode stage: sampled frames with their position in the video."""
+        capture = cv2.VideoCapture(self.video_path)
+        try:
+            video_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            step = max(1, round(video_fps / self.sample_fps)) if self.sample_fps and video_fps else 1
+            self.video_info = {
+                'fps': video_fps,
+                'frames': int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+                'sample_step': step
+            }
+            index = 0
+            sampled = 0
+            while not self.max_frames or sampled < self.max_frames:
+                # grab() skips unsampled frames without converting them to BGR
+                if index % step:
+                    if not capture.grab():
+                        return
+                    index += 1
+                    continue
+                ok, image = capture.read()
+                if not ok:
+                    return
+                timestamp = index / video_fps if video_fps else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                yield {'frame': index, 'timestamp': timestamp, 'image': image}
+                index += 1
+                sampled += 1
+        finally:
+            capture.release()
+
+    def detect_frames(self, items: List[Dict]) -> List[Dict]:
+        """Detect stage: face crops of each frame; the frame itself is dropped afterwards."""
+        for item in items:
+            image = item.pop('image')
+            try:
+                if self.tracker is not None:
+                    item['crops'] = self.tracker.detect(image, self._detect)
+                else:
+                    item['crops'] = self._detect(image)
+            except Exception as e:
+                item['error'] = f"detect: {e}"
+        return items
+
+    def embed_frames(self, items: List[Dict]) -> List[Dict]:
+        """Embed stage: all faces of the batch in one forward pass."""
+        crops = [crop for item in items if 'error' not in item for crop in item['crops']]
+        embeddings = iter(face_engine.embed_faces([crop['face'] for crop in crops], self.model))
+        for item in items:
+            if 'error' in item:
+                continue
+            item['faces'] = [{
+                'embedding': next(embeddings),
+                'facial_area': crop['facial_area'],
+                'face_confidence': crop['confidence']
+            } for crop in item.pop('crops')]
+        return items
+
+    def match_frames(self, items: List[Dict]) -> List[Dict]:
+        """Match stage: verify against the reference or identify in the gallery, then write the line."""
+        for item in items:
+            record = {
+                'frame': item['frame'],
+                'timestamp': round(item['timestamp'], 3),
+                'timecode': format_timecode(item['timestamp'])
+            }
+            if 'error' in item:
+                record['error'] = item['error']
+            else:
+                record['faces'] = self._match(item['faces'])
+            self.output.write(json.dumps(record) + "\n")
+            self.frames_written += 1
+            self.errors += 'error' in record
+            self.faces_found += len(record.get('faces', []))
+            self.matched_frames += any(face.get('verified') for face in record.get('faces', []))
+        return []
+
+    def _match(self, faces: List[Dict]) -> List[Dict]:
+        if not faces:
+            return []
+        if self.gallery is not None:
+            matches = self.gallery.identify(self.model, np.stack([face['embedding'] for face in faces]),
+                                            self.distance_metric, self.top_k)
+            return [{
+                'facial_area': face['facial_area'],
+                'confidence': face['face_confidence'],
+                'verified': bool(face_matches and face_matches[0]['verified']),
+                'matches': face_matches
+            } for face, face_matches in zip(faces, matches)]
+
+        results = []
+        for face in faces:
+            result = face_engine.verify_faces(self.reference_faces, [face], self.model, self.detector,
+                                              self.distance_metric)
+            results.append({
+                'facial_area': face['facial_area'],
+                'confidence': face['face_confidence'],
+                'verified': result['verified'],
+                'distance': result['distance'],
+                'threshold': result['threshold']
+            })
+        return results
+
+    def run(self, output_path: str) -> Dict:
+        """
+        Process the whole video and write the results file.
+
+        Returns:
+            Summary with frame counts, end-to-end fps and per-stage stats
+        """
+        capture = cv2.VideoCapture(self.video_path)
+        opened = capture.isOpened()
+        capture.release()
+        if not opened:
+            raise ValueError(f"Could not open video {self.video_path}")
+        if self.gallery is None:
+            self._load_reference()
+
+        self.frames_written = self.errors = self.faces_found = self.matched_frames = 0
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(3)]
+        stages = [
+            Stage('decode', self.read_frames, outbox=queues[0]),
+            Stage('detect', self.detect_frames, queues[0], queues[1]),
+            Stage('embed', self.embed_frames, queues[1], queues[2], batch_size=self.batch_size),
+            Stage('match', self.match_frames, queues[2])
+        ]
+
+        start = time.perf_counter()
+        with open(output_path, 'w') as self.output:
+            for stage in stages:
+                stage.start()
+            for stage in stages:
+                stage.join()
+            wall_s = time.perf_counter() - start
+
+            stage_info = {stage.name: stage.info(wall_s) for stage in stages}
+            summary = {
+                'video': str(self.video_path),
+                'detector_backend': self.detector,
+                'model': self.model,
+                'similarity_metric': self.distance_metric,
+                'mode': 'gallery' if self.gallery is not None else 'reference',
+                'video_fps': self.video_info.get('fps'),
+                'sample_step': self.video_info.get('sample_step'),
+                'frames': self.frames_written,
+                'frames_with_match': self.matched_frames,
+                'faces': self.faces_found,
+                'errors': self.errors,
+                'wall_s': round(wall_s, 3),
+                'fps': round(self.frames_written / wall_s, 2) if wall_s else None,
+                # The stage with the most busy time limits the pipeline
+                'bottleneck': max(stage_info, key=lambda name: stage_info[name]['busy_s']),
+                'stages': stage_info,
+                'queue_size': self.queue_size,
+                'batch_size': self.batch_size
+            }
+            if stages[0].error is not None:
+                summary['error'] = str(stages[0].error)
+            if self.cascade is not None:
+                summary['detector_cascade'] = self.cascade.info()
+            self.output.write(json.dumps({'summary': summary}) + "\n")
+        return summary
+
+
+def print_stage_report(summary: Dict) -> None:
+    """Per-stage throughput table."""
+    print(f"\n{summary['frames']} frames in {summary['wall_s']:.2f}s ({summary['fps']} frames/s end to end), "
+          f"{summary['faces']} faces, {summary['frames_with_match']} frames with a match, {summary['errors']} errors")
+    print(f"{'Stage':<8} {'Frames':>7} {'Frames/s':>9} {'Busy (s)':>9} {'Idle (s)':>9} {'Blocked (s)':>12} {'Max queue':>10}")
+    for name, stage in summary['stages'].items():
+        fps = f"{stage['fps']:.1f}" if stage['fps'] else '-'
+        print(f"{name:<8} {stage['items']:>7} {fps:>9} {stage['busy_s']:>9.2f} {stage['idle_s']:>9.2f} "
+              f"{stage['blocked_s']:>12.2f} {stage['max_queue']:>10}")
+    print(f"Bottleneck: {summary['bottleneck']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run face recognition over a video file")
+    parser.add_argument("video", help="Video file to process")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--reference", help="Reference image to verify every face against")
+    source.add_argument("--gallery-dir", help="Saved gallery (see /gallery/save) to identify faces in")
+    parser.add_argument("--detector", default="opencv",
+                        help="Detector backend or cascade, e.g. opencv+retinaface (default: opencv)")
+    parser.add_argument("--model", default="VGG-Face", help="Recognition model (default: VGG-Face)")
+    parser.add_argument("--distance-metric", choices=face_engine.DISTANCE_METRICS, default="cosine")
+    parser.add_argument("--sample-fps", type=float, default=5,
+                        help="Frames per second of video to process, 0 for every frame (default: 5)")
+    parser.add_argument("--queue-size", type=int, default=8, help="Capacity of each queue between stages (default: 8)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Max frames per embedding batch (default: 8)")
+    parser.add_argument("--max-side", type=int, default=1280,
+                        help="Longest frame side before detection, 0 for original size (default: 1280)")
+    parser.add_argument("--roi-tracking", action="store_true",
+                        help="Search only around the previous frame's face while it is found")
+    parser.add_argument("--top-k", type=int, default=3, help="Gallery matches per face (default: 3)")
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop after this many sampled frames")
+    parser.add_argument("--output", help="Results file (default: <video name>_results.jsonl)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.video):
+        logger.error(f"Video not found: {args.video}")
+        sys.exit(1)
+    output = args.output or f"{Path(args.video).stem}_results.jsonl"
+
+    try:
+        pipeline = VideoPipeline(args.video, args.detector, args.model, args.reference, args.gallery_dir,
+                                 args.distance_metric, args.sample_fps, args.queue_size, args.batch_size,
+                                 args.max_side, args.roi_tracking, args.top_k, args.max_frames)
+        summary = pipeline.run(output)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    print_stage_report(summary)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()